@@ -1,40 +1,180 @@
+import asyncio
+import json
 import openai
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from sqlalchemy.orm import Session
-from models import Post, Analytics
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Post
+from columnar import WEEKDAYS, PostFrame
+from llm_cache import LLMCache
+from streaming import JsonFieldParser, parse_json_object
 from config import settings
 
 openai.api_key = settings.OPENAI_API_KEY
 
+LLM_MODEL = "gpt-3.5-turbo"
+# Bump a version whenever its prompt changes so cached responses are not reused
+PORTRAIT_TEMPLATE = "creator-portrait/v2"
+POST_ANALYSIS_TEMPLATE = "post-analysis/v1"
+
 class ContentAnalyzer:
-    def __init__(self):
+    def __init__(self, cache: Optional[LLMCache] = None):
+        self.cache = cache
         self.max_posts = settings.MAX_POSTS_PER_ANALYSIS
         self.cache_days = settings.CACHE_ANALYSIS_DAYS
+        self.concurrency = settings.LLM_CONCURRENCY
+        self.batch_size = settings.LLM_BATCH_SIZE
         self.creator_archetypes = [
             "The Authentic Storyteller", "The Trendsetter", "The Community Builder",
             "The Knowledge Sharer", "The Conversation Starter", "The Visual Artist",
             "The Behind-the-Scenes Creator", "The Motivational Voice"
         ]
     
-    async def generate_creator_portrait(self, posts: List[Post]) -> Dict:
-        """Generate mystical creator personality analysis"""
-        if not posts:
+    async def _complete(
+        self,
+        template: str,
+        inputs: Dict,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        use_cache: bool = True,
+        parse: Callable[[str], Any] = str.strip
+    ) -> Any:
+        """Chat completion through the LLM cache; only responses that parse are cached"""
+        cache = self.cache if use_cache else None
+        key = LLMCache.make_key(LLM_MODEL, template, inputs)
+        if cache is not None:
+            cached = await cache.get(key)
+            if cached is not None:
+                return parse(cached)
+        
+        response = await openai.ChatCompletion.acreate(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        content = response.choices[0].message.content
+        result = parse(content)
+        if cache is not None:
+            await cache.set(key, LLM_MODEL, template, content)
+        return result
+    
+    async def _stream_complete(
+        self,
+        template: str,
+        inputs: Dict,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        use_cache: bool = True,
+        parse: Callable[[str], Any] = str.strip
+    ) -> AsyncIterator[str]:
+        """Like _complete, but yields response text as the model produces it (a cache hit is one chunk)"""
+        cache = self.cache if use_cache else None
+        key = LLMCache.make_key(LLM_MODEL, template, inputs)
+        if cache is not None:
+            cached = await cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        stream = await openai.ChatCompletion.acreate(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        chunks = []
+        async for chunk in stream:
+            text = chunk["choices"][0]["delta"].get("content")
+            if text:
+                chunks.append(text)
+                yield text
+        
+        content = "".join(chunks)
+        try:
+            parse(content)
+        except Exception:
+            return
+        if cache is not None:
+            await cache.set(key, LLM_MODEL, template, content)
+    
+    async def generate_creator_portrait(self, sample: Dict, use_cache: bool = True) -> Dict:
+        """Generate mystical creator personality analysis.
+        
+        `sample` is sampling.sample_posts() output: account-wide stats plus a
+        token-budgeted set of representative posts, so the prompt stays the
+        same size however many posts the account has.
+        """
+        if not sample.get("total_posts"):
             return self._default_portrait()
         
+        prompt, inputs = self._portrait_prompt(sample)
+        try:
+            result = await self._complete(
+                PORTRAIT_TEMPLATE, inputs, prompt, max_tokens=300, temperature=0.8,
+                use_cache=use_cache, parse=parse_json_object
+            )
+            return self._finish_portrait(result, sample)
+            
+        except Exception as e:
+            return self._default_portrait()
+    
+    async def stream_creator_portrait(self, sample: Dict, use_cache: bool = True) -> AsyncIterator[Tuple[str, Any]]:
+        """Generate the portrait as ("field", {"name", "value"}) events while the model writes it, then ("portrait", portrait).
+        
+        Each field is yielded as soon as its JSON value is complete. The final
+        portrait is what generate_creator_portrait would return for the same
+        sample (and shares its cache entries): the default portrait on an
+        unparseable response or an API error.
+        """
+        if not sample.get("total_posts"):
+            yield "portrait", self._default_portrait()
+            return
+        
+        prompt, inputs = self._portrait_prompt(sample)
+        parser = JsonFieldParser()
+        try:
+            async for text in self._stream_complete(
+                PORTRAIT_TEMPLATE, inputs, prompt, max_tokens=300, temperature=0.8,
+                use_cache=use_cache, parse=parse_json_object
+            ):
+                for name, value in parser.feed(text):
+                    yield "field", {"name": name, "value": value}
+            result = parse_json_object(parser.buffer)
+        except Exception:
+            yield "portrait", self._default_portrait()
+            return
+        yield "portrait", self._finish_portrait(result, sample)
+    
+    def _finish_portrait(self, result: Dict, sample: Dict) -> Dict:
+        result['total_posts'] = sample['total_posts']
+        result['avg_engagement'] = round(sample['avg_engagement'], 1)
+        return result
+    
+    def _portrait_prompt(self, sample: Dict) -> Tuple[str, Dict]:
+        """Portrait prompt for a sample, and the inputs it's cached under"""
         # Analyze content patterns
-        content_analysis = self._analyze_content_patterns(posts)
-        engagement_patterns = self._analyze_engagement_patterns(posts)
+        avg_engagement = sample["avg_engagement"]
+        content_analysis = self._analyze_content_patterns(sample)
+        engagement_patterns = self._analyze_engagement_patterns(avg_engagement)
+        post_lines = [post["line"] for post in sample["posts"]]
         
         prompt = f"""
         🔮 You are a mystical digital fortune teller analyzing a content creator's aura.
         
         Creator's Digital Energy:
-        - Total posts analyzed: {len(posts)}
+        - Total posts analyzed: {sample['total_posts']}
         - Content themes: {content_analysis['themes']}
         - Posting patterns: {content_analysis['patterns']}
         - Engagement aura: {engagement_patterns}
-        - Average engagement rate: {sum(p.engagement_rate for p in posts) / len(posts):.1f}%
+        - Average engagement rate: {avg_engagement:.1f}%
+        
+        Representative posts ({len(post_lines)} sampled across themes, formats, recency and engagement):
+        {chr(10).join(post_lines) or "- none available"}
         
         Channel the universe and create a mystical "Creator Portrait" with:
         
@@ -59,29 +199,69 @@ class ContentAnalyzer:
         Write in mystical, engaging language that people want to share. Be positive and encouraging.
         """
         
+        inputs = {
+            "total_posts": sample['total_posts'],
+            "themes": content_analysis['themes'],
+            "patterns": content_analysis['patterns'],
+            "engagement": engagement_patterns,
+            "avg_engagement": f"{avg_engagement:.1f}",
+            "archetypes": self.creator_archetypes,
+            "posts": post_lines
+        }
+        return prompt, inputs
+    
+    @staticmethod
+    def _post_inputs(post: Post) -> Dict:
+        """What a post analysis depends on (its LLM cache key inputs)"""
+        return {
+            "content": (post.content or "")[:500],
+            "likes": post.likes,
+            "views": post.views,
+            "engagement_rate": post.engagement_rate
+        }
+    
+    async def analyze_post_content(self, post: Post, use_cache: bool = True) -> str:
+        """Analyze a single post using OpenAI (legacy method)"""
+        if self._is_analysis_cached(post):
+            return post.analysis_result
+        
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=300,
-                temperature=0.8
+            analysis = await self._complete(
+                POST_ANALYSIS_TEMPLATE, self._post_inputs(post), self._post_analysis_prompt(post),
+                max_tokens=150, temperature=0.7, use_cache=use_cache
             )
-            
-            import json
-            result = json.loads(response.choices[0].message.content.strip())
-            result['total_posts'] = len(posts)
-            result['avg_engagement'] = round(sum(p.engagement_rate for p in posts) / len(posts), 1)
-            return result
+            self._cache_analysis(post, analysis)
+            return analysis
             
         except Exception as e:
-            return self._default_portrait()
+            return f"Analysis unavailable: {str(e)}"
     
-    async def analyze_post_content(self, post: Post) -> str:
-        """Analyze a single post using OpenAI (legacy method)"""
+    async def stream_post_analysis(self, post: Post, use_cache: bool = True) -> AsyncIterator[str]:
+        """Analyze a single post, yielding the analysis text as the model writes it.
+        
+        The complete analysis is stored on the post like analyze_post_content's;
+        on an API error the stream ends with the same "Analysis unavailable" text.
+        """
         if self._is_analysis_cached(post):
-            return post.analysis_result
+            yield post.analysis_result
+            return
         
-        prompt = f"""
+        chunks = []
+        try:
+            async for text in self._stream_complete(
+                POST_ANALYSIS_TEMPLATE, self._post_inputs(post), self._post_analysis_prompt(post),
+                max_tokens=150, temperature=0.7, use_cache=use_cache
+            ):
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            yield f"Analysis unavailable: {str(e)}"
+            return
+        self._cache_analysis(post, "".join(chunks).strip())
+    
+    @staticmethod
+    def _post_analysis_prompt(post: Post) -> str:
+        return f"""
         Analyze this Threads post performance:
         
         Content: "{post.content[:500]}..."
@@ -94,57 +274,121 @@ class ContentAnalyzer:
         
         Keep response under 100 words, be direct and helpful.
         """
+    
+    async def analyze_posts(self, posts: List[Post], use_cache: bool = True) -> Dict[str, str]:
+        """Analyze several posts concurrently, packing up to batch_size posts into each prompt.
+        
+        Returns analyses keyed by thread_id. Posts a batch reply doesn't cover
+        (unparseable JSON, missing entries, API errors) fall back to
+        analyze_post_content; at most `concurrency` requests are in flight.
+        Batched analyses are cached per post, like single ones.
+        """
+        results = {post.thread_id: post.analysis_result for post in posts if self._is_analysis_cached(post)}
+        pending = [post for post in posts if post.thread_id not in results]
+        if self.cache is not None and use_cache:
+            keys = [LLMCache.make_key(LLM_MODEL, POST_ANALYSIS_TEMPLATE, self._post_inputs(post)) for post in pending]
+            for post, cached in zip(pending, await asyncio.gather(*(self.cache.get(key) for key in keys))):
+                if cached is not None:
+                    results[post.thread_id] = cached.strip()
+                    self._cache_analysis(post, cached.strip())
+            pending = [post for post in pending if post.thread_id not in results]
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+        
+        async def limited(call, *args):
+            async with semaphore:
+                return await call(*args)
+        
+        async def run_batch(batch: List[Post]):
+            analyses = await limited(self._analyze_batch, batch, use_cache) if len(batch) > 1 else {}
+            missing = [post for post in batch if post.thread_id not in analyses]
+            single = (limited(self.analyze_post_content, post, use_cache) for post in missing)
+            for post, analysis in zip(missing, await asyncio.gather(*single)):
+                analyses[post.thread_id] = analysis
+            results.update(analyses)
+        
+        batch_size = max(self.batch_size, 1)
+        await asyncio.gather(*(run_batch(pending[i:i + batch_size]) for i in range(0, len(pending), batch_size)))
+        return results
+    
+    async def _analyze_batch(self, posts: List[Post], use_cache: bool = True) -> Dict[str, str]:
+        """One structured prompt for several posts; returns the analyses it could parse, keyed by thread_id"""
+        listing = "\n".join(
+            f'{number}. Content: "{post.content[:500]}..." | Metrics: {post.likes} likes, '
+            f'{post.views} views, {post.engagement_rate}% engagement'
+            for number, post in enumerate(posts, 1)
+        )
+        prompt = f"""
+        Analyze the performance of each of these {len(posts)} Threads posts:
+        
+        {listing}
+        
+        For each post provide analysis covering:
+        1. Content type (educational/entertainment/personal/promotional)
+        2. Why it performed well/poorly (be specific)
+        3. One actionable improvement suggestion
+        
+        Keep each analysis under 100 words, be direct and helpful.
+        Respond with only a JSON array, one object per post in the same order:
+        [{{"post": 1, "analysis": "..."}}, ...]
+        """
         
         try:
             response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
+                model=LLM_MODEL,
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
+                max_tokens=150 * len(posts),
                 temperature=0.7
             )
-            
-            analysis = response.choices[0].message.content.strip()
-            self._cache_analysis(post, analysis)
-            return analysis
-            
-        except Exception as e:
-            return f"Analysis unavailable: {str(e)}"
+            items = self._parse_batch_response(response.choices[0].message.content)
+        except Exception:
+            return {}
+        
+        analyses = {}
+        for item in items:
+            number = item.get("post")
+            analysis = item.get("analysis")
+            if isinstance(number, int) and 1 <= number <= len(posts) and isinstance(analysis, str) and analysis.strip():
+                post = posts[number - 1]
+                analyses[post.thread_id] = analysis.strip()
+                self._cache_analysis(post, analysis.strip())
+        
+        if self.cache is not None and use_cache:
+            await asyncio.gather(*(
+                self.cache.set(
+                    LLMCache.make_key(LLM_MODEL, POST_ANALYSIS_TEMPLATE, self._post_inputs(post)),
+                    LLM_MODEL, POST_ANALYSIS_TEMPLATE, analyses[post.thread_id]
+                )
+                for post in posts if post.thread_id in analyses
+            ))
+        return analyses
+    
+    @staticmethod
+    def _parse_batch_response(content: str) -> List[Dict]:
+        """JSON array from a batch reply, tolerating code fences or text around it"""
+        start, end = content.find("["), content.rfind("]")
+        if start == -1 or end < start:
+            raise ValueError("No JSON array in response")
+        items = json.loads(content[start:end + 1])
+        if not isinstance(items, list):
+            raise ValueError("Response is not a JSON array")
+        return [item for item in items if isinstance(item, dict)]
     
-    def _analyze_content_patterns(self, posts: List[Post]) -> Dict:
+    def _analyze_content_patterns(self, sample: Dict) -> Dict:
         """Analyze posting patterns and themes"""
-        themes = []
-        patterns = {}
-        
-        # Analyze content themes based on keywords
-        for post in posts:
-            content = post.content.lower()
-            if any(word in content for word in ['personal', 'life', 'feel', 'think']):
-                themes.append('personal')
-            elif any(word in content for word in ['tip', 'how', 'learn', 'guide']):
-                themes.append('educational')
-            elif any(word in content for word in ['funny', 'lol', 'haha', 'joke']):
-                themes.append('entertainment')
-            else:
-                themes.append('general')
-        
-        # Calculate theme distribution
-        theme_counts = {theme: themes.count(theme) for theme in set(themes)}
-        total = len(themes)
-        theme_percentages = {theme: round((count/total)*100) for theme, count in theme_counts.items()}
+        patterns = f"{sample['total_posts']} posts analyzed"
+        if sample.get("busiest_weekday") is not None:
+            patterns += f", mostly on {WEEKDAYS[sample['busiest_weekday']]}s around {sample['busiest_hour']:02d}:00 UTC"
         
         return {
-            'themes': theme_percentages,
-            'patterns': f"{len(posts)} posts analyzed"
+            'themes': sample['themes'],
+            'patterns': patterns
         }
     
-    def _analyze_engagement_patterns(self, posts: List[Post]) -> str:
+    def _analyze_engagement_patterns(self, avg_engagement: Optional[float]) -> str:
         """Analyze what content performs best"""
-        if not posts:
+        if avg_engagement is None:
             return "Mysterious energy patterns"
         
-        best_post = max(posts, key=lambda p: p.engagement_rate)
-        avg_engagement = sum(p.engagement_rate for p in posts) / len(posts)
-        
         if avg_engagement > 5:
             return "High-vibrational content that deeply resonates"
         elif avg_engagement > 2:
@@ -182,31 +426,49 @@ class ContentAnalyzer:
 
 class MetricsCalculator:
     @staticmethod
-    def calculate_summary_stats(db: Session) -> Dict:
-        """Calculate overall analytics summary"""
-        posts = db.query(Post).all()
+    async def calculate_summary_stats(db: AsyncSession) -> Dict:
+        """Calculate overall analytics summary with SQL aggregates"""
+        total_posts, avg_engagement, total_views, total_likes = (await db.execute(
+            select(
+                func.count(Post.id),
+                func.avg(Post.engagement_rate),
+                func.coalesce(func.sum(Post.views), 0),
+                func.coalesce(func.sum(Post.likes), 0)
+            )
+        )).one()
         
-        if not posts:
+        if not total_posts:
             return {"total_posts": 0, "avg_engagement": 0, "best_post": None, "worst_post": None}
         
-        total_posts = len(posts)
-        avg_engagement = sum(p.engagement_rate for p in posts) / total_posts
-        best_post = max(posts, key=lambda p: p.engagement_rate)
-        worst_post = min(posts, key=lambda p: p.engagement_rate)
+        best_post = await MetricsCalculator._post_by_engagement(db, Post.engagement_rate.desc())
+        worst_post = await MetricsCalculator._post_by_engagement(db, Post.engagement_rate.asc())
         
         return {
             "total_posts": total_posts,
             "avg_engagement": round(avg_engagement, 2),
-            "total_views": sum(p.views for p in posts),
-            "total_likes": sum(p.likes for p in posts),
-            "best_post": {
-                "id": best_post.thread_id,
-                "content": best_post.content[:100] + "...",
-                "engagement_rate": best_post.engagement_rate
-            },
-            "worst_post": {
-                "id": worst_post.thread_id,
-                "content": worst_post.content[:100] + "...", 
-                "engagement_rate": worst_post.engagement_rate
-            }
-        }
\ No newline at end of file
+            "total_views": total_views,
+            "total_likes": total_likes,
+            "best_post": best_post,
+            "worst_post": worst_post
+        }
+    
+    @staticmethod
+    async def _post_by_engagement(db: AsyncSession, ordering) -> Dict:
+        """First post by engagement_rate (indexed), loading only the columns shown"""
+        thread_id, content_preview, engagement_rate = (await db.execute(
+            select(Post.thread_id, func.substr(func.coalesce(Post.content, ""), 1, 100), Post.engagement_rate)
+            .order_by(ordering, Post.id)
+            .limit(1)
+        )).one()
+        
+        return {
+            "id": thread_id,
+            "content": content_preview + "...",
+            "engagement_rate": engagement_rate
+        }
+    
+    @staticmethod
+    async def calculate_distribution(db: AsyncSession) -> Dict:
+        """Engagement percentiles, media type/hour/weekday distributions and outliers (columnar)"""
+        frame = await db.run_sync(PostFrame.load)
+        return frame.describe()
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""Incremental detection of posts whose view velocity is far above the account's norm.
+
+Every time sync writes a post's views, its velocity (views/hour since the
+last observation) updates an EWMA kept per post, and a baseline of log
+velocity per post-age bucket. A post is flagged when its smoothed velocity
+sits ANOMALY_Z_THRESHOLD standard deviations above the baseline for posts of
+its age. State is O(1) per post and per bucket; nothing rescans history.
+"""
+import math
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from models import Post, PostVelocity, VelocityBaseline
+from config import settings
+
+# Upper bounds (hours) of the post-age buckets; older posts share the last bucket
+AGE_BUCKET_HOURS = (1, 3, 6, 12, 24, 48, 96, 168, 336, 720)
+MIN_BASELINE_STD = 0.25  # log1p(views/hour); keeps z-scores sane while the baseline is flat
+MIN_AGE_HOURS = 1 / 60
+
+def age_bucket(age_hours: float) -> int:
+    return bisect_left(AGE_BUCKET_HOURS, age_hours)
+
+def _hours(delta: timedelta) -> float:
+    return delta.total_seconds() / 3600
+
+def _observe(baseline: VelocityBaseline, value: float, alpha: float):
+    """Exponentially weighted mean/variance update"""
+    if not baseline.samples:
+        baseline.mean, baseline.variance = value, 0.0
+    else:
+        diff = value - baseline.mean
+        increment = alpha * diff
+        baseline.mean += increment
+        baseline.variance = (1 - alpha) * (baseline.variance + diff * increment)
+    baseline.samples += 1
+
+def update_velocity(db: Session, rows: List[Dict], previous: Dict[str, Dict], post_ids: Dict[str, int], now: datetime) -> int:
+    """Fold one upsert batch's view counts into the velocity state; returns the number of posts flagged"""
+    states = {
+        state.post_id: state._asdict()
+        for state in db.execute(
+            select(
+                PostVelocity.post_id, PostVelocity.views, PostVelocity.observed_at,
+                PostVelocity.ewma_velocity, PostVelocity.samples
+            ).where(PostVelocity.post_id.in_(post_ids.values()))
+        )
+    }
+    baselines = {baseline.age_bucket: baseline for baseline in db.scalars(select(VelocityBaseline))}
+
+    inserts, updates = [], []
+    flagged = 0
+    for row in rows:
+        views = row.get("views")
+        post_id = post_ids.get(row["thread_id"])
+        before = previous.get(row["thread_id"])
+        created_at = before["created_at"] if before else row.get("created_at")
+        if views is None or post_id is None or created_at is None:
+            continue
+
+        state = states.get(post_id)
+        if state is None:
+            # First sighting: average velocity since publication
+            velocity = views / max(_hours(now - created_at), MIN_AGE_HOURS)
+            ewma = velocity
+        else:
+            elapsed = _hours(now - state["observed_at"])
+            if elapsed <= 0:
+                continue
+            velocity = max(views - state["views"], 0) / elapsed
+            ewma = settings.ANOMALY_EWMA_ALPHA * velocity + (1 - settings.ANOMALY_EWMA_ALPHA) * state["ewma_velocity"]
+
+        age_hours = _hours(now - created_at)
+        bucket = age_bucket(age_hours)
+        baseline = baselines.get(bucket)
+        if baseline is None:
+            baseline = baselines[bucket] = VelocityBaseline(age_bucket=bucket, samples=0, mean=0.0, variance=0.0)
+            db.add(baseline)
+
+        # Score against the baseline before this observation joins it
+        zscore = None
+        if baseline.samples >= settings.ANOMALY_MIN_BASELINE_SAMPLES:
+            std = max(math.sqrt(baseline.variance), MIN_BASELINE_STD)
+            zscore = (math.log1p(ewma) - baseline.mean) / std
+        _observe(baseline, math.log1p(velocity), settings.ANOMALY_BASELINE_ALPHA)
+
+        values = {"post_id": post_id, "views": views, "observed_at": now, "ewma_velocity": ewma, "zscore": zscore}
+        # A first sighting only averages velocity since publication, which says
+        # nothing about an old post taking off now, so it can't alert on its own
+        fresh = state is not None or age_hours <= AGE_BUCKET_HOURS[4]
+        if fresh and zscore is not None and zscore >= settings.ANOMALY_Z_THRESHOLD:
+            values["alerted_at"] = now
+            flagged += 1
+        if state is None:
+            inserts.append({"samples": 1, "alerted_at": None, **values})
+        else:
+            updates.append({"samples": state["samples"] + 1, **values})
+
+    if inserts:
+        db.execute(insert(PostVelocity), inserts)
+    if updates:
+        # Bulk UPDATE by primary key; rows must share keys, so split by whether they alert
+        for batch in ([u for u in updates if "alerted_at" in u], [u for u in updates if "alerted_at" not in u]):
+            if batch:
+                db.execute(update(PostVelocity), batch)
+    return flagged
+
+def get_alerts(db: Session, since: datetime, limit: int = 50) -> List[Dict]:
+    """Posts flagged since `since`, strongest first"""
+    query = (
+        select(
+            Post.thread_id, Post.created_at, Post.views, PostVelocity.ewma_velocity,
+            PostVelocity.zscore, PostVelocity.alerted_at
+        )
+        .join(PostVelocity, PostVelocity.post_id == Post.id)
+        .where(PostVelocity.alerted_at >= since)
+        .order_by(PostVelocity.zscore.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "thread_id": row.thread_id,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "views": row.views,
+            "views_per_hour": round(row.ewma_velocity, 2),
+            "zscore": round(row.zscore, 2) if row.zscore is not None else None,
+            "alerted_at": row.alerted_at.isoformat()
+        }
+        for row in db.execute(query)
+    ]
\ No newline at end of file
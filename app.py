@@ -1,18 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+import logging
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+from zoneinfo import ZoneInfoNotFoundError
 
-from database import get_db, create_tables
-from models import Post, Analytics
+from database import (
+    get_async_db, get_async_read_db, get_async_session_factory, create_tables, AsyncSessionLocal,
+    select_posts_with_text
+)
+from models import Post, Analytics, CreatorPortrait
 from data_collector import ThreadsAPIClient
-from analytics import ContentAnalyzer, MetricsCalculator
+from analytics import PORTRAIT_TEMPLATE, ContentAnalyzer, MetricsCalculator
+from llm_cache import LLMCache
+from sampling import sample_posts
+from portraits import get_stored_portrait, portrait_fingerprint, save_portrait, serialize_portrait
 from content_generator import ShareableContentGenerator
+from streaming import sse_event
+from sync_service import SyncService
+from sync_jobs import SyncJobManager, serialize_job
+from timeseries import get_post_timeseries
+from rollups import get_daily_rollups
+from sketches import SKETCH_METRICS, get_quantiles
+from heatmap import get_heatmap, utc_offset_hours
+from anomaly import get_alerts
+from similarity import get_similar_posts
+from terms import TERM_KINDS, get_term_performance
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 # Initialize FastAPI app
 app = FastAPI(title="Threads Fortune Teller", version="1.0.0")
 
@@ -22,14 +43,24 @@ templates = Jinja2Templates(directory="templates")
 
 # Initialize services
 threads_client = ThreadsAPIClient()
-content_analyzer = ContentAnalyzer()
+content_analyzer = ContentAnalyzer(cache=LLMCache(AsyncSessionLocal))
 metrics_calculator = MetricsCalculator()
 content_generator = ShareableContentGenerator()
+sync_service = SyncService(threads_client)
+sync_jobs = SyncJobManager(sync_service)
 
 # Create database tables on startup
 @app.on_event("startup")
 async def startup_event():
-    create_tables()
+    upgrade = create_tables()
+    if any(upgrade.values()):
+        logger.info("Upgraded database schema: %s", upgrade)
+    async with AsyncSessionLocal() as db:
+        await sync_jobs.recover_interrupted(db)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await threads_client.aclose()
 
 @app.get("/", response_class=HTMLResponse)
 async def fortune_teller_home(request: Request):
@@ -37,9 +68,9 @@ async def fortune_teller_home(request: Request):
     return templates.TemplateResponse("fortune_teller.html", {"request": request})
 
 @app.get("/api/posts")
-async def get_posts(db: Session = Depends(get_db)):
+async def get_posts(db: AsyncSession = Depends(get_async_read_db)):
     """Get all posts with metrics"""
-    posts = db.query(Post).all()
+    posts = (await db.scalars(select_posts_with_text())).all()
     return [
         {
             "thread_id": post.thread_id,
@@ -58,62 +89,138 @@ async def get_posts(db: Session = Depends(get_db)):
         for post in posts
     ]
 
+@app.get("/api/posts/{thread_id}/timeseries")
+async def get_post_metrics_history(
+    thread_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get the metric snapshot history of a post"""
+    post_id = await db.scalar(select(Post.id).where(Post.thread_id == thread_id))
+    if post_id is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    snapshots = await db.run_sync(get_post_timeseries, post_id, start, end)
+    return {"thread_id": thread_id, "snapshots": snapshots}
+
+@app.get("/api/posts/{thread_id}/similar")
+async def get_similar(
+    thread_id: str,
+    k: int = Query(10, ge=1, le=100),
+    min_similarity: float = Query(0.0, ge=0, le=1),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get posts with similar content and how they performed"""
+    post_id = await db.scalar(select(Post.id).where(Post.thread_id == thread_id))
+    if post_id is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    similar = await db.run_sync(get_similar_posts, post_id, k, min_similarity)
+    return {"thread_id": thread_id, "similar": similar}
+
 @app.get("/api/analytics")
-async def get_analytics(db: Session = Depends(get_db)):
+async def get_analytics(db: AsyncSession = Depends(get_async_read_db)):
     """Get summary analytics"""
-    return metrics_calculator.calculate_summary_stats(db)
+    return await metrics_calculator.calculate_summary_stats(db)
+
+@app.get("/api/analytics/distribution")
+async def get_analytics_distribution(db: AsyncSession = Depends(get_async_read_db)):
+    """Get engagement percentiles and distributions by media type, hour and weekday"""
+    return await metrics_calculator.calculate_distribution(db)
 
-@app.post("/api/sync")
-async def sync_data(db: Session = Depends(get_db)):
-    """Sync data from Threads API"""
+@app.get("/api/analytics/daily")
+async def get_daily_analytics(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    media_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get per-day analytics from the incrementally maintained rollups"""
+    days = await db.run_sync(get_daily_rollups, start, end, media_type)
+    return {"from": start, "to": end, "media_type": media_type, "days": days}
+
+@app.get("/api/analytics/quantiles")
+async def get_analytics_quantiles(
+    metric: str = "engagement_rate",
+    q: str = "0.5,0.9,0.99",
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    histogram: int = 0,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get approximate quantiles of a metric from the per-day sketches"""
+    if metric not in SKETCH_METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(SKETCH_METRICS)}")
     try:
-        # Fetch posts from Threads API
-        media_data = await threads_client.get_user_media(limit=50)
-        
-        for media in media_data:
-            # Check if post already exists
-            existing_post = db.query(Post).filter(Post.thread_id == media["id"]).first()
-            
-            if existing_post:
-                # Update existing post metrics
-                insights = await threads_client.get_media_insights(media["id"])
-                existing_post.views = insights.get("views", 0)
-                existing_post.likes = insights.get("likes", 0)
-                existing_post.replies = insights.get("replies", 0)
-                existing_post.reposts = insights.get("reposts", 0)
-                existing_post.shares = insights.get("shares", 0)
-                existing_post.engagement_rate = threads_client.calculate_engagement_rate(insights)
-                existing_post.updated_at = datetime.utcnow()
-            else:
-                # Create new post
-                insights = await threads_client.get_media_insights(media["id"])
-                
-                new_post = Post(
-                    thread_id=media["id"],
-                    content=media.get("text", ""),
-                    media_type=media.get("media_type", "TEXT"),
-                    created_at=datetime.fromisoformat(media["timestamp"].replace("Z", "+00:00")),
-                    views=insights.get("views", 0),
-                    likes=insights.get("likes", 0),
-                    replies=insights.get("replies", 0),
-                    reposts=insights.get("reposts", 0),
-                    shares=insights.get("shares", 0),
-                    engagement_rate=threads_client.calculate_engagement_rate(insights)
-                )
-                
-                db.add(new_post)
-        
-        db.commit()
-        return {"status": "success", "message": f"Synced {len(media_data)} posts"}
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
+        quantiles = [float(value) for value in q.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="q must be comma-separated numbers between 0 and 1")
+    if not quantiles or any(not 0 <= value <= 1 for value in quantiles):
+        raise HTTPException(status_code=400, detail="q must be comma-separated numbers between 0 and 1")
+    
+    return await db.run_sync(get_quantiles, metric, quantiles, start, end, histogram)
+
+@app.get("/api/analytics/heatmap")
+async def get_analytics_heatmap(
+    tz: str = "UTC",
+    media_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get the best-time-to-post grid (weekday x hour) in the given timezone"""
+    try:
+        utc_offset_hours(tz)
+    except (ValueError, ZoneInfoNotFoundError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {tz}")
+    
+    return await db.run_sync(get_heatmap, tz, media_type)
+
+@app.get("/api/analytics/terms")
+async def get_analytics_terms(
+    min_support: int = Query(5, ge=1),
+    limit: int = Query(20, ge=1, le=200),
+    kind: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get the words, hashtags and emoji with the highest and lowest engagement lift"""
+    if kind is not None and kind not in TERM_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(TERM_KINDS)}")
+    
+    return await db.run_sync(get_term_performance, min_support, limit, kind)
+
+@app.get("/api/alerts")
+async def get_velocity_alerts(
+    hours: int = settings.ALERT_WINDOW_HOURS,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get posts whose view velocity is far above the baseline for their age"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    return {"since": since.isoformat(), "alerts": await db.run_sync(get_alerts, since, limit)}
+
+@app.post("/api/sync", status_code=202)
+async def sync_data(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    session_factory = Depends(get_async_session_factory)
+):
+    """Enqueue a background sync from Threads API (or join the one already running)"""
+    job, created = await sync_jobs.submit(db, threads_client.user_id)
+    if created:
+        background_tasks.add_task(sync_jobs.run, job.id, session_factory)
+    
+    return {**serialize_job(job), "joined_existing": not created}
+
+@app.get("/api/sync/{job_id}")
+async def get_sync_job(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get status and progress of a sync job"""
+    job = await sync_jobs.get(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return serialize_job(job)
 
 @app.post("/api/analyze")
 async def analyze_posts(
-    request: dict,  # {"post_ids": ["id1", "id2", ...]}
-    db: Session = Depends(get_db)
+    request: dict,  # {"post_ids": ["id1", "id2", ...], "use_cache": true}
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Analyze selected posts with LLM"""
     post_ids = request.get("post_ids", [])
@@ -126,17 +233,16 @@ async def analyze_posts(
         post_ids = post_ids[:settings.MAX_POSTS_PER_ANALYSIS]
     
     try:
-        analyzed_count = 0
+        posts = (await db.scalars(select_posts_with_text().where(Post.thread_id.in_(post_ids)))).all()
         
-        for post_id in post_ids:
-            post = db.query(Post).filter(Post.thread_id == post_id).first()
-            if post:
-                analysis = await content_analyzer.analyze_post_content(post)
-                post.analysis_result = analysis
-                post.analysis_date = datetime.utcnow()
-                analyzed_count += 1
+        # Concurrent, batched LLM calls: roughly one round-trip of wall time per request
+        analyses = await content_analyzer.analyze_posts(posts, use_cache=request.get("use_cache", True))
+        for post in posts:
+            post.analysis_result = analyses[post.thread_id]
+            post.analysis_date = datetime.utcnow()
+        analyzed_count = len(posts)
         
-        db.commit()
+        await db.commit()
         return {
             "status": "success", 
             "message": f"Analyzed {analyzed_count} posts",
@@ -144,25 +250,42 @@ async def analyze_posts(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @app.post("/api/generate-portrait")
-async def generate_creator_portrait(db: Session = Depends(get_db)):
-    """Generate mystical creator portrait"""
+async def generate_creator_portrait(force: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Generate mystical creator portrait (served from storage until the posts change, unless force=true)"""
     try:
-        posts = db.query(Post).all()
+        fingerprint = await portrait_fingerprint(db, PORTRAIT_TEMPLATE)
         
-        if not posts:
+        if fingerprint is None:
             raise HTTPException(status_code=400, detail="No posts found. Please sync data first.")
         
-        # Generate the creator portrait
-        portrait = await content_analyzer.generate_creator_portrait(posts)
+        if not force:
+            stored = await get_stored_portrait(db, fingerprint)
+            if stored:
+                return serialize_portrait(stored, cached=True)
         
-        # Generate shareable content
-        ig_story_image = content_generator.generate_ig_story_image(portrait)
-        share_urls = content_generator.generate_share_urls(portrait)
+        # Bounded, token-budgeted sample instead of every post
+        sample = await db.run_sync(sample_posts)
         
+        # Generate the creator portrait
+        portrait = await content_analyzer.generate_creator_portrait(sample, use_cache=not force)
+        return await _share_portrait(db, fingerprint, portrait)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Portrait generation failed: {str(e)}")
+
+async def _share_portrait(db: AsyncSession, fingerprint: str, portrait: Dict) -> Dict:
+    """Render the shareable content for a new portrait and store it"""
+    ig_story_image = content_generator.generate_ig_story_image(portrait)
+    share_urls = content_generator.generate_share_urls(portrait)
+    
+    # The fallback portrait (LLM unavailable) is not stored, so the next request retries
+    if not portrait.get("total_posts"):
         return {
             "status": "success",
             "portrait": portrait,
@@ -171,20 +294,109 @@ async def generate_creator_portrait(db: Session = Depends(get_db)):
                 "share_urls": share_urls
             }
         }
+    
+    stored = await save_portrait(db, fingerprint, portrait, ig_story_image, share_urls)
+    return serialize_portrait(stored, cached=False)
+
+# Server-sent events; no proxy buffering, or nothing arrives until the stream ends
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/api/generate-portrait/stream")
+async def stream_creator_portrait(force: bool = False, session_factory = Depends(get_async_session_factory)):
+    """Generate the creator portrait as server-sent events.
+    
+    `field` events carry each portrait field as soon as the model has written
+    it, and a final `portrait` event the full portrait with the rendered
+    share image (the /api/generate-portrait response). A stored portrait is
+    replayed the same way. Failures after the stream starts arrive as an
+    `error` event.
+    """
+    async with session_factory() as db:
+        fingerprint = await portrait_fingerprint(db, PORTRAIT_TEMPLATE)
+        stored = await get_stored_portrait(db, fingerprint) if fingerprint and not force else None
+    
+    if fingerprint is None:
+        raise HTTPException(status_code=400, detail="No posts found. Please sync data first.")
+    
+    async def events() -> AsyncIterator[str]:
+        if stored:
+            for name, value in stored.portrait.items():
+                yield sse_event("field", {"name": name, "value": value})
+            yield sse_event("portrait", serialize_portrait(stored, cached=True))
+            return
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Portrait generation failed: {str(e)}")
+        try:
+            async with session_factory() as db:
+                sample = await db.run_sync(sample_posts)
+                yield sse_event("status", {"total_posts": sample["total_posts"], "sampled_posts": len(sample["posts"])})
+                
+                async for event, data in content_analyzer.stream_creator_portrait(sample, use_cache=not force):
+                    if event == "field":
+                        yield sse_event("field", data)
+                    else:
+                        portrait = data
+                yield sse_event("portrait", await _share_portrait(db, fingerprint, portrait))
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Portrait generation failed: {str(e)}"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/api/posts/{thread_id}/analysis/stream")
+async def stream_post_analysis(
+    thread_id: str,
+    use_cache: bool = True,
+    session_factory = Depends(get_async_session_factory)
+):
+    """Analyze one post as server-sent events: `token` events with the text as the model writes it,
+    then `done` with the full analysis once it's saved on the post, or `error` if the model call failed"""
+    async with session_factory() as db:
+        exists = await db.scalar(select(Post.id).where(Post.thread_id == thread_id))
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    
+    async def events() -> AsyncIterator[str]:
+        try:
+            async with session_factory() as db:
+                post = await db.scalar(select_posts_with_text().where(Post.thread_id == thread_id))
+                chunks = []
+                async for text in content_analyzer.stream_post_analysis(post, use_cache=use_cache):
+                    chunks.append(text)
+                    yield sse_event("token", {"text": text})
+                analysis = "".join(chunks).strip()
+                if post.analysis_result != analysis:
+                    # Not saved: the analyzer ended with its "Analysis unavailable" text
+                    yield sse_event("error", {"detail": analysis})
+                    return
+                await db.commit()
+                yield sse_event("done", {"thread_id": thread_id, "analysis": analysis})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.get("/api/share-content/{portrait_id}")
-async def get_shareable_content(portrait_id: str):
+async def get_shareable_content(portrait_id: str, db: AsyncSession = Depends(get_async_read_db)):
     """Get pre-generated shareable content"""
-    # In a real app, you'd store portraits and retrieve by ID
-    # For MVP, we'll return a sample
+    stored = await db.get(CreatorPortrait, portrait_id)
+    if stored:
+        return {
+            "threads_text": content_generator.generate_threads_post_text(stored.portrait),
+            "ig_story_url": stored.ig_story_image
+        }
+    
+    # Unknown or pruned portrait: return a sample
     return {
         "threads_text": "🔮 Just discovered my Creator DNA! ✨ Your content resonates with the frequency of authenticity ✨",
         "ig_story_url": "/static/sample-story.png"
     }
 
+@app.get("/api/llm-cache/stats")
+async def get_llm_cache_stats():
+    """Get LLM response cache hit/miss counters for this process"""
+    if content_analyzer.cache is None:
+        return {"enabled": False}
+    return content_analyzer.cache.stats()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
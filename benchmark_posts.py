@@ -0,0 +1,80 @@
+"""Benchmark metric-only scans over a large posts table.
+
+Compares loading full Post rows with the text columns (the old default),
+Post entities with text deferred, and the column-projected metrics query.
+
+    python benchmark_posts.py --posts 500000 --content-bytes 1000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from database import create_db_engine, select_post_metrics, select_posts_with_text
+from models import MEDIA_TYPES, Base, Post
+
+def _populate(db: Session, posts: int, content_bytes: int, batch_size: int = 10_000):
+    rng = random.Random(0)
+    created_at = datetime(2024, 1, 1)
+    text = "x" * content_bytes
+    for start in range(0, posts, batch_size):
+        db.execute(insert(Post), [
+            {
+                "thread_id": f"post_{i}",
+                "content": text,
+                "media_type": rng.choice(MEDIA_TYPES),
+                "created_at": created_at + timedelta(minutes=i),
+                "updated_at": created_at,
+                "views": rng.randint(0, 100_000),
+                "likes": rng.randint(0, 5_000),
+                "replies": rng.randint(0, 500),
+                "reposts": rng.randint(0, 200),
+                "shares": rng.randint(0, 100),
+                "engagement_rate": rng.random() * 10,
+                "analysis_result": text
+            }
+            for i in range(start, min(start + batch_size, posts))
+        ])
+    db.commit()
+
+def _time(db: Session, scan: Callable[[Session], int], repeat: int) -> Dict:
+    timings = []
+    for _ in range(repeat):
+        db.expunge_all()
+        started = time.perf_counter()
+        checksum = scan(db)
+        timings.append(time.perf_counter() - started)
+    return {"views_checksum": checksum, "best_seconds": round(min(timings), 3)}
+
+SCANS = {
+    "entities_with_text": lambda db: sum(post.views for post in db.scalars(select_posts_with_text())),
+    "entities_text_deferred": lambda db: sum(post.views for post in db.scalars(select(Post))),
+    "projected_metrics": lambda db: sum(row.views for row in db.execute(select_post_metrics())),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500_000)
+    parser.add_argument("--content-bytes", type=int, default=1000, help="size of content and analysis_result")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            _populate(db, args.posts, args.content_bytes)
+            results = {name: _time(db, scan, args.repeat) for name, scan in SCANS.items()}
+        engine.dispose()
+
+    baseline = results["entities_with_text"]["best_seconds"]
+    for result in results.values():
+        result["speedup"] = round(baseline / result["best_seconds"], 1) if result["best_seconds"] else None
+    print(json.dumps({"posts": args.posts, "content_bytes": args.content_bytes, "scans": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,172 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from sqlalchemy.orm import Session
+from database import select_post_metrics
+from models import DEFAULT_MEDIA_TYPE, MEDIA_TYPES
+
+COUNTER_METRICS = ("views", "likes", "replies", "reposts", "shares")
+PERCENTILES = (25, 50, 75, 90, 99)
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+MISSING_TIMESTAMP = np.iinfo(np.int64).min  # NaT as int64
+
+def engagement_rates(views, likes, replies, reposts, shares) -> np.ndarray:
+    """Vectorized ThreadsAPIClient.calculate_engagement_rate: interactions / views * 100, 0 without views"""
+    views = np.asarray(views, dtype=np.float64)
+    interactions = np.asarray(likes, dtype=np.float64) + replies + reposts + shares
+    rates = np.divide(interactions, views, out=np.zeros_like(views), where=views > 0)
+    return np.round(rates * 100, 2)
+
+def zscores(values: np.ndarray) -> np.ndarray:
+    """Standard scores of values (all zeros when they don't vary)"""
+    std = values.std()
+    if not std:
+        return np.zeros_like(values, dtype=np.float64)
+    return (values - values.mean()) / std
+
+class PostFrame:
+    """Post metrics as parallel NumPy columns for vectorized analytics"""
+
+    def __init__(
+        self,
+        thread_ids: Sequence[str],
+        counters: Dict[str, np.ndarray],
+        engagement: np.ndarray,
+        created_at: np.ndarray,
+        media_codes: np.ndarray,
+        media_types: Sequence[str]
+    ):
+        self.thread_ids = np.asarray(thread_ids, dtype=object)
+        self.views = counters["views"]
+        self.likes = counters["likes"]
+        self.replies = counters["replies"]
+        self.reposts = counters["reposts"]
+        self.shares = counters["shares"]
+        self.engagement = engagement
+        self.created_at = created_at  # int64 seconds since the epoch (UTC), MISSING_TIMESTAMP if unknown
+        self.media_codes = media_codes  # index into media_types
+        self.media_types = tuple(media_types)
+
+    def __len__(self) -> int:
+        return len(self.thread_ids)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Sequence]) -> "PostFrame":
+        """Build from column lists keyed by Post attribute name (engagement_rate is computed if absent)"""
+        counters = {
+            metric: np.fromiter((value or 0 for value in columns[metric]), dtype=np.int64, count=len(columns[metric]))
+            for metric in COUNTER_METRICS
+        }
+        if "engagement_rate" in columns:
+            engagement = np.fromiter(
+                (value or 0.0 for value in columns["engagement_rate"]),
+                dtype=np.float64, count=len(columns["engagement_rate"])
+            )
+        else:
+            engagement = engagement_rates(*(counters[metric] for metric in COUNTER_METRICS))
+
+        created_at = np.array(columns["created_at"], dtype="datetime64[s]").astype(np.int64)
+
+        media_types = list(MEDIA_TYPES)
+        codes = {media_type: code for code, media_type in enumerate(media_types)}
+        media_codes = np.empty(len(columns["media_type"]), dtype=np.int16)
+        for i, media_type in enumerate(columns["media_type"]):
+            media_type = media_type or DEFAULT_MEDIA_TYPE
+            if media_type not in codes:
+                codes[media_type] = len(media_types)
+                media_types.append(media_type)
+            media_codes[i] = codes[media_type]
+
+        return cls(columns["thread_id"], counters, engagement, created_at, media_codes, media_types)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, fields: Sequence[str]) -> "PostFrame":
+        """Build from result tuples whose columns are named by `fields`"""
+        rows = list(rows)
+        transposed = list(zip(*rows)) if rows else [() for _ in fields]
+        return cls.from_columns(dict(zip(fields, transposed)))
+
+    @classmethod
+    def from_posts(cls, posts: Sequence) -> "PostFrame":
+        """Build from already loaded Post objects"""
+        fields = ("thread_id", "media_type", "created_at", "engagement_rate", *COUNTER_METRICS)
+        return cls.from_columns({field: [getattr(post, field) for post in posts] for field in fields})
+
+    @classmethod
+    def load(cls, db: Session) -> "PostFrame":
+        """Load every post's metrics with one projected query (no text columns)"""
+        result = db.execute(select_post_metrics())
+        return cls.from_rows(result, list(result.keys()))
+
+    @property
+    def has_created_at(self) -> np.ndarray:
+        return self.created_at != MISSING_TIMESTAMP
+
+    def hours(self) -> np.ndarray:
+        """UTC hour of day (0-23) of each dated post"""
+        return (self.created_at[self.has_created_at] // 3600) % 24
+
+    def weekdays(self) -> np.ndarray:
+        """UTC weekday (Monday = 0) of each dated post"""
+        return (self.created_at[self.has_created_at] // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+
+    def percentiles(self, values: Optional[np.ndarray] = None, percentiles: Sequence[int] = PERCENTILES) -> Dict[str, float]:
+        values = self.engagement if values is None else values
+        if not len(values):
+            return {f"p{p}": 0.0 for p in percentiles}
+        return {f"p{p}": round(float(v), 2) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+
+    def _grouped(self, codes: np.ndarray, engagement: np.ndarray, views: np.ndarray, size: int) -> List[Dict]:
+        """Post count, average engagement and views per group code"""
+        posts = np.bincount(codes, minlength=size)
+        engagement_sum = np.bincount(codes, weights=engagement, minlength=size)
+        views_sum = np.bincount(codes, weights=views, minlength=size)
+        avg = np.divide(engagement_sum, posts, out=np.zeros(size), where=posts > 0)
+        return [
+            {"posts": int(posts[i]), "avg_engagement": round(float(avg[i]), 2), "total_views": int(views_sum[i])}
+            for i in range(size)
+        ]
+
+    def by_media_type(self) -> Dict[str, Dict]:
+        groups = self._grouped(self.media_codes, self.engagement, self.views, len(self.media_types))
+        return {media_type: group for media_type, group in zip(self.media_types, groups) if group["posts"]}
+
+    def by_hour(self) -> List[Dict]:
+        dated = self.has_created_at
+        return self._grouped(self.hours(), self.engagement[dated], self.views[dated], 24)
+
+    def by_weekday(self) -> List[Dict]:
+        dated = self.has_created_at
+        groups = self._grouped(self.weekdays(), self.engagement[dated], self.views[dated], 7)
+        return [{"weekday": name, **group} for name, group in zip(WEEKDAYS, groups)]
+
+    def outliers(self, threshold: float = 2.0, limit: int = 10) -> List[Dict]:
+        """Posts whose engagement z-score exceeds the threshold, strongest first"""
+        scores = zscores(self.engagement)
+        flagged = np.flatnonzero(np.abs(scores) >= threshold)
+        flagged = flagged[np.argsort(-np.abs(scores[flagged]), kind="stable")][:limit]
+        return [
+            {"thread_id": self.thread_ids[i], "engagement_rate": float(self.engagement[i]), "zscore": round(float(scores[i]), 2)}
+            for i in flagged
+        ]
+
+    def describe(self) -> Dict:
+        """Totals, engagement percentiles, distributions by media type/hour/weekday and outliers"""
+        if not len(self):
+            return {"total_posts": 0}
+
+        return {
+            "total_posts": len(self),
+            "totals": {metric: int(getattr(self, metric).sum()) for metric in COUNTER_METRICS},
+            "engagement": {
+                "mean": round(float(self.engagement.mean()), 2),
+                "std": round(float(self.engagement.std()), 2),
+                "min": float(self.engagement.min()),
+                "max": float(self.engagement.max()),
+                **self.percentiles()
+            },
+            "by_media_type": self.by_media_type(),
+            "by_hour": self.by_hour(),
+            "by_weekday": self.by_weekday(),
+            "outliers": self.outliers()
+        }
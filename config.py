@@ -7,12 +7,77 @@ class Settings:
     # Threads API
     THREADS_ACCESS_TOKEN = os.getenv("THREADS_ACCESS_TOKEN", "")
     THREADS_USER_ID = os.getenv("THREADS_USER_ID", "")
+    THREADS_API_BASE_URL = os.getenv("THREADS_API_BASE_URL", "https://graph.threads.net")
+    
+    # Record real API responses to / replay them from a fixtures directory
+    THREADS_RECORD_DIR = os.getenv("THREADS_RECORD_DIR", "")
+    THREADS_REPLAY_DIR = os.getenv("THREADS_REPLAY_DIR", "")
+    
+    # Threads HTTP client (connection pooling / concurrency)
+    THREADS_HTTP2 = os.getenv("THREADS_HTTP2", "true").lower() == "true"
+    THREADS_MAX_CONNECTIONS = int(os.getenv("THREADS_MAX_CONNECTIONS", "20"))
+    THREADS_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("THREADS_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    THREADS_KEEPALIVE_EXPIRY = float(os.getenv("THREADS_KEEPALIVE_EXPIRY", "30"))
+    THREADS_REQUEST_TIMEOUT = float(os.getenv("THREADS_REQUEST_TIMEOUT", "15"))
+    SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "10"))
+    
+    # Threads API quotas (requests/second and burst size per endpoint)
+    THREADS_MEDIA_RATE = float(os.getenv("THREADS_MEDIA_RATE", "5"))
+    THREADS_MEDIA_BURST = float(os.getenv("THREADS_MEDIA_BURST", "10"))
+    THREADS_INSIGHTS_RATE = float(os.getenv("THREADS_INSIGHTS_RATE", "20"))
+    THREADS_INSIGHTS_BURST = float(os.getenv("THREADS_INSIGHTS_BURST", "40"))
+    THREADS_USAGE_SOFT_LIMIT = float(os.getenv("THREADS_USAGE_SOFT_LIMIT", "75"))  # % of quota before throttling
+    THREADS_MAX_RETRIES = int(os.getenv("THREADS_MAX_RETRIES", "5"))
+    THREADS_BACKOFF_BASE = float(os.getenv("THREADS_BACKOFF_BASE", "0.5"))
+    THREADS_BACKOFF_MAX = float(os.getenv("THREADS_BACKOFF_MAX", "30"))
+    
+    # Sync paging (0 = no limit)
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "50"))
+    SYNC_MAX_PAGES = int(os.getenv("SYNC_MAX_PAGES", "0"))
+    SYNC_MAX_AGE_DAYS = int(os.getenv("SYNC_MAX_AGE_DAYS", "0"))
+    SYNC_REFRESH_LIMIT = int(os.getenv("SYNC_REFRESH_LIMIT", "200"))  # Max metric refreshes per sync
+    SYNC_UPSERT_BATCH_SIZE = int(os.getenv("SYNC_UPSERT_BATCH_SIZE", "500"))
+    SYNC_JOB_STALE_MINUTES = float(os.getenv("SYNC_JOB_STALE_MINUTES", "15"))  # Active jobs without a heartbeat this long are presumed dead
     
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "5"))  # Concurrent OpenAI requests per analysis
+    LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "5"))  # Posts packed into one prompt; 1 disables batching
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", str(30 * 24)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))  # Least recently used are evicted beyond this
+    PORTRAIT_TOKEN_BUDGET = int(os.getenv("PORTRAIT_TOKEN_BUDGET", "1200"))  # Prompt tokens for sampled posts
+    PORTRAIT_MAX_SAMPLE_POSTS = int(os.getenv("PORTRAIT_MAX_SAMPLE_POSTS", "30"))
     
     # Database
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data.db")
+    DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")  # Optional read-only engine for GET endpoints
+    
+    # SQLite connection pragmas (applied on every new connection)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # negative = KiB
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+    
+    # Connection pool (server databases such as Postgres)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    
+    # Best-time heatmap: pseudo-posts at the overall mean added to every slot's score
+    HEATMAP_PRIOR_POSTS = float(os.getenv("HEATMAP_PRIOR_POSTS", "5"))
+    
+    # Viral/anomaly alerts on view velocity
+    ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.5"))  # Per-post smoothing
+    ANOMALY_BASELINE_ALPHA = float(os.getenv("ANOMALY_BASELINE_ALPHA", "0.02"))  # Baseline forgetting rate
+    ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3"))
+    ANOMALY_MIN_BASELINE_SAMPLES = int(os.getenv("ANOMALY_MIN_BASELINE_SAMPLES", "30"))
+    ALERT_WINDOW_HOURS = int(os.getenv("ALERT_WINDOW_HOURS", "24"))
+    
+    # JSON file of {"theme": ["keyword", ...]} replacing the built-in theme lexicon
+    THEME_LEXICON_PATH = os.getenv("THEME_LEXICON_PATH", "")
     
     # Analysis limits (cost control)
     MAX_POSTS_PER_ANALYSIS = 10
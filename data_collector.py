@@ -1,27 +1,166 @@
+import asyncio
 import httpx
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from config import settings
+from models import DEFAULT_MEDIA_TYPE, GRAPH_MEDIA_TYPES
+from rate_limiter import RETRY_STATUS_CODES, RequestScheduler, is_rate_limited
+
+MEDIA_FIELDS = "id,media_type,media_url,permalink,username,text,timestamp,is_quote_post"
+
+def is_media_error(error: httpx.HTTPStatusError) -> bool:
+    """A client error about one media object (deleted, or no insights for it), not a throttled or failing API"""
+    response = error.response
+    return 400 <= response.status_code < 500 and response.status_code not in RETRY_STATUS_CODES and not is_rate_limited(response)
+
+def normalize_media_type(value: Optional[str]) -> str:
+    """Post.media_type for a Graph API media_type (TEXT_POST -> TEXT, CAROUSEL_ALBUM -> CAROUSEL)"""
+    if not value:
+        return DEFAULT_MEDIA_TYPE
+    return GRAPH_MEDIA_TYPES.get(value, value)
+
+def parse_media_timestamp(value: str) -> datetime:
+    """Parse a Graph API timestamp into a naive UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
 class ThreadsAPIClient:
-    def __init__(self):
-        self.base_url = "https://graph.threads.net"
+    def __init__(self, scheduler: Optional[RequestScheduler] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = settings.THREADS_API_BASE_URL.rstrip("/")
         self.access_token = settings.THREADS_ACCESS_TOKEN
         self.user_id = settings.THREADS_USER_ID
+        self.concurrency = settings.SYNC_CONCURRENCY
+        self.scheduler = scheduler or RequestScheduler.from_settings()
+        self._transport = transport or self._fixture_transport()
+        self._client: Optional[httpx.AsyncClient] = None
     
-    async def get_user_media(self, limit: int = 25) -> List[Dict]:
-        """Fetch user's posts/media"""
+    @staticmethod
+    def _fixture_transport() -> Optional[httpx.AsyncBaseTransport]:
+        """Record/replay transport when configured (see fake_threads_api)"""
+        if settings.THREADS_REPLAY_DIR:
+            from fake_threads_api import ReplayTransport
+            return ReplayTransport(settings.THREADS_REPLAY_DIR)
+        if settings.THREADS_RECORD_DIR:
+            from fake_threads_api import RecordingTransport
+            return RecordingTransport(settings.THREADS_RECORD_DIR)
+        return None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared pooled HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=settings.THREADS_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=settings.THREADS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.THREADS_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.THREADS_KEEPALIVE_EXPIRY
+                ),
+                timeout=settings.THREADS_REQUEST_TIMEOUT,
+                transport=self._transport
+            )
+        return self._client
+    
+    async def _get(self, endpoint: str, url: str, params: Dict) -> httpx.Response:
+        """GET through the rate-limit scheduler, raising once retries are exhausted"""
+        response = await self.scheduler.send(endpoint, lambda: self._get_client().get(url, params=params))
+        response.raise_for_status()
+        return response
+    
+    async def aclose(self):
+        """Close the pooled HTTP client and its keep-alive connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def get_user_media_page(
+        self,
+        limit: int = 25,
+        after: Optional[str] = None,
+        since: Optional[datetime] = None
+    ) -> Dict:
+        """Fetch one page of user's posts/media, including its paging cursors"""
         url = f"{self.base_url}/{self.user_id}/threads"
         params = {
-            "fields": "id,media_type,media_url,permalink,username,text,timestamp,is_quote_post",
+            "fields": MEDIA_FIELDS,
             "limit": limit,
             "access_token": self.access_token
         }
+        if after:
+            params["after"] = after
+        if since:
+            params["since"] = int(since.replace(tzinfo=timezone.utc).timestamp())
+        
+        response = await self._get("media", url, params)
+        return response.json()
+    
+    async def get_user_media(self, limit: int = 25) -> List[Dict]:
+        """Fetch user's posts/media"""
+        page = await self.get_user_media_page(limit=limit)
+        return page.get("data", [])
+    
+    async def iter_media_pages(
+        self,
+        page_size: int = 50,
+        max_pages: Optional[int] = None,
+        max_age: Optional[timedelta] = None,
+        since: Optional[datetime] = None,
+        after: Optional[str] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """Yield the account's posts page by page (newest first), following paging cursors.
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            return response.json().get("data", [])
+        Stops after max_pages, at the first post older than max_age, or at the
+        first post not newer than `since` (a sync watermark).
+        """
+        async for media, _ in self.iter_media_page_cursors(page_size, max_pages, max_age, since, after):
+            if media:
+                yield media
+    
+    async def iter_media_page_cursors(
+        self,
+        page_size: int = 50,
+        max_pages: Optional[int] = None,
+        max_age: Optional[timedelta] = None,
+        since: Optional[datetime] = None,
+        after: Optional[str] = None
+    ) -> AsyncIterator[Tuple[List[Dict], Optional[str]]]:
+        """Like iter_media_pages, but yield every page with the cursor that resumes after it.
+        
+        The cursor is None once nothing is left to fetch, so a non-None cursor
+        on the last page means max_pages cut the stream short; pass it back as
+        `after` to carry on from there. Pages may be empty.
+        """
+        cutoff = datetime.utcnow() - max_age if max_age else None
+        pages_fetched = 0
+        
+        def is_wanted(media: Dict) -> bool:
+            created_at = parse_media_timestamp(media["timestamp"])
+            if cutoff is not None and created_at < cutoff:
+                return False
+            if since is not None and created_at <= since:
+                return False
+            return True
+        
+        while True:
+            page = await self.get_user_media_page(limit=page_size, after=after, since=since)
+            pages_fetched += 1
+            media = page.get("data", [])
+            
+            reached_cutoff = False
+            if cutoff is not None or since is not None:
+                wanted = [m for m in media if is_wanted(m)]
+                reached_cutoff = len(wanted) < len(media)
+                media = wanted
+            
+            paging = page.get("paging", {})
+            after = paging.get("cursors", {}).get("after")
+            if reached_cutoff or not after or not paging.get("next"):
+                yield media, None
+                return
+            yield media, after
+            if max_pages and pages_fetched >= max_pages:
+                return
     
     async def get_media_insights(self, media_id: str) -> Dict:
         """Fetch insights/metrics for a specific post"""
@@ -31,17 +170,36 @@ class ThreadsAPIClient:
             "access_token": self.access_token
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json().get("data", [])
-            
-            # Convert insights array to dict
-            insights = {}
-            for item in data:
-                insights[item["name"]] = item["values"][0]["value"]
-            
-            return insights
+        response = await self._get("insights", url, params)
+        data = response.json().get("data", [])
+        
+        # Convert insights array to dict
+        insights = {}
+        for item in data:
+            insights[item["name"]] = item["values"][0]["value"]
+        
+        return insights
+    
+    async def get_insights_for_media(self, media_ids: List[str], concurrency: Optional[int] = None) -> Dict[str, Dict]:
+        """Fetch insights for many posts concurrently, keyed by media id.
+        
+        Media the API rejects individually (e.g. deleted since the last sync)
+        are left out of the result instead of failing the others; throttling
+        and server errors still raise once the scheduler's retries run out.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+        
+        async def fetch(media_id: str):
+            async with semaphore:
+                try:
+                    return media_id, await self.get_media_insights(media_id)
+                except httpx.HTTPStatusError as e:
+                    if not is_media_error(e):
+                        raise
+                    return media_id, None
+        
+        results = await asyncio.gather(*(fetch(media_id) for media_id in media_ids))
+        return {media_id: insights for media_id, insights in results if insights is not None}
     
     def calculate_engagement_rate(self, metrics: Dict) -> float:
         """Calculate engagement rate: (likes + replies + reposts + shares) / views * 100"""
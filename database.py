@@ -1,17 +1,194 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base
+from typing import Dict, List, Tuple
+from sqlalchemy import create_engine, event, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, undefer_group
+from models import Post
 from config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+# Async drivers used by the API for each sync DATABASE_URL backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(hide_password=False)
+
+def _engine_options(url: str) -> Dict:
+    """Pool settings for server databases; SQLite keeps SQLAlchemy's default pool"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def _configure_connections(engine: Engine, read_only: bool = False) -> None:
+    """Apply SQLite pragmas (or the Postgres read-only default) to every new connection"""
+    backend = engine.dialect.name
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if backend == "sqlite":
+                # WAL lets dashboard reads proceed while a sync is committing
+                cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+                cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+                cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+                cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+                cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+                if read_only:
+                    cursor.execute("PRAGMA query_only=ON")
+            elif backend == "postgresql" and read_only:
+                cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+        finally:
+            cursor.close()
+
+def create_db_engine(url: str, read_only: bool = False) -> Engine:
+    """Sync engine with the configured pool and per-connection settings"""
+    db_engine = create_engine(url, **_engine_options(url))
+    _configure_connections(db_engine, read_only)
+    return db_engine
+
+def create_async_db_engine(url: str, read_only: bool = False) -> AsyncEngine:
+    """Async engine for a sync DATABASE_URL, configured like create_db_engine"""
+    db_engine = create_async_engine(async_database_url(url), **_engine_options(url))
+    _configure_connections(db_engine.sync_engine, read_only)
+    return db_engine
+
+engine = create_db_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+async_engine = create_async_db_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# GET endpoints read through a separate read-only engine when one is configured
+if settings.DATABASE_READ_URL:
+    async_read_engine = create_async_db_engine(settings.DATABASE_READ_URL, read_only=True)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, expire_on_commit=False)
+else:
+    async_read_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+def create_tables() -> Dict:
+    """Create missing tables and upgrade older databases in place (see migrations.py)"""
+    from migrations import upgrade_schema
+    return upgrade_schema(engine)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Session for read-only endpoints (the primary unless DATABASE_READ_URL is set)"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def get_async_session_factory():
+    """Session factory for work that outlives the request (background jobs, streamed responses)"""
+    return AsyncSessionLocal
+
+# Everything a metric-only read needs: no text columns
+POST_METRIC_COLUMNS = (
+    Post.id, Post.thread_id, Post.media_type, Post.created_at, Post.updated_at,
+    Post.views, Post.likes, Post.replies, Post.reposts, Post.shares, Post.engagement_rate
+)
+
+def select_post_metrics(*extra_columns):
+    """Column-projected SELECT over posts for sorting, stats and charts"""
+    return select(*POST_METRIC_COLUMNS, *extra_columns)
+
+def select_posts_with_text():
+    """SELECT of full Post entities with the deferred text columns loaded up front.
+    
+    Use this wherever content/analysis_result are read; on an AsyncSession a
+    deferred column cannot be lazy-loaded on attribute access.
+    """
+    return select(Post).options(undefer_group("text"))
+
+def iter_post_batches(db: Session, columns, batch_size: int = 1000):
+    """Yield every post (id plus `columns`) as lists of row dicts, keyset-paginated by id for backfills"""
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(Post.id, *columns).where(Post.id > last_id).order_by(Post.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return
+        yield [row._asdict() for row in batch]
+        last_id = batch[-1].id
+
+def upsert_posts(db: Session, rows: List[Dict], batch_size: int = None) -> Tuple[Dict[str, Dict], Dict[str, int]]:
+    """Insert or update posts keyed by thread_id in set-based batches.
+    
+    Runs inside the caller's transaction (nothing is committed here). Every
+    row must carry the same keys; on conflict all of them except thread_id
+    and created_at are overwritten. Returns the pre-existing rows (id,
+    created_at, media_type and metrics) keyed by thread_id, so callers can
+    tell inserts from updates and maintain derived data incrementally, and
+    the id of every upserted post keyed by thread_id.
+    """
+    if not rows:
+        return {}, {}
+    batch_size = batch_size or settings.SYNC_UPSERT_BATCH_SIZE
+    
+    # One IN (...) lookup per batch instead of a query per post
+    existing = {}
+    for start in range(0, len(rows), batch_size):
+        thread_ids = [row["thread_id"] for row in rows[start:start + batch_size]]
+        result = db.execute(
+            select(
+                Post.id, Post.thread_id, Post.created_at, Post.media_type, Post.views,
+                Post.likes, Post.replies, Post.reposts, Post.shares, Post.engagement_rate
+            ).where(Post.thread_id.in_(thread_ids))
+        )
+        for row in result:
+            existing[row.thread_id] = row._asdict()
+    
+    post_ids = {thread_id: row["id"] for thread_id, row in existing.items()}
+    dialect = db.get_bind().dialect.name
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        
+        if dialect in ("sqlite", "postgresql"):
+            dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = dialect_insert(Post).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Post.thread_id],
+                set_={key: stmt.excluded[key] for key in batch[0] if key not in ("thread_id", "created_at")}
+            ).returning(Post.id, Post.thread_id)
+            post_ids.update((thread_id, post_id) for post_id, thread_id in db.execute(stmt))
+        else:
+            # Generic fallback: bulk UPDATE by primary key, bulk INSERT the rest
+            updates = [
+                {**row, "id": existing[row["thread_id"]]["id"]}
+                for row in batch if row["thread_id"] in existing
+            ]
+            inserts = [row for row in batch if row["thread_id"] not in existing]
+            if updates:
+                db.execute(update(Post), updates)
+            if inserts:
+                db.execute(insert(Post), inserts)
+                post_ids.update(
+                    (thread_id, post_id) for post_id, thread_id in db.execute(
+                        select(Post.id, Post.thread_id).where(Post.thread_id.in_([row["thread_id"] for row in inserts]))
+                    )
+                )
+    
+    return existing, post_ids
\ No newline at end of file
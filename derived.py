@@ -0,0 +1,62 @@
+"""Rebuild the data sync derives from the posts table.
+
+    python derived.py rebuild                  # every store, e.g. after an upgrade or a bulk import
+    python derived.py rebuild themes terms     # after editing the theme lexicon or the tokenizer
+
+Sync keeps these stores up to date incrementally (see SyncService._upsert);
+a rebuild recomputes one from scratch by replaying every stored post
+through its hook as a new post. Metric snapshots and view velocity record
+history as it's observed, so they have nothing to rebuild.
+"""
+import argparse
+from typing import Callable, Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from heatmap import rebuild_heatmap
+from rollups import rebuild_rollups
+from similarity import rebuild_similarity_index
+from sketches import rebuild_sketches
+from terms import rebuild_terms
+from themes import reclassify_posts
+
+# Store name -> rebuild(db, batch_size) returning the number of rows written.
+# Themes come first: they rewrite post columns rather than a store of their own.
+REBUILDERS: Dict[str, Callable[..., int]] = {
+    "themes": reclassify_posts,
+    "rollups": rebuild_rollups,
+    "sketches": rebuild_sketches,
+    "heatmap": rebuild_heatmap,
+    "similarity": rebuild_similarity_index,
+    "terms": rebuild_terms,
+}
+
+def rebuild(db: Session, stores: Optional[Iterable[str]] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """Rebuild the given stores (all by default) in REBUILDERS order, inside the caller's transaction"""
+    selected = set(REBUILDERS if stores is None else stores)
+    unknown = selected - set(REBUILDERS)
+    if unknown:
+        raise ValueError(f"Unknown derived stores: {', '.join(sorted(unknown))}")
+    return {
+        name: rebuilder(db, batch_size=batch_size)
+        for name, rebuilder in REBUILDERS.items() if name in selected
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("stores", nargs="*", help=f"any of {', '.join(REBUILDERS)} (default: all)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    unknown = set(args.stores) - set(REBUILDERS)
+    if unknown:
+        parser.error(f"unknown stores: {', '.join(sorted(unknown))}")
+
+    from database import SessionLocal, create_tables
+    create_tables()
+    with SessionLocal() as db:
+        counts = rebuild(db, args.stores or None, batch_size=args.batch_size)
+        db.commit()
+    for name, count in counts.items():
+        print(f"Rebuilt {name}: {count} rows")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
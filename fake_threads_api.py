@@ -0,0 +1,345 @@
+"""Local stand-in for the Threads Graph API, plus record/replay transports.
+
+Run it on localhost and point THREADS_API_BASE_URL at it:
+
+    python fake_threads_api.py serve --posts 100000 --latency 0.05 --port 8001
+
+or mount it in-process with httpx.ASGITransport(app=create_fake_graph_api(...)).
+`python fake_threads_api.py bench` runs a full sync against it into a
+temporary SQLite database and reports throughput.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from models import GRAPH_MEDIA_TYPES, MEDIA_TYPES as STORED_MEDIA_TYPES
+
+INSIGHT_METRICS = ("views", "likes", "replies", "reposts", "shares")
+
+WORDS = [
+    "personal", "life", "feel", "think", "tip", "how", "learn", "guide", "funny", "lol",
+    "haha", "joke", "today", "coffee", "launch", "team", "design", "code", "weekend", "story",
+    "growth", "creator", "morning", "thread", "idea", "question", "travel", "music", "book", "#buildinpublic"
+]
+# Media types as the Graph API names them; sync maps them back (data_collector.normalize_media_type)
+GRAPH_NAMES = {media_type: graph_name for graph_name, media_type in GRAPH_MEDIA_TYPES.items()}
+MEDIA_TYPES = [GRAPH_NAMES.get(media_type, media_type) for media_type in STORED_MEDIA_TYPES]
+
+class SyntheticAccount:
+    """Deterministic account with `post_count` posts, newest first, generated on demand.
+
+    Post i (0 = newest) is published `i * interval` before `newest_at`, so
+    paging and `since` filtering are O(page size) however large the account is.
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        post_count: int,
+        newest_at: Optional[datetime] = None,
+        interval: timedelta = timedelta(hours=3),
+        seed: int = 0
+    ):
+        self.user_id = user_id
+        self.post_count = post_count
+        self.newest_at = (newest_at or datetime.now(timezone.utc)).replace(microsecond=0)
+        if self.newest_at.tzinfo is None:
+            self.newest_at = self.newest_at.replace(tzinfo=timezone.utc)
+        self.interval = interval
+        self.seed = seed
+
+    def media_id(self, index: int) -> str:
+        return f"{self.user_id}_{index}"
+
+    def created_at(self, index: int) -> datetime:
+        return self.newest_at - self.interval * index
+
+    def media(self, index: int) -> Dict:
+        rng = random.Random(f"{self.seed}:{self.user_id}:{index}")
+        return {
+            "id": self.media_id(index),
+            "media_type": rng.choice(MEDIA_TYPES),
+            "permalink": f"https://www.threads.net/@{self.user_id}/post/{index}",
+            "username": self.user_id,
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))),
+            "timestamp": self.created_at(index).strftime("%Y-%m-%dT%H:%M:%S+0000"),
+            "is_quote_post": rng.random() < 0.05
+        }
+
+    def insights(self, index: int) -> Dict[str, int]:
+        rng = random.Random(f"{self.seed}:{self.user_id}:{index}:insights")
+        age_hours = max(1.0, (datetime.now(timezone.utc) - self.created_at(index)).total_seconds() / 3600)
+        views = int(rng.lognormvariate(6, 1.2) * min(age_hours, 72) / 72) + 1
+        return {
+            "views": views,
+            "likes": int(views * rng.uniform(0.01, 0.08)),
+            "replies": int(views * rng.uniform(0.0, 0.02)),
+            "reposts": int(views * rng.uniform(0.0, 0.01)),
+            "shares": int(views * rng.uniform(0.0, 0.005))
+        }
+
+    def first_index_not_after(self, since: datetime) -> int:
+        """Index of the newest post published at or before `since`"""
+        offset = (self.newest_at - since) / self.interval
+        return max(0, min(self.post_count, math.ceil(offset)))
+
+def _encode_cursor(index: int) -> str:
+    return base64.urlsafe_b64encode(str(index).encode()).decode()
+
+def _decode_cursor(cursor: str) -> int:
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+def _graph_error(status_code: int, message: str, code: int, headers: Optional[Dict] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": "OAuthException", "code": code}},
+        headers=headers
+    )
+
+def request_key(request: Request) -> str:
+    """A request's path and query, minus the access token: retries of one call share it"""
+    params = sorted((name, value) for name, value in request.query_params.multi_items() if name != "access_token")
+    return f"{request.url.path}?{urlencode(params)}"
+
+def injected_failure(seed: int, key: str, attempt: int, rate_limit_rate: float, error_rate: float) -> Optional[int]:
+    """Status code injected into the `attempt`th call (from 0) of request `key`, or None.
+
+    Drawn from (seed, key, attempt) alone, so a run fails the same calls
+    however its concurrent requests interleave.
+    """
+    draw = random.Random(f"{seed}:{key}:{attempt}").random()
+    if draw < rate_limit_rate:
+        return 429
+    if draw < rate_limit_rate + error_rate:
+        return 500
+    return None
+
+def create_fake_graph_api(
+    accounts: List[SyntheticAccount],
+    latency: float = 0.0,
+    latency_jitter: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    quota_per_window: int = 0,
+    window_seconds: float = 3600.0,
+    seed: int = 0
+) -> FastAPI:
+    """Build an ASGI app serving `/{user_id}/threads` and `/{media_id}/insights`.
+
+    - latency / latency_jitter: seconds added to every response
+    - error_rate: fraction of requests answered with a 500
+    - rate_limit_rate: fraction of requests answered with a 429
+      (both decided per call by injected_failure, so they replay exactly)
+    - quota_per_window: when set, calls beyond it within `window_seconds` get
+      a 429, and X-App-Usage reports the used share of the quota
+    """
+    app = FastAPI(title="Fake Threads Graph API")
+    accounts_by_id = {account.user_id: account for account in accounts}
+    rng = random.Random(seed)
+    calls = deque()
+    attempts: Dict[str, int] = {}
+    app.state.request_count = 0
+    app.state.attempts = attempts  # request_key -> calls received
+
+    def usage_headers() -> Dict[str, str]:
+        if not quota_per_window:
+            return {}
+        usage = min(100, round(len(calls) * 100 / quota_per_window))
+        return {"X-App-Usage": json.dumps({"call_count": usage, "total_time": usage, "total_cputime": usage})}
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        app.state.request_count += 1
+        now = time.monotonic()
+        while calls and calls[0] < now - window_seconds:
+            calls.popleft()
+
+        if latency or latency_jitter:
+            await asyncio.sleep(latency + rng.uniform(0, latency_jitter))
+
+        if quota_per_window and len(calls) >= quota_per_window:
+            return _graph_error(429, "Application request limit reached", 4,
+                                {**usage_headers(), "Retry-After": str(int(window_seconds))})
+        calls.append(now)
+
+        key = request_key(request)
+        attempt = attempts.get(key, 0)
+        attempts[key] = attempt + 1
+        failure = injected_failure(seed, key, attempt, rate_limit_rate, error_rate)
+        if failure == 429:
+            return _graph_error(429, "Application request limit reached", 4, usage_headers())
+        if failure == 500:
+            return _graph_error(500, "An unexpected error has occurred", 2, usage_headers())
+
+        response = await call_next(request)
+        for name, value in usage_headers().items():
+            response.headers[name] = value
+        return response
+
+    @app.get("/{user_id}/threads")
+    async def user_threads(user_id: str, limit: int = 25, after: Optional[str] = None, since: Optional[int] = None):
+        account = accounts_by_id.get(user_id)
+        if account is None:
+            return _graph_error(400, f"Unsupported get request. Object with ID '{user_id}' does not exist", 100)
+
+        limit = max(1, min(limit, 100))
+        start = _decode_cursor(after) if after else 0
+        end = account.post_count
+        if since is not None:
+            end = account.first_index_not_after(datetime.fromtimestamp(since, timezone.utc))
+        stop = min(start + limit, end)
+
+        page = {"data": [account.media(index) for index in range(start, stop)]}
+        if stop > start:
+            page["paging"] = {"cursors": {"before": _encode_cursor(start), "after": _encode_cursor(stop)}}
+            if stop < end:
+                page["paging"]["next"] = f"/{user_id}/threads?limit={limit}&after={_encode_cursor(stop)}"
+        return page
+
+    @app.get("/{media_id}/insights")
+    async def media_insights(media_id: str):
+        user_id, _, index = media_id.rpartition("_")
+        account = accounts_by_id.get(user_id)
+        if account is None or not index.isdigit() or int(index) >= account.post_count:
+            return _graph_error(400, f"Unsupported get request. Object with ID '{media_id}' does not exist", 100)
+
+        insights = account.insights(int(index))
+        return {"data": [
+            {"name": name, "period": "lifetime", "values": [{"value": insights[name]}], "id": f"{media_id}/insights/{name}/lifetime"}
+            for name in INSIGHT_METRICS
+        ]}
+
+    return app
+
+def _fixture_name(request: httpx.Request) -> str:
+    """Stable fixture file name for a request, ignoring the access token"""
+    params = sorted((key, value) for key, value in request.url.params.multi_items() if key != "access_token")
+    key = json.dumps([request.method, request.url.path, params])
+    slug = request.url.path.strip("/").replace("/", "_") or "root"
+    return f"{slug}-{hashlib.sha1(key.encode()).hexdigest()[:12]}.json"
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Pass requests through to the real API and save each response as a replay fixture"""
+
+    def __init__(self, fixtures_dir: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.fixtures_dir = Path(fixtures_dir)
+        self.fixtures_dir.mkdir(parents=True, exist_ok=True)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+
+        fixture = {
+            "request": {
+                "method": request.method,
+                "path": request.url.path,
+                "params": {k: v for k, v in request.url.params.items() if k != "access_token"}
+            },
+            "status_code": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower().startswith("x-") or k.lower() == "retry-after"},
+            "body": json.loads(body) if body else None
+        }
+        (self.fixtures_dir / _fixture_name(request)).write_text(json.dumps(fixture, indent=2))
+
+        return httpx.Response(response.status_code, headers=response.headers, content=body, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serve responses previously captured by RecordingTransport"""
+
+    def __init__(self, fixtures_dir: str):
+        self.fixtures_dir = Path(fixtures_dir)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = self.fixtures_dir / _fixture_name(request)
+        if not path.exists():
+            return httpx.Response(
+                404,
+                json={"error": {"message": f"No recorded fixture for {request.url.path}", "code": 0}},
+                request=request
+            )
+        fixture = json.loads(path.read_text())
+        return httpx.Response(fixture["status_code"], headers=fixture["headers"], json=fixture["body"], request=request)
+
+async def _benchmark(args) -> Dict:
+    """Sync a synthetic account end to end into a throwaway SQLite database"""
+    import tempfile
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from data_collector import ThreadsAPIClient
+    from models import Base
+    from sync_service import SyncService
+
+    account = SyntheticAccount("bench_user", args.posts, seed=args.seed)
+    app = create_fake_graph_api(
+        [account], latency=args.latency, latency_jitter=args.jitter,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed
+    )
+    client = ThreadsAPIClient(transport=httpx.ASGITransport(app=app))
+    client.base_url = "http://fake-graph"
+    client.user_id = account.user_id
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        started = time.perf_counter()
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                result = await SyncService(client).sync(db)
+        finally:
+            await client.aclose()
+            await engine.dispose()
+        elapsed = time.perf_counter() - started
+
+    return {
+        **result,
+        "requests": app.state.request_count,
+        "retries": client.scheduler.retries,
+        "seconds": round(elapsed, 2),
+        "posts_per_second": round(result["posts_synced"] / elapsed, 1) if elapsed else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--posts", type=int, default=100_000, help="posts in the synthetic account")
+    parser.add_argument("--user-id", default="fake_user")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--quota", type=int, default=0, help="calls per hour before 429s (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        print(json.dumps(asyncio.run(_benchmark(args)), indent=2))
+        return
+
+    import uvicorn
+    app = create_fake_graph_api(
+        [SyntheticAccount(args.user_id, args.posts, seed=args.seed)],
+        latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, quota_per_window=args.quota, seed=args.seed
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
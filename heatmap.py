@@ -0,0 +1,144 @@
+"""Best-time-to-post cube: (weekday, hour, media_type) engagement stats, maintained by sync."""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from database import iter_post_batches
+from models import DEFAULT_MEDIA_TYPE, HeatmapCell, Post
+from config import settings
+
+Cell = Tuple[int, int, str]  # UTC weekday (Monday = 0), UTC hour, media type
+
+def _cell(created_at: Optional[datetime], media_type: Optional[str]) -> Optional[Cell]:
+    if created_at is None:
+        return None
+    return created_at.weekday(), created_at.hour, media_type or DEFAULT_MEDIA_TYPE
+
+def update_heatmap(db: Session, rows: List[Dict], previous: Dict[str, Dict]) -> int:
+    """Apply one upsert batch to the cube: move each post's engagement from its old cell to its new one.
+
+    Returns the number of cells written.
+    """
+    deltas: Dict[Cell, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])  # posts, sum, sum of squares
+    for row in rows:
+        before = previous.get(row["thread_id"])
+        created_at = before["created_at"] if before else row.get("created_at")
+        media_type = row.get("media_type", before["media_type"] if before else None)
+        engagement = row.get("engagement_rate", before["engagement_rate"] if before else 0.0) or 0.0
+
+        old_cell = _cell(before["created_at"], before["media_type"]) if before else None
+        new_cell = _cell(created_at, media_type)
+        old_engagement = (before["engagement_rate"] or 0.0) if before else None
+        if before is not None and old_cell == new_cell and old_engagement == engagement:
+            continue
+
+        if old_cell is not None:
+            delta = deltas[old_cell]
+            delta[0] -= 1
+            delta[1] -= old_engagement
+            delta[2] -= old_engagement ** 2
+        if new_cell is not None:
+            delta = deltas[new_cell]
+            delta[0] += 1
+            delta[1] += engagement
+            delta[2] += engagement ** 2
+
+    if not deltas:
+        return 0
+
+    stored = {
+        (cell.weekday, cell.hour, cell.media_type): cell
+        for cell in db.scalars(
+            select(HeatmapCell).where(HeatmapCell.media_type.in_({media_type for _, _, media_type in deltas}))
+        )
+    }
+    for key, (posts, engagement_sum, engagement_sq_sum) in deltas.items():
+        cell = stored.get(key)
+        if cell is None:
+            cell = HeatmapCell(weekday=key[0], hour=key[1], media_type=key[2], posts=0, engagement_sum=0.0, engagement_sq_sum=0.0)
+            db.add(cell)
+        cell.posts += posts
+        cell.engagement_sum += engagement_sum
+        cell.engagement_sq_sum += engagement_sq_sum
+
+    return len(deltas)
+
+def rebuild_heatmap(db: Session, batch_size: int = 1000) -> int:
+    """Recompute the cube from the posts table; returns the number of cells"""
+    db.execute(delete(HeatmapCell))
+    for batch in iter_post_batches(db, (Post.thread_id, Post.created_at, Post.media_type, Post.engagement_rate), batch_size):
+        update_heatmap(db, batch, previous={})
+        db.flush()
+    return db.scalar(select(func.count(HeatmapCell.id)))
+
+def utc_offset_hours(tz: str) -> int:
+    """Current UTC offset of a zone, rounded to whole hours since the cube is hourly.
+
+    Raises ZoneInfoNotFoundError (or ValueError for malformed keys) for unknown zones.
+    """
+    offset = datetime.now(timezone.utc).astimezone(ZoneInfo(tz)).utcoffset()
+    return round(offset.total_seconds() / 3600)
+
+def get_heatmap(
+    db: Session,
+    tz: str = "UTC",
+    media_type: Optional[str] = None,
+    prior_posts: Optional[float] = None,
+    top: int = 5
+) -> Dict:
+    """Weekday x hour grid in the given timezone with shrunken ("confidence-weighted") scores.
+
+    Each cell's score is its mean engagement shrunk towards the overall mean
+    by `prior_posts` pseudo-posts: (sum + k * mean) / (posts + k), so a slot
+    with a couple of lucky posts ranks below a well-sampled strong slot.
+    Reads at most 168 cells per media type.
+    """
+    prior_posts = settings.HEATMAP_PRIOR_POSTS if prior_posts is None else prior_posts
+    offset = utc_offset_hours(tz)
+
+    query = select(
+        HeatmapCell.weekday, HeatmapCell.hour,
+        func.sum(HeatmapCell.posts), func.sum(HeatmapCell.engagement_sum), func.sum(HeatmapCell.engagement_sq_sum)
+    ).group_by(HeatmapCell.weekday, HeatmapCell.hour)
+    if media_type:
+        query = query.where(HeatmapCell.media_type == media_type)
+
+    grid: Dict[Tuple[int, int], Tuple[int, float, float]] = {}
+    for weekday, hour, posts, engagement_sum, engagement_sq_sum in db.execute(query):
+        # Shift the UTC slot into local time, wrapping across days
+        local = (weekday * 24 + hour + offset) % 168
+        grid[divmod(local, 24)] = (posts or 0, engagement_sum or 0.0, engagement_sq_sum or 0.0)
+
+    total_posts = sum(posts for posts, _, _ in grid.values())
+    overall_mean = sum(engagement_sum for _, engagement_sum, _ in grid.values()) / total_posts if total_posts else 0.0
+
+    cells = []
+    for weekday in range(7):
+        for hour in range(24):
+            posts, engagement_sum, engagement_sq_sum = grid.get((weekday, hour), (0, 0.0, 0.0))
+            mean = engagement_sum / posts if posts else None
+            variance = max(engagement_sq_sum / posts - mean ** 2, 0.0) if posts else None
+            cells.append({
+                "weekday": weekday,
+                "hour": hour,
+                "posts": posts,
+                "avg_engagement": round(mean, 2) if mean is not None else None,
+                "stderr": round(math.sqrt(variance / posts), 2) if posts > 1 else None,
+                "score": round((engagement_sum + prior_posts * overall_mean) / (posts + prior_posts), 2)
+                if posts + prior_posts else 0.0
+            })
+
+    best = sorted((cell for cell in cells if cell["posts"]), key=lambda cell: cell["score"], reverse=True)[:top]
+    return {
+        "timezone": tz,
+        "utc_offset_hours": offset,
+        "media_type": media_type,
+        "total_posts": total_posts,
+        "overall_avg_engagement": round(overall_mean, 2),
+        "prior_posts": prior_posts,
+        "cells": cells,
+        "best_slots": best
+    }
\ No newline at end of file
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import LLMCacheEntry
+from config import settings
+
+def _normalize(value: Any) -> Any:
+    """Collapse whitespace in strings (recursively) so cosmetic differences share a key"""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+class LLMCache:
+    """Content-addressed cache of LLM responses in the llm_cache table.
+
+    Entries are keyed by a hash of (model, prompt template version, normalized
+    inputs), expire after `ttl` and are evicted least-recently-used first
+    once there are more than `max_entries`. Cache failures never fail the
+    caller: they count as misses.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        ttl: Optional[timedelta] = None,
+        max_entries: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.session_factory = session_factory
+        self.ttl = ttl or timedelta(hours=settings.LLM_CACHE_TTL_HOURS)
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.enabled = settings.LLM_CACHE_ENABLED if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(model: str, template: str, inputs: Dict) -> str:
+        payload = json.dumps([model, template, _normalize(inputs)], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Cached response for the key, or None if missing or expired (and count the hit/miss)"""
+        if not self.enabled:
+            return None
+        now = datetime.utcnow()
+        try:
+            async with self.session_factory() as db:
+                entry = await db.get(LLMCacheEntry, key)
+                if entry is None or entry.created_at < now - self.ttl:
+                    self.misses += 1
+                    return None
+                entry.last_accessed_at = now
+                entry.hits = (entry.hits or 0) + 1
+                response = entry.response
+                await db.commit()
+        except Exception:
+            self.errors += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return response
+
+    async def set(self, key: str, model: str, template: str, response: str):
+        """Store a response, then drop expired entries and the least recently used beyond max_entries"""
+        if not self.enabled:
+            return
+        now = datetime.utcnow()
+        try:
+            async with self.session_factory() as db:
+                await db.merge(LLMCacheEntry(
+                    key=key, model=model, template=template, response=response,
+                    created_at=now, last_accessed_at=now, hits=0
+                ))
+                expired = await db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.created_at < now - self.ttl))
+                evicted = expired.rowcount or 0
+                excess = await db.scalar(select(func.count()).select_from(LLMCacheEntry)) - self.max_entries
+                if excess > 0:
+                    oldest = select(LLMCacheEntry.key).order_by(LLMCacheEntry.last_accessed_at).limit(excess)
+                    result = await db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest)))
+                    evicted += result.rowcount or 0
+                await db.commit()
+        except Exception:
+            self.errors += 1
+            return
+        self.evictions += evicted
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "ttl_hours": self.ttl.total_seconds() / 3600,
+            "max_entries": self.max_entries
+        }
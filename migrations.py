@@ -0,0 +1,132 @@
+"""In-place schema upgrades for databases created by older versions, run at startup by create_tables.
+
+create_all only creates missing tables. Columns, indexes and unique
+constraints added to existing tables are added here (ALTER TABLE, CREATE
+INDEX; a unique constraint becomes a unique index of the same name).
+Posts stored before a derived store existed were never counted in it, and
+sync only applies deltas, so those stores are rebuilt from the posts table
+(derived.rebuild) in the same transaction.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import UniqueConstraint, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from models import GRAPH_MEDIA_TYPES, SYNC_JOB_ACTIVE_STATUSES, Base, Post, SyncJob
+
+# Derived store -> (table, columns). If an upgrade has to create the table,
+# or add any of the columns (None: any column), existing posts are missing
+# from the store and it is rebuilt.
+BACKFILL_TRIGGERS: Dict[str, Tuple[str, Optional[Set[str]]]] = {
+    "themes": ("posts", {"theme_scores", "primary_theme"}),
+    "rollups": ("analytics", {"engagement_sum"}),  # Rows from before rollups hold no per-bucket sums
+    "sketches": ("metric_sketches", None),
+    "heatmap": ("heatmap_cells", None),
+    "similarity": ("post_signatures", None),
+    "terms": ("term_stats", None),
+}
+
+def _add_missing_columns(conn: Connection, existing_tables: Set[str]) -> Dict[str, Set[str]]:
+    """ALTER TABLE ADD COLUMN for every model column an existing table lacks; returns them per table"""
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    added: Dict[str, Set[str]] = {}
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            conn.execute(text(
+                f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(conn.dialect)}"
+            ))
+            added.setdefault(table.name, set()).add(column.name)
+    return added
+
+def _add_missing_indexes(conn: Connection, existing_tables: Set[str]) -> Dict[str, Set[str]]:
+    """Create the model indexes and unique constraints existing tables lack; returns their names per table"""
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    added: Dict[str, Set[str]] = {}
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        present |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(conn)
+                added.setdefault(table.name, set()).add(index.name)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in present:
+                columns = ", ".join(quote(column.name) for column in constraint.columns)
+                conn.execute(text(f"CREATE UNIQUE INDEX {quote(constraint.name)} ON {quote(table.name)} ({columns})"))
+                added.setdefault(table.name, set()).add(constraint.name)
+    return added
+
+# Derived stores keyed by media type
+MEDIA_TYPE_STORES = ("rollups", "heatmap")
+
+def _normalize_media_types(conn: Connection) -> int:
+    """Rename media types stored under their Graph API names, by syncs from before sync normalized them"""
+    posts = Post.__table__
+    return sum(
+        conn.execute(update(posts).where(posts.c.media_type == graph_name).values(media_type=media_type)).rowcount
+        for graph_name, media_type in GRAPH_MEDIA_TYPES.items()
+    )
+
+def _fail_duplicate_sync_jobs(conn: Connection) -> int:
+    """Fail all but the newest active job per account, which the active-job unique index would reject"""
+    jobs = SyncJob.__table__
+    active = conn.execute(
+        select(jobs.c.id, jobs.c.account_id)
+        .where(jobs.c.status.in_(SYNC_JOB_ACTIVE_STATUSES))
+        .order_by(jobs.c.created_at.desc())
+    ).all()
+    seen: Set[str] = set()
+    duplicates = []
+    for job_id, account_id in active:
+        if account_id in seen:
+            duplicates.append(job_id)
+        seen.add(account_id)
+    if duplicates:
+        conn.execute(
+            update(jobs).where(jobs.c.id.in_(duplicates))
+            .values(status="failed", error="Duplicate of a concurrent sync job", finished_at=datetime.utcnow())
+        )
+    return len(duplicates)
+
+def stores_to_backfill(existing_tables: Set[str], added_columns: Dict[str, Set[str]]) -> List[str]:
+    """Derived stores that existing posts were never counted in"""
+    stores = []
+    for store, (table, columns) in BACKFILL_TRIGGERS.items():
+        added = added_columns.get(table, set())
+        if table not in existing_tables or (added if columns is None else added & columns):
+            stores.append(store)
+    return stores
+
+def upgrade_schema(engine: Engine) -> Dict:
+    """Bring the database up to the current models; returns what was changed"""
+    from derived import rebuild  # derived imports modules that import database
+
+    with engine.begin() as conn:
+        existing_tables = set(inspect(conn).get_table_names())
+        Base.metadata.create_all(conn)
+        if "posts" not in existing_tables:
+            return {"added_columns": {}, "added_indexes": {}, "backfilled": {}}  # New database: nothing to upgrade
+
+        added_columns = _add_missing_columns(conn, existing_tables)
+        stores = stores_to_backfill(existing_tables, added_columns)
+        if _normalize_media_types(conn):
+            stores = set(stores) | set(MEDIA_TYPE_STORES)
+        backfilled = {}
+        if stores:
+            with Session(bind=conn) as db:
+                backfilled = rebuild(db, stores)
+                db.flush()
+        # After the backfill: rebuilt rollups can't hold rows a new unique index would reject
+        if "sync_jobs" in existing_tables:
+            _fail_duplicate_sync_jobs(conn)
+        added_indexes = _add_missing_indexes(conn, existing_tables)
+    return {"added_columns": added_columns, "added_indexes": added_indexes, "backfilled": backfilled}
\ No newline at end of file
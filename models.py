@@ -1,19 +1,26 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, ForeignKey, Index, JSON, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 
 Base = declarative_base()
 
+# Post.media_type values; sync maps the Graph API's names onto them (data_collector.normalize_media_type)
+MEDIA_TYPES = ("TEXT", "IMAGE", "VIDEO", "CAROUSEL")
+DEFAULT_MEDIA_TYPE = MEDIA_TYPES[0]  # Stands in for a missing media type
+GRAPH_MEDIA_TYPES = {"TEXT_POST": "TEXT", "CAROUSEL_ALBUM": "CAROUSEL"}
+
 class Post(Base):
     __tablename__ = "posts"
     
     id = Column(Integer, primary_key=True, index=True)
     thread_id = Column(String, unique=True, index=True)
-    content = Column(Text)
-    media_type = Column(String)  # TEXT, IMAGE, VIDEO, CAROUSEL
-    created_at = Column(DateTime)
-    updated_at = Column(DateTime, default=datetime.utcnow)
+    # Bulky text is deferred (group "text") so metric-only reads skip it;
+    # load it with undefer_group("text") / select_posts_with_text()
+    content = deferred(Column(Text), group="text")
+    media_type = Column(String)  # One of MEDIA_TYPES
+    created_at = Column(DateTime, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)  # Stamped by every sync write
     
     # Metrics
     views = Column(Integer, default=0)
@@ -23,21 +30,193 @@ class Post(Base):
     shares = Column(Integer, default=0)
     
     # Calculated fields
-    engagement_rate = Column(Float, default=0.0)
+    engagement_rate = Column(Float, default=0.0, index=True)
     
     # Analysis
-    analysis_result = Column(Text, nullable=True)
+    analysis_result = deferred(Column(Text, nullable=True), group="text")
     analysis_date = Column(DateTime, nullable=True)
     analysis_cached = Column(Boolean, default=False)
+    
+    # Keyword themes scored at sync time (see themes.py)
+    theme_scores = Column(JSON, nullable=True)  # {"personal": 2, "educational": 0, ...}
+    primary_theme = Column(String, nullable=True, index=True)
 
 class Analytics(Base):
+    """Daily rollup per media type, maintained incrementally by sync (see rollups.py)"""
     __tablename__ = "analytics"
+    __table_args__ = (
+        UniqueConstraint("date", "media_type", name="uq_analytics_date_media_type"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime, default=datetime.utcnow)
+    date = Column(DateTime, default=datetime.utcnow)  # Midnight UTC of the day rolled up
+    media_type = Column(String, nullable=True)
     total_posts = Column(Integer)
     avg_engagement_rate = Column(Float)
+    engagement_sum = Column(Float, default=0.0)  # Kept so the average updates incrementally
     best_post_id = Column(String)
+    best_engagement_rate = Column(Float, nullable=True)
     worst_post_id = Column(String)
+    worst_engagement_rate = Column(Float, nullable=True)
     total_views = Column(Integer)
-    total_likes = Column(Integer)
\ No newline at end of file
+    total_likes = Column(Integer)
+    total_replies = Column(Integer, default=0)
+    total_reposts = Column(Integer, default=0)
+    total_shares = Column(Integer, default=0)
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(String, unique=True, index=True)
+    newest_media_at = Column(DateTime, nullable=True)  # Sync watermark
+    last_synced_at = Column(DateTime, nullable=True)
+    last_compacted_at = Column(DateTime, nullable=True)  # Metric snapshot retention
+    backfill_after = Column(String, nullable=True)  # Paging cursor where a sync cut short by SYNC_MAX_PAGES stopped
+    backfill_newest_at = Column(DateTime, nullable=True)  # Newest media seen by that sync; the watermark once the gap is filled
+
+SYNC_JOB_ACTIVE_STATUSES = ("queued", "running")
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+    
+    id = Column(String, primary_key=True)  # uuid hex
+    account_id = Column(String, index=True)
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    pages_fetched = Column(Integer, default=0)
+    posts_upserted = Column(Integer, default=0)
+    posts_refreshed = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Bumped by the running worker with every progress update
+
+# At most one active job per account, however many processes submit at once
+_active_sync_jobs = SyncJob.status.in_(SYNC_JOB_ACTIVE_STATUSES)
+Index(
+    "ix_sync_jobs_active_account", SyncJob.account_id, unique=True,
+    sqlite_where=_active_sync_jobs, postgresql_where=_active_sync_jobs
+)
+
+class MetricSnapshot(Base):
+    """Append-only history of a post's counters (written only when they change)"""
+    __tablename__ = "metric_snapshots"
+    __table_args__ = (
+        Index("ix_metric_snapshots_post_ts", "post_id", "ts"),
+        Index("ix_metric_snapshots_ts", "ts"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    ts = Column(DateTime, nullable=False)
+    views = Column(Integer, default=0)
+    likes = Column(Integer, default=0)
+    replies = Column(Integer, default=0)
+    reposts = Column(Integer, default=0)
+    shares = Column(Integer, default=0)
+
+class MetricSketch(Base):
+    """Quantile sketch of one metric over the posts of one day (see sketches.py)"""
+    __tablename__ = "metric_sketches"
+    __table_args__ = (
+        UniqueConstraint("day", "metric", name="uq_metric_sketches_day_metric"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(DateTime, nullable=False)  # Midnight UTC of the posting day
+    metric = Column(String, nullable=False)  # engagement_rate, views
+    count = Column(Integer, default=0)
+    data = Column(Text)  # Serialized QuantileSketch
+
+class HeatmapCell(Base):
+    """Engagement stats of posts published in one UTC weekday/hour slot (see heatmap.py)"""
+    __tablename__ = "heatmap_cells"
+    __table_args__ = (
+        UniqueConstraint("weekday", "hour", "media_type", name="uq_heatmap_cells_slot"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    weekday = Column(Integer, nullable=False)  # Monday = 0
+    hour = Column(Integer, nullable=False)
+    media_type = Column(String, nullable=False)
+    posts = Column(Integer, default=0)
+    engagement_sum = Column(Float, default=0.0)
+    engagement_sq_sum = Column(Float, default=0.0)
+
+class PostVelocity(Base):
+    """Per-post view velocity state for anomaly detection (see anomaly.py)"""
+    __tablename__ = "post_velocity"
+    
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    views = Column(Integer, default=0)  # At the last observation
+    observed_at = Column(DateTime, nullable=False)
+    ewma_velocity = Column(Float, default=0.0)  # Views/hour, exponentially smoothed
+    samples = Column(Integer, default=0)
+    zscore = Column(Float, nullable=True)  # Against the age baseline at the last observation
+    alerted_at = Column(DateTime, nullable=True, index=True)  # Last time the post was flagged
+
+class VelocityBaseline(Base):
+    """Account-wide typical log view velocity for posts of one age bucket"""
+    __tablename__ = "velocity_baselines"
+    
+    age_bucket = Column(Integer, primary_key=True)
+    samples = Column(Integer, default=0)
+    mean = Column(Float, default=0.0)
+    variance = Column(Float, default=0.0)
+
+class PostSignature(Base):
+    """MinHash signature of a post's content (see similarity.py)"""
+    __tablename__ = "post_signatures"
+    
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(JSON, nullable=False)  # NUM_PERM min-hashes
+
+class LshBucket(Base):
+    """One LSH band of a post's signature; posts sharing a key are similar-post candidates"""
+    __tablename__ = "lsh_buckets"
+    
+    key = Column(String, primary_key=True)  # "<band>:<hash of the band's rows>"
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class TermStat(Base):
+    """Running engagement stats of the posts using one term (see terms.py)"""
+    __tablename__ = "term_stats"
+    
+    term = Column(String, primary_key=True)  # "" holds the totals over all indexed posts
+    kind = Column(String, nullable=False)  # word, hashtag, emoji
+    posts = Column(Integer, default=0)
+    engagement_sum = Column(Float, default=0.0)
+    engagement_sq_sum = Column(Float, default=0.0)
+    # engagement_sum / posts, stored so top/bottom terms are an index walk instead of a sort
+    avg_engagement = Column(Float, default=0.0, index=True)
+
+class TermPosting(Base):
+    """Inverted index entry: a post uses a term"""
+    __tablename__ = "term_postings"
+    
+    term = Column(String, primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class LLMCacheEntry(Base):
+    """Cached LLM response keyed by a hash of (model, prompt template version, inputs) (see llm_cache.py)"""
+    __tablename__ = "llm_cache"
+    
+    key = Column(String(64), primary_key=True)  # sha256 hex
+    model = Column(String, nullable=False)
+    template = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)  # TTL is measured from here
+    last_accessed_at = Column(DateTime, nullable=False, index=True)  # LRU eviction order
+    hits = Column(Integer, default=0)
+
+class CreatorPortrait(Base):
+    """A generated creator portrait and its story image (see portraits.py)"""
+    __tablename__ = "creator_portraits"
+    
+    id = Column(String, primary_key=True)  # uuid4 hex, used in share links
+    fingerprint = Column(String(64), nullable=False, index=True)  # Hash of the post set it was generated from
+    portrait = Column(JSON, nullable=False)
+    ig_story_image = Column(Text)  # data:image/png;base64,...
+    share_urls = Column(JSON)
+    created_at = Column(DateTime, nullable=False, index=True)
\ No newline at end of file
@@ -0,0 +1,72 @@
+import hashlib
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import CreatorPortrait, Post
+
+# Stored portraits kept for share links; older ones are pruned on save
+PORTRAIT_HISTORY = 20
+
+async def portrait_fingerprint(db: AsyncSession, version: str = "") -> Optional[str]:
+    """Hash of what a portrait is generated from, or None when there are no posts.
+
+    Sync stamps updated_at on every post it writes, so post count, newest
+    id and newest updated_at change whenever the post set or any metrics do.
+    `version` (the prompt template version) invalidates portraits when the
+    prompt changes.
+    """
+    # Separate statements so each is answered from an index (a combined
+    # aggregate makes SQLite scan the table)
+    count = await db.scalar(select(func.count()).select_from(Post))
+    if not count:
+        return None
+    max_id = await db.scalar(select(func.max(Post.id)))
+    max_updated_at = await db.scalar(select(func.max(Post.updated_at)))
+    payload = f"{version}|{count}|{max_id}|{max_updated_at.isoformat() if max_updated_at else ''}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def get_stored_portrait(db: AsyncSession, fingerprint: str) -> Optional[CreatorPortrait]:
+    return await db.scalar(
+        select(CreatorPortrait)
+        .where(CreatorPortrait.fingerprint == fingerprint)
+        .order_by(CreatorPortrait.created_at.desc())
+        .limit(1)
+    )
+
+async def save_portrait(
+    db: AsyncSession,
+    fingerprint: str,
+    portrait: Dict,
+    ig_story_image: str,
+    share_urls: Dict
+) -> CreatorPortrait:
+    """Store a generated portrait and prune all but the newest PORTRAIT_HISTORY"""
+    stored = CreatorPortrait(
+        id=uuid.uuid4().hex,
+        fingerprint=fingerprint,
+        portrait=portrait,
+        ig_story_image=ig_story_image,
+        share_urls=share_urls,
+        created_at=datetime.utcnow()
+    )
+    db.add(stored)
+    await db.flush()
+    keep = select(CreatorPortrait.id).order_by(CreatorPortrait.created_at.desc()).limit(PORTRAIT_HISTORY)
+    await db.execute(delete(CreatorPortrait).where(CreatorPortrait.id.not_in(keep)))
+    await db.commit()
+    return stored
+
+def serialize_portrait(stored: CreatorPortrait, cached: bool) -> Dict:
+    return {
+        "status": "success",
+        "portrait_id": stored.id,
+        "generated_at": stored.created_at.isoformat(),
+        "cached": cached,
+        "portrait": stored.portrait,
+        "shareable_content": {
+            "ig_story_image": stored.ig_story_image,
+            "share_urls": stored.share_urls
+        }
+    }
\ No newline at end of file
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+from config import settings
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Graph API error codes that signal throttling even when the status is 400
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}
+
+# Percentages reported in X-App-Usage / X-Business-Use-Case-Usage
+USAGE_HEADERS = ("x-app-usage", "x-business-use-case-usage")
+USAGE_KEYS = ("call_count", "total_cputime", "total_time")
+
+class TokenBucket:
+    """Async token bucket refilling `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    async def acquire(self, factor: float = 1.0):
+        """Take one token, sleeping until it is available.
+
+        Tokens are reserved up front (the balance may go negative), so
+        concurrent callers queue behind each other without a lock.
+        `factor` scales the refill rate down while the API is throttling us.
+        """
+        rate = self.rate * factor
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / rate)
+
+class UsageThrottle:
+    """Adapts the request rate to the quota usage reported by the API.
+
+    The allowed fraction of the configured rate shrinks linearly once usage
+    passes `soft_limit`, and is additionally halved on every throttling
+    response and recovered step by step on successes (AIMD), so we stay
+    close to the quota ceiling even when the API sends no usage headers.
+    """
+
+    def __init__(self, soft_limit: float = 75.0, min_factor: float = 0.05, recovery_step: float = 0.05):
+        self.soft_limit = soft_limit
+        self.min_factor = min_factor
+        self.recovery_step = recovery_step
+        self.usage = 0.0
+        self.penalty = 1.0
+        self.blocked_until = 0.0
+
+    def update(self, headers) -> None:
+        """Read the usage headers of a response"""
+        usage = None
+        for header in USAGE_HEADERS:
+            try:
+                payload = json.loads(headers.get(header) or "")
+            except (TypeError, ValueError):
+                continue
+
+            # X-Business-Use-Case-Usage maps business ids to lists of entries
+            if isinstance(payload, dict) and not any(key in payload for key in USAGE_KEYS):
+                entries = [entry for value in payload.values() if isinstance(value, list) for entry in value]
+            else:
+                entries = [payload]
+
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                for key in USAGE_KEYS:
+                    usage = max(usage or 0.0, float(entry.get(key) or 0))
+                regain_minutes = entry.get("estimated_time_to_regain_access")
+                if regain_minutes:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + float(regain_minutes) * 60)
+
+        if usage is not None:
+            self.usage = usage
+
+    def record_rate_limited(self) -> None:
+        """Multiplicative decrease after a throttling response"""
+        self.penalty = max(self.min_factor, self.penalty / 2)
+
+    def record_success(self) -> None:
+        """Additive increase after a response that was not throttled"""
+        self.penalty = min(1.0, self.penalty + self.recovery_step)
+
+    def factor(self) -> float:
+        """Fraction of the configured request rate currently allowed"""
+        usage_factor = 1.0
+        if self.usage > self.soft_limit:
+            usage_factor = max(self.min_factor, (100.0 - self.usage) / (100.0 - self.soft_limit))
+        return min(usage_factor, self.penalty)
+
+    async def wait(self) -> None:
+        """Sleep while the API has told us we are blocked"""
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class RequestScheduler:
+    """Per-endpoint token buckets, usage-driven throttling and retries with jittered backoff"""
+
+    def __init__(
+        self,
+        budgets: Dict[str, TokenBucket],
+        throttle: Optional[UsageThrottle] = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        self.budgets = budgets
+        self.throttle = throttle or UsageThrottle()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+
+    @classmethod
+    def from_settings(cls) -> "RequestScheduler":
+        return cls(
+            budgets={
+                "media": TokenBucket(settings.THREADS_MEDIA_RATE, settings.THREADS_MEDIA_BURST),
+                "insights": TokenBucket(settings.THREADS_INSIGHTS_RATE, settings.THREADS_INSIGHTS_BURST)
+            },
+            throttle=UsageThrottle(soft_limit=settings.THREADS_USAGE_SOFT_LIMIT),
+            max_retries=settings.THREADS_MAX_RETRIES,
+            backoff_base=settings.THREADS_BACKOFF_BASE,
+            backoff_max=settings.THREADS_BACKOFF_MAX
+        )
+
+    async def send(self, endpoint: str, request: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Run `request` within the endpoint's budget, retrying throttled and failed attempts.
+
+        Returns the last response once it succeeds or retries are exhausted;
+        the caller decides whether to raise on its status.
+        """
+        bucket = self.budgets[endpoint]
+
+        for attempt in range(self.max_retries + 1):
+            await self.throttle.wait()
+            await bucket.acquire(self.throttle.factor())
+
+            try:
+                response = await request()
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            self.throttle.update(response.headers)
+            rate_limited = is_rate_limited(response)
+            if rate_limited:
+                self.throttle.record_rate_limited()
+            else:
+                self.throttle.record_success()
+
+            if not (rate_limited or response.status_code in RETRY_STATUS_CODES) or attempt == self.max_retries:
+                return response
+
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, response.headers.get("retry-after")))
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, _parse_retry_after(retry_after))
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    """429, or a 400 carrying one of Meta's rate-limit error codes"""
+    if response.status_code == 429:
+        return True
+    if response.status_code != 400:
+        return False
+    try:
+        code = response.json().get("error", {}).get("code")
+    except (AttributeError, ValueError):
+        return False
+    return code in RATE_LIMIT_ERROR_CODES
+
+def _parse_retry_after(value: Optional[str]) -> float:
+    """Retry-After as seconds (accepts delta-seconds or an HTTP date)"""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
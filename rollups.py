@@ -0,0 +1,187 @@
+"""Daily analytics rollups per media type, maintained incrementally by sync."""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from database import iter_post_batches
+from models import DEFAULT_MEDIA_TYPE, Analytics, Post
+
+ROLLUP_METRICS = ("views", "likes", "replies", "reposts", "shares")
+
+Bucket = Tuple[datetime, str]
+
+def _bucket(created_at: Optional[datetime], media_type: Optional[str]) -> Optional[Bucket]:
+    """Rollup key of a post: its UTC day and media type (posts without a date aren't rolled up)"""
+    if created_at is None:
+        return None
+    return datetime.combine(created_at.date(), time()), media_type or DEFAULT_MEDIA_TYPE
+
+def update_rollups(db: Session, rows: List[Dict], previous: Dict[str, Dict]) -> int:
+    """Apply the change made by one upsert batch to the daily rollups.
+
+    Each updated post's old values are subtracted from its old bucket and the
+    new values added to its new one, so only the touched days are written.
+    Returns the number of rollup rows changed.
+    """
+    deltas: Dict[Bucket, Dict] = defaultdict(lambda: dict.fromkeys(("posts", "engagement", *ROLLUP_METRICS), 0))
+    arrived: Dict[Bucket, Dict[str, float]] = defaultdict(dict)  # Engagement of posts now in the bucket
+    departed: Dict[Bucket, set] = defaultdict(set)  # Posts whose old values left the bucket
+
+    for row in rows:
+        thread_id = row["thread_id"]
+        before = previous.get(thread_id)
+        created_at = before["created_at"] if before else row.get("created_at")
+        media_type = row.get("media_type", before["media_type"] if before else None)
+        after = {metric: row.get(metric, before[metric] if before else 0) or 0 for metric in ROLLUP_METRICS}
+        engagement = row.get("engagement_rate", before["engagement_rate"] if before else 0.0) or 0.0
+
+        old_bucket = _bucket(before["created_at"], before["media_type"]) if before else None
+        new_bucket = _bucket(created_at, media_type)
+        if (
+            before is not None
+            and old_bucket == new_bucket
+            and engagement == (before["engagement_rate"] or 0.0)
+            and all(after[metric] == (before[metric] or 0) for metric in ROLLUP_METRICS)
+        ):
+            continue
+
+        if old_bucket is not None:
+            delta = deltas[old_bucket]
+            delta["posts"] -= 1
+            delta["engagement"] -= before["engagement_rate"] or 0.0
+            for metric in ROLLUP_METRICS:
+                delta[metric] -= before[metric] or 0
+            departed[old_bucket].add(thread_id)
+        if new_bucket is not None:
+            delta = deltas[new_bucket]
+            delta["posts"] += 1
+            delta["engagement"] += engagement
+            for metric in ROLLUP_METRICS:
+                delta[metric] += after[metric]
+            arrived[new_bucket][thread_id] = engagement
+
+    if not deltas:
+        return 0
+
+    existing = {
+        (rollup.date, rollup.media_type): rollup
+        for rollup in db.scalars(
+            select(Analytics).where(
+                Analytics.date.in_({day for day, _ in deltas}),
+                Analytics.media_type.in_({media_type for _, media_type in deltas})
+            )
+        )
+    }
+
+    for bucket, delta in deltas.items():
+        rollup = existing.get(bucket)
+        if rollup is None:
+            if delta["posts"] <= 0:
+                continue  # Day predates rollups; `python derived.py rebuild rollups` backfills it
+            rollup = Analytics(
+                date=bucket[0], media_type=bucket[1], total_posts=0, engagement_sum=0.0,
+                **{f"total_{metric}": 0 for metric in ROLLUP_METRICS}
+            )
+            db.add(rollup)
+
+        rollup.total_posts += delta["posts"]
+        if rollup.total_posts <= 0:
+            db.delete(rollup)
+            continue
+        rollup.engagement_sum += delta["engagement"]
+        rollup.avg_engagement_rate = rollup.engagement_sum / rollup.total_posts
+        for metric in ROLLUP_METRICS:
+            setattr(rollup, f"total_{metric}", getattr(rollup, f"total_{metric}") + delta[metric])
+
+        _update_extreme(db, rollup, bucket, "best", arrived[bucket], departed[bucket])
+        _update_extreme(db, rollup, bucket, "worst", arrived[bucket], departed[bucket])
+
+    return len(deltas)
+
+def _update_extreme(db: Session, rollup: Analytics, bucket: Bucket, which: str, arrived: Dict[str, float], departed: set):
+    """Keep the best (or worst) post of a bucket current, rescanning the day only when the holder got worse"""
+    better = (lambda a, b: a > b) if which == "best" else (lambda a, b: a < b)
+    holder = getattr(rollup, f"{which}_post_id")
+    rate = getattr(rollup, f"{which}_engagement_rate")
+
+    if holder in departed:
+        if holder in arrived and not better(rate, arrived[holder]):
+            rate = arrived[holder]
+        else:
+            holder, rate = _scan_extreme(db, bucket, which)
+
+    for thread_id, engagement in arrived.items():
+        if holder is None or better(engagement, rate):
+            holder, rate = thread_id, engagement
+
+    setattr(rollup, f"{which}_post_id", holder)
+    setattr(rollup, f"{which}_engagement_rate", rate)
+
+def _scan_extreme(db: Session, bucket: Bucket, which: str) -> Tuple[Optional[str], Optional[float]]:
+    """Best (or worst) post of one day and media type, read from posts (uses the created_at index)"""
+    day, media_type = bucket
+    ordering = Post.engagement_rate.desc() if which == "best" else Post.engagement_rate.asc()
+    row = db.execute(
+        select(Post.thread_id, Post.engagement_rate)
+        .where(
+            Post.created_at >= day,
+            Post.created_at < day + timedelta(days=1),
+            func.coalesce(Post.media_type, DEFAULT_MEDIA_TYPE) == media_type
+        )
+        .order_by(ordering, Post.id)
+        .limit(1)
+    ).first()
+    return (row.thread_id, row.engagement_rate) if row else (None, None)
+
+def rebuild_rollups(db: Session, batch_size: int = 1000) -> int:
+    """Recompute all rollups from the posts table; returns the number of rollup rows"""
+    db.execute(delete(Analytics))
+    columns = (Post.thread_id, Post.created_at, Post.media_type, Post.engagement_rate,
+               *(getattr(Post, metric) for metric in ROLLUP_METRICS))
+    for batch in iter_post_batches(db, columns, batch_size):
+        update_rollups(db, batch, previous={})
+        db.flush()
+
+    return db.scalar(select(func.count(Analytics.id)))
+
+def get_daily_rollups(
+    db: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    media_type: Optional[str] = None
+) -> List[Dict]:
+    """Per-day totals in [start, end] read only from rollups, combined across media types unless one is given"""
+    query = select(Analytics).where(Analytics.media_type.is_not(None))
+    if start is not None:
+        query = query.where(Analytics.date >= datetime.combine(start, time()))
+    if end is not None:
+        query = query.where(Analytics.date < datetime.combine(end + timedelta(days=1), time()))
+    if media_type:
+        query = query.where(Analytics.media_type == media_type)
+
+    days: Dict[datetime, Dict] = {}
+    for rollup in db.scalars(query.order_by(Analytics.date)):
+        day = days.setdefault(rollup.date, {
+            "date": rollup.date.date().isoformat(),
+            "total_posts": 0,
+            "engagement_sum": 0.0,
+            **{f"total_{metric}": 0 for metric in ROLLUP_METRICS},
+            "best_post": None,
+            "worst_post": None
+        })
+        day["total_posts"] += rollup.total_posts
+        day["engagement_sum"] += rollup.engagement_sum
+        for metric in ROLLUP_METRICS:
+            day[f"total_{metric}"] += getattr(rollup, f"total_{metric}")
+        if day["best_post"] is None or rollup.best_engagement_rate > day["best_post"]["engagement_rate"]:
+            day["best_post"] = {"thread_id": rollup.best_post_id, "engagement_rate": rollup.best_engagement_rate}
+        if day["worst_post"] is None or rollup.worst_engagement_rate < day["worst_post"]["engagement_rate"]:
+            day["worst_post"] = {"thread_id": rollup.worst_post_id, "engagement_rate": rollup.worst_engagement_rate}
+
+    result = []
+    for day in days.values():
+        engagement_sum = day.pop("engagement_sum")
+        day["avg_engagement_rate"] = engagement_sum / day["total_posts"] if day["total_posts"] else 0.0
+        result.append(day)
+    return result
\ No newline at end of file
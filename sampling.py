@@ -0,0 +1,184 @@
+"""Token-budgeted, stratified sample of posts for the creator portrait prompt.
+
+Cost is flat in account size: candidates come from a bounded pool of index
+lookups (an evenly spaced sample across ids, the newest posts and the
+engagement extremes), account-wide stats from a count and the heatmap cube,
+and post text is only loaded for the posts that can make it into the prompt.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from heatmap import get_heatmap
+from models import DEFAULT_MEDIA_TYPE, Post
+from themes import FALLBACK_THEME, theme_distribution
+from config import settings
+
+UNIFORM_POOL_SIZE = 400
+RECENT_POOL_SIZE = 100
+EXTREMES_POOL_SIZE = 50  # From each end of the engagement ranking
+RECENCY_BUCKETS = ((7, "this week"), (30, "this month"), (90, "this quarter"), (None, "older"))
+SNIPPET_CHARS = 200
+
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+def estimate_tokens(text: str) -> int:
+    """Local estimate of BPE tokens: ~4 letters per token, digits in groups of 3, one per other symbol"""
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text or ""):
+        if piece[0].isascii() and piece[0].isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1 if piece.isascii() else 2  # emoji and other non-ASCII symbols split further
+    return tokens
+
+def format_sample_line(post: Dict) -> str:
+    """How a sampled post appears in the portrait prompt"""
+    snippet = re.sub(r"\s+", " ", post["content"]).strip()
+    if len(snippet) > SNIPPET_CHARS:
+        snippet = snippet[:SNIPPET_CHARS].rstrip() + "..."
+    return (
+        f'- [{(post["media_type"] or DEFAULT_MEDIA_TYPE).lower()}, {post["primary_theme"] or FALLBACK_THEME}, '
+        f'{post["engagement_rate"] or 0:.1f}% engagement] "{snippet}"'
+    )
+
+def _recency_bucket(created_at: Optional[datetime], now: datetime) -> str:
+    if created_at is None:
+        return RECENCY_BUCKETS[-1][1]
+    age = now - created_at
+    for days, label in RECENCY_BUCKETS:
+        if days is None or age <= timedelta(days=days):
+            return label
+
+_POOL_COLUMNS = (Post.id, Post.media_type, Post.primary_theme, Post.created_at, Post.engagement_rate)
+
+def _candidate_pool(db: Session, total_posts: int) -> Tuple[Dict[int, Dict], List[int]]:
+    """Candidate rows (no text) keyed by id, and the ids of the uniform part of the pool"""
+    if total_posts <= UNIFORM_POOL_SIZE:
+        rows = db.execute(select(*_POOL_COLUMNS)).all()
+        pool = {row.id: row._asdict() for row in rows}
+        return pool, list(pool)
+
+    # Evenly spaced ids stand in for a uniform sample: primary key lookups only
+    min_id = db.scalar(select(func.min(Post.id)))  # separate statements: each is one index probe
+    max_id = db.scalar(select(func.max(Post.id)))
+    target_ids = np.unique(np.linspace(min_id, max_id, UNIFORM_POOL_SIZE).round().astype(int)).tolist()
+    pool = {row.id: row._asdict() for row in db.execute(select(*_POOL_COLUMNS).where(Post.id.in_(target_ids)))}
+    uniform_ids = list(pool)
+
+    for ordering, limit in (
+        (Post.created_at.desc(), RECENT_POOL_SIZE),
+        (Post.engagement_rate.desc(), EXTREMES_POOL_SIZE),
+        (Post.engagement_rate.asc(), EXTREMES_POOL_SIZE)
+    ):
+        for row in db.execute(select(*_POOL_COLUMNS).order_by(ordering).limit(limit)):
+            pool.setdefault(row.id, row._asdict())
+    return pool, uniform_ids
+
+def _interleave(lists: List[List[int]]) -> List[int]:
+    """Round-robin merge, longest list first"""
+    lists = sorted(lists, key=len, reverse=True)
+    merged = []
+    for depth in range(len(lists[0]) if lists else 0):
+        merged.extend(items[depth] for items in lists if depth < len(items))
+    return merged
+
+def _stratified_order(posts: List[Dict], keys: List[Tuple], level: int = 0) -> List[int]:
+    """Order posts so every prefix covers the strata, one dimension at a time.
+
+    Posts are split on the key at `level` and the sub-orderings interleaved,
+    so the first picks span every theme, the next every media type within
+    them, then recency and engagement quartile. Within a full stratum the
+    post closest to its median engagement comes first.
+    """
+    if not keys or level == len(keys[0]):
+        median = float(np.median([post["engagement_rate"] or 0.0 for post in posts])) if posts else 0.0
+        return [post["id"] for post in sorted(posts, key=lambda post: abs((post["engagement_rate"] or 0.0) - median))]
+
+    groups: Dict[object, Tuple[List[Dict], List[Tuple]]] = defaultdict(lambda: ([], []))
+    for post, key in zip(posts, keys):
+        members, member_keys = groups[key[level]]
+        members.append(post)
+        member_keys.append(key)
+    return _interleave([_stratified_order(members, member_keys, level + 1) for members, member_keys in groups.values()])
+
+def _priority(pool: Dict[int, Dict], uniform_ids: List[int], now: datetime) -> List[int]:
+    """Pool ids ordered by stratum coverage: (theme, media type, recency, engagement quartile)"""
+    uniform_engagement = [pool[post_id]["engagement_rate"] or 0.0 for post_id in uniform_ids]
+    quartiles = np.percentile(uniform_engagement, (25, 50, 75)) if uniform_engagement else np.zeros(3)
+
+    posts = list(pool.values())
+    keys = [
+        (
+            post["primary_theme"] or FALLBACK_THEME,
+            post["media_type"] or DEFAULT_MEDIA_TYPE,
+            _recency_bucket(post["created_at"], now),
+            int(np.searchsorted(quartiles, post["engagement_rate"] or 0.0, side="right"))
+        )
+        for post in posts
+    ]
+    return _stratified_order(posts, keys)
+
+def sample_posts(
+    db: Session,
+    token_budget: Optional[int] = None,
+    max_posts: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> Dict:
+    """Account-wide portrait stats plus a stratified sample of posts whose prompt lines fit token_budget"""
+    token_budget = settings.PORTRAIT_TOKEN_BUDGET if token_budget is None else token_budget
+    max_posts = settings.PORTRAIT_MAX_SAMPLE_POSTS if max_posts is None else max_posts
+    now = now or datetime.utcnow()
+
+    total_posts = db.scalar(select(func.count()).select_from(Post))
+    if not total_posts:
+        return {"total_posts": 0, "avg_engagement": 0.0, "themes": {}, "busiest_weekday": None, "busiest_hour": None, "posts": [], "tokens": 0}
+
+    pool, uniform_ids = _candidate_pool(db, total_posts)
+
+    # Posting rhythm and average engagement from the maintained cube; the uniform pool if it's empty
+    heatmap = get_heatmap(db)
+    if heatmap["total_posts"]:
+        busiest = max(heatmap["cells"], key=lambda cell: cell["posts"])
+        avg_engagement = heatmap["overall_avg_engagement"]
+        busiest_weekday, busiest_hour = busiest["weekday"], busiest["hour"]
+    else:
+        uniform = [pool[post_id] for post_id in uniform_ids]
+        avg_engagement = round(float(np.mean([post["engagement_rate"] or 0.0 for post in uniform])), 2)
+        dated = [post["created_at"] for post in uniform if post["created_at"]]
+        busiest_weekday = Counter(created_at.weekday() for created_at in dated).most_common(1)[0][0] if dated else None
+        busiest_hour = Counter(created_at.hour for created_at in dated).most_common(1)[0][0] if dated else None
+
+    # Text only for the front of the priority list: at most 2 x max_posts rows
+    candidates = _priority(pool, uniform_ids, now)[:max_posts * 2]
+    contents = dict(db.execute(select(Post.id, Post.content).where(Post.id.in_(candidates))).all()) if candidates else {}
+
+    sampled, tokens = [], 0
+    for post_id in candidates:
+        if len(sampled) >= max_posts:
+            break
+        if not (contents.get(post_id) or "").strip():
+            continue
+        post = {**pool[post_id], "content": contents[post_id]}
+        line = format_sample_line(post)
+        cost = estimate_tokens(line)
+        if tokens + cost > token_budget:
+            continue
+        tokens += cost
+        sampled.append({**post, "line": line})
+
+    return {
+        "total_posts": total_posts,
+        "avg_engagement": avg_engagement,
+        "themes": theme_distribution([pool[post_id]["primary_theme"] for post_id in uniform_ids]),
+        "busiest_weekday": busiest_weekday,
+        "busiest_hour": busiest_hour,
+        "posts": sampled,
+        "tokens": tokens
+    }
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""MinHash signatures and LSH buckets over post content, maintained by sync.
+
+Each post's text is cut into character shingles and summarized by NUM_PERM
+min-hashes; the fraction of equal min-hashes between two posts estimates the
+Jaccard similarity of their shingle sets. Signatures are split into BANDS
+bands whose hashes are stored as bucket keys, so finding candidates is an
+indexed lookup of BANDS keys instead of a comparison against every post.
+With 32 bands of 4 rows, pairs above ~0.5 similarity collide with high
+probability and pairs below ~0.2 rarely do.
+"""
+import hashlib
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from database import iter_post_batches
+from models import LshBucket, Post, PostSignature
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_PERM // BANDS
+NEAR_DUPLICATE_SIMILARITY = 0.8
+MAX_CANDIDATES = 200
+
+_PRIME = (1 << 31) - 1  # a * x stays below 2**62, so uint64 never overflows
+# Fixed seed: stored signatures stay comparable across processes and restarts
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+def shingles(text: Optional[str]) -> set:
+    """Lowercased, whitespace-normalized character shingles of a text"""
+    normalized = re.sub(r"\s+", " ", (text or "").lower()).strip()
+    if not normalized:
+        return set()
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+def minhash(text: Optional[str]) -> Optional[List[int]]:
+    """NUM_PERM min-hashes of the text's shingles, or None for empty text"""
+    shingle_set = shingles(text)
+    if not shingle_set:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingle_set),
+        dtype=np.uint64, count=len(shingle_set)
+    )
+    return ((np.outer(_A, hashes) + _B[:, None]) % _PRIME).min(axis=1).tolist()
+
+def band_keys(signature: Sequence[int]) -> List[str]:
+    """One bucket key per band: the band number plus a hash of its rows"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(",".join(map(str, rows)).encode(), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+def estimate_similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+def index_posts(db: Session, contents: Dict[int, Optional[str]], replace: bool = True) -> int:
+    """(Re)index posts given as post_id -> content; returns the number of signatures written.
+
+    Posts whose stored signature already matches their content are skipped.
+    Pass replace=False when the posts are known to have no index entries.
+    """
+    signatures = {post_id: minhash(content) for post_id, content in contents.items()}
+    if replace:
+        stored = dict(db.execute(
+            select(PostSignature.post_id, PostSignature.signature).where(PostSignature.post_id.in_(signatures))
+        ).all())
+        signatures = {
+            post_id: signature for post_id, signature in signatures.items()
+            if post_id not in stored or stored[post_id] != signature
+        }
+        stale = [post_id for post_id in signatures if post_id in stored]
+        if stale:
+            db.execute(delete(LshBucket).where(LshBucket.post_id.in_(stale)))
+            db.execute(delete(PostSignature).where(PostSignature.post_id.in_(stale)))
+
+    indexed = {post_id: signature for post_id, signature in signatures.items() if signature is not None}
+    if indexed:
+        db.execute(insert(PostSignature), [
+            {"post_id": post_id, "signature": signature} for post_id, signature in indexed.items()
+        ])
+        db.execute(insert(LshBucket), [
+            {"key": key, "post_id": post_id}
+            for post_id, signature in indexed.items() for key in band_keys(signature)
+        ])
+    return len(indexed)
+
+def update_similarity_index(db: Session, rows: List[Dict], previous: Dict[str, Dict], post_ids: Dict[str, int]) -> int:
+    """Index the content of one upsert batch (new posts and edits); metric refreshes carry no content"""
+    rows = [row for row in rows if "content" in row]
+    if not rows:
+        return 0
+
+    return index_posts(db, {post_ids[row["thread_id"]]: row["content"] for row in rows if row["thread_id"] in post_ids})
+
+def rebuild_similarity_index(db: Session, batch_size: int = 1000) -> int:
+    """Recompute every signature and bucket from the posts table; returns the number of posts indexed"""
+    db.execute(delete(LshBucket))
+    db.execute(delete(PostSignature))
+    indexed = 0
+    for batch in iter_post_batches(db, (Post.content,), batch_size):
+        indexed += index_posts(db, {row["id"]: row["content"] for row in batch}, replace=False)
+        db.flush()
+    return indexed
+
+def get_similar_posts(db: Session, post_id: int, k: int = 10, min_similarity: float = 0.0) -> List[Dict]:
+    """Top-k posts whose content resembles the given post's, with their engagement.
+
+    Candidates come from the post's LSH buckets (BANDS indexed lookups), so
+    the cost depends on how many posts collide, not on the corpus size.
+    """
+    signature = db.scalar(select(PostSignature.signature).where(PostSignature.post_id == post_id))
+    if signature is None:
+        # Not indexed yet (e.g. synced before the index existed): hash it now
+        signature = minhash(db.scalar(select(Post.content).where(Post.id == post_id)))
+        if signature is None:
+            return []
+
+    candidates = db.execute(
+        select(PostSignature.post_id, PostSignature.signature)
+        .where(PostSignature.post_id.in_(
+            # Posts sharing the most bands first
+            select(LshBucket.post_id).where(LshBucket.key.in_(band_keys(signature)), LshBucket.post_id != post_id)
+            .group_by(LshBucket.post_id).order_by(func.count().desc()).limit(MAX_CANDIDATES)
+        ))
+    ).all()
+    scored = sorted(
+        ((estimate_similarity(signature, other), other_id) for other_id, other in candidates),
+        reverse=True
+    )
+    scored = [(similarity, other_id) for similarity, other_id in scored if similarity >= min_similarity][:k]
+    if not scored:
+        return []
+
+    posts = {
+        row.id: row for row in db.execute(
+            select(
+                Post.id, Post.thread_id, Post.content, Post.media_type, Post.created_at,
+                Post.views, Post.likes, Post.replies, Post.reposts, Post.shares, Post.engagement_rate
+            ).where(Post.id.in_([other_id for _, other_id in scored]))
+        )
+    }
+    return [
+        {
+            "thread_id": posts[other_id].thread_id,
+            "content": posts[other_id].content,
+            "media_type": posts[other_id].media_type,
+            "created_at": posts[other_id].created_at.isoformat() if posts[other_id].created_at else None,
+            "similarity": round(similarity, 3),
+            "near_duplicate": similarity >= NEAR_DUPLICATE_SIMILARITY,
+            "metrics": {
+                "views": posts[other_id].views,
+                "likes": posts[other_id].likes,
+                "replies": posts[other_id].replies,
+                "reposts": posts[other_id].reposts,
+                "shares": posts[other_id].shares,
+                "engagement_rate": posts[other_id].engagement_rate
+            }
+        }
+        for similarity, other_id in scored if other_id in posts
+    ]
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""Mergeable quantile sketches of post metrics per posting day, maintained by sync."""
+import json
+import math
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from database import iter_post_batches
+from models import MetricSketch, Post
+
+SKETCH_METRICS = ("engagement_rate", "views")
+
+# Every quantile estimate is within this relative error of a value of that rank
+RELATIVE_ACCURACY = 0.01
+
+class QuantileSketch:
+    """DDSketch-style log-bucketed histogram.
+
+    Values fall into buckets whose bounds grow by gamma = (1+a)/(1-a), so any
+    quantile is answered within relative error `a`. Unlike t-digest/KLL the
+    bucket counts can be decremented exactly, which sync needs when a post's
+    metrics are refreshed. Sketches with the same accuracy merge by adding
+    counts. Size is bounded by the value range: about 1,200 buckets cover
+    0.01 to 1e9 at 1%.
+    """
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY, bins: Optional[Dict[int, int]] = None, zero_count: int = 0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = dict(bins or {})
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        """Representative value of a bucket (minimizes relative error over its range)"""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        if value is None or value < 0:
+            return
+        if value == 0:
+            self.zero_count += count
+            return
+        key = self._key(value)
+        self.bins[key] = self.bins.get(key, 0) + count
+
+    def remove(self, value: float, count: int = 1):
+        """Undo add(value, count) (no-op for values that were never added)"""
+        if value is None or value < 0:
+            return
+        if value == 0:
+            self.zero_count = max(self.zero_count - count, 0)
+            return
+        key = self._key(value)
+        remaining = self.bins.get(key, 0) - count
+        if remaining > 0:
+            self.bins[key] = remaining
+        else:
+            self.bins.pop(key, None)
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (0..1), or None for an empty sketch"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.bins))
+
+    def histogram(self, max_buckets: int = 20) -> List[Dict]:
+        """Counts over at most max_buckets contiguous value ranges (plus one for zeros)"""
+        histogram = [{"lower": 0.0, "upper": 0.0, "count": self.zero_count}] if self.zero_count else []
+        if not self.bins:
+            return histogram
+        low, high = min(self.bins), max(self.bins)
+        width = max(math.ceil((high - low + 1) / max_buckets), 1)
+        grouped: Dict[int, int] = defaultdict(int)
+        for key, count in self.bins.items():
+            grouped[(key - low) // width] += count
+        for group in sorted(grouped):
+            first_key = low + group * width
+            histogram.append({
+                "lower": round(self.gamma ** (first_key - 1), 4),
+                "upper": round(self.gamma ** (first_key + width - 1), 4),
+                "count": grouped[group]
+            })
+        return histogram
+
+    def to_json(self) -> str:
+        return json.dumps({"zero_count": self.zero_count, "bins": {str(key): count for key, count in self.bins.items()}})
+
+    @classmethod
+    def from_json(cls, data: str, relative_accuracy: float = RELATIVE_ACCURACY) -> "QuantileSketch":
+        parsed = json.loads(data) if data else {}
+        bins = {int(key): count for key, count in parsed.get("bins", {}).items()}
+        return cls(relative_accuracy, bins, parsed.get("zero_count", 0))
+
+def _day(created_at: Optional[datetime]) -> Optional[datetime]:
+    return datetime.combine(created_at.date(), time()) if created_at else None
+
+def update_sketches(db: Session, rows: List[Dict], previous: Dict[str, Dict]) -> int:
+    """Move each upserted post's metric values between the per-day sketches.
+
+    Old values are removed from the old day's sketch before the new ones are
+    added. Returns the number of sketches written.
+    """
+    changes: Dict[Tuple[datetime, str], List[Tuple[float, int]]] = defaultdict(list)  # (value, +1/-1)
+    for row in rows:
+        before = previous.get(row["thread_id"])
+        created_at = before["created_at"] if before else row.get("created_at")
+        day = _day(created_at)
+        for metric in SKETCH_METRICS:
+            old_value = before[metric] if before else None
+            new_value = row.get(metric, old_value)
+            if day is None or (before is not None and new_value == old_value):
+                continue
+            if old_value is not None:
+                changes[(day, metric)].append((old_value, -1))
+            if new_value is not None:
+                changes[(day, metric)].append((new_value, 1))
+
+    if not changes:
+        return 0
+
+    stored = {
+        (sketch.day, sketch.metric): sketch
+        for sketch in db.scalars(
+            select(MetricSketch).where(
+                MetricSketch.day.in_({day for day, _ in changes}),
+                MetricSketch.metric.in_({metric for _, metric in changes})
+            )
+        )
+    }
+    for (day, metric), values in changes.items():
+        record = stored.get((day, metric))
+        if record is None:
+            record = MetricSketch(day=day, metric=metric)
+            db.add(record)
+        sketch = QuantileSketch.from_json(record.data)
+        for value, sign in values:
+            if sign > 0:
+                sketch.add(value)
+            else:
+                sketch.remove(value)
+        record.count = sketch.count
+        record.data = sketch.to_json()
+
+    return len(changes)
+
+def rebuild_sketches(db: Session, batch_size: int = 1000) -> int:
+    """Recompute all sketches from the posts table; returns the number of sketches"""
+    db.execute(delete(MetricSketch))
+    columns = (Post.thread_id, Post.created_at, *(getattr(Post, metric) for metric in SKETCH_METRICS))
+    for batch in iter_post_batches(db, columns, batch_size):
+        update_sketches(db, batch, previous={})
+        db.flush()
+
+    return db.scalar(select(func.count(MetricSketch.id)))
+
+def get_quantiles(
+    db: Session,
+    metric: str,
+    quantiles: Sequence[float],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    histogram_buckets: int = 0
+) -> Dict:
+    """Merge the per-day sketches of a metric in [start, end] and read quantiles from the result.
+
+    Cost depends on the number of days in range, not the number of posts.
+    """
+    query = select(MetricSketch.data).where(MetricSketch.metric == metric)
+    if start is not None:
+        query = query.where(MetricSketch.day >= datetime.combine(start, time()))
+    if end is not None:
+        query = query.where(MetricSketch.day < datetime.combine(end + timedelta(days=1), time()))
+
+    merged = QuantileSketch()
+    for data in db.scalars(query):
+        merged.merge(QuantileSketch.from_json(data))
+
+    result = {
+        "metric": metric,
+        "count": merged.count,
+        "relative_accuracy": merged.relative_accuracy,
+        "quantiles": {f"p{q * 100:g}": merged.quantile(q) for q in quantiles}
+    }
+    if histogram_buckets:
+        result["histogram"] = merged.histogram(histogram_buckets)
+    return result
\ No newline at end of file
@@ -34,7 +34,9 @@ document.addEventListener('alpine:init', () => {
         async syncData() {
             this.loading = true;
             try {
-                await fetch('/api/sync', { method: 'POST' });
+                const response = await fetch('/api/sync', { method: 'POST' });
+                const job = await response.json();
+                await this.waitForSyncJob(job.job_id);
                 await this.loadData();
             } catch (error) {
                 console.error('Error syncing data:', error);
@@ -42,6 +44,17 @@ document.addEventListener('alpine:init', () => {
             this.loading = false;
         },
         
+        async waitForSyncJob(jobId) {
+            // Sync runs as a background job; poll until it finishes
+            while (true) {
+                const response = await fetch(`/api/sync/${jobId}`);
+                const job = await response.json();
+                if (job.status === 'succeeded') return job;
+                if (job.status === 'failed') throw new Error(job.error || 'Sync failed');
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+        },
+        
         sortPosts() {
             this.posts.sort((a, b) => {
                 const aVal = a[this.sortBy];
@@ -4,6 +4,7 @@ document.addEventListener('alpine:init', () => {
         currentStep: 'landing', // landing, connecting, reading, results
         readingStep: 0,
         loading: false,
+        shareReady: false,
         portrait: {},
         shareableContent: {},
         
@@ -40,7 +41,8 @@ document.addEventListener('alpine:init', () => {
                     throw new Error('Failed to sync data');
                 }
                 
-                const result = await response.json();
+                const job = await response.json();
+                const result = await this.waitForSyncJob(job.job_id);
                 console.log('✨ Data synced:', result);
                 
             } catch (error) {
@@ -49,6 +51,17 @@ document.addEventListener('alpine:init', () => {
             }
         },
         
+        async waitForSyncJob(jobId) {
+            // Sync runs as a background job; poll until it finishes
+            while (true) {
+                const response = await fetch(`/api/sync/${jobId}`);
+                const job = await response.json();
+                if (job.status === 'succeeded') return job;
+                if (job.status === 'failed') throw new Error(job.error || 'Sync failed');
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+        },
+        
         async animateReading() {
             const steps = [1, 2, 3, 4];
             
@@ -63,7 +76,55 @@ document.addEventListener('alpine:init', () => {
         
         async generatePortrait() {
             this.loading = true;
+            this.shareReady = false;
             
+            try {
+                await this.streamPortrait();
+            } catch (error) {
+                console.warn('Portrait stream unavailable, requesting it whole:', error);
+                await this.fetchPortrait();
+            }
+            
+            this.loading = false;
+            this.shareReady = true;
+        },
+        
+        streamPortrait() {
+            // Fields arrive as the model writes them; the share image comes with the final event
+            return new Promise((resolve, reject) => {
+                const source = new EventSource('/api/generate-portrait/stream');
+                let revealed = false;
+                
+                source.addEventListener('field', (event) => {
+                    const field = JSON.parse(event.data);
+                    if (!revealed) {
+                        // Swap the spinner for the results and fill them in
+                        revealed = true;
+                        this.portrait = {};
+                        this.loading = false;
+                        this.currentStep = 'results';
+                    }
+                    this.portrait = { ...this.portrait, [field.name]: field.value };
+                });
+                
+                source.addEventListener('portrait', (event) => {
+                    const result = JSON.parse(event.data);
+                    source.close();
+                    this.portrait = result.portrait;
+                    this.shareableContent = result.shareable_content;
+                    this.currentStep = 'results';
+                    resolve();
+                });
+                
+                // Both a server-sent error event and a failed connection (e.g. no posts yet)
+                source.addEventListener('error', (event) => {
+                    source.close();
+                    reject(new Error(event.data ? JSON.parse(event.data).detail : 'Portrait stream failed'));
+                });
+            });
+        },
+        
+        async fetchPortrait() {
             try {
                 const response = await fetch('/api/generate-portrait', {
                     method: 'POST'
@@ -86,8 +147,6 @@ document.addEventListener('alpine:init', () => {
                 this.shareableContent = this.getDemoShareableContent();
                 this.currentStep = 'results';
             }
-            
-            this.loading = false;
         },
         
         async shareToThreads() {
@@ -169,6 +228,7 @@ document.addEventListener('alpine:init', () => {
         retakeReading() {
             this.currentStep = 'landing';
             this.readingStep = 0;
+            this.shareReady = false;
             this.portrait = {};
             this.shareableContent = {};
         },
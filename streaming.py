@@ -0,0 +1,101 @@
+"""Server-sent events and incremental parsing of streamed LLM output."""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+def sse_event(event: str, data: Any) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def parse_json_object(text: str) -> Dict[str, Any]:
+    """JSON object from a model reply, tolerating a code fence or text around it (as JsonFieldParser does)"""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object in response")
+    result = json.loads(text[start:end + 1])
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    return result
+
+class JsonFieldParser:
+    """Incremental parser for a streamed JSON object that reports each top-level field once it's complete.
+
+    Feed it text chunks as they arrive; `feed` returns the (key, value)
+    pairs completed by that chunk. Text before the opening brace (a code
+    fence, a preamble) is skipped, and each character is scanned once, so a
+    whole response costs O(n) however it's chunked. A field whose value
+    doesn't parse is dropped rather than failing the stream.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "start"  # start, key, colon, value_start, value
+        self._start = 0
+        self._key: Optional[str] = None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        while self._pos < len(buffer) and not self.done:
+            i, char = self._pos, buffer[self._pos]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key":
+                        self._key = json.loads(buffer[self._start:i + 1])
+                        self._state = "colon"
+                continue
+
+            if self._state == "start":
+                if char == "{":
+                    self._depth = 1
+                    self._state = "key"
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == "key":
+                    self._start = i
+                elif self._depth == 1 and self._state == "value_start":
+                    self._start, self._state = i, "value"
+            elif char in "{[":
+                if self._depth == 1 and self._state == "value_start":
+                    self._start, self._state = i, "value"
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete(buffer[self._start:i], completed)
+                    self.done = True
+            elif self._depth == 1:
+                if char == ":" and self._state == "colon":
+                    self._state = "value_start"
+                elif char == ",":
+                    self._complete(buffer[self._start:i], completed)
+                    self._state = "key"
+                elif not char.isspace() and self._state == "value_start":
+                    self._start, self._state = i, "value"  # number, true, false, null
+        return completed
+
+    def _complete(self, raw: str, completed: List[Tuple[str, Any]]):
+        if self._state != "value" or self._key is None:
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+        self._key = None
\ No newline at end of file
@@ -0,0 +1,122 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import SYNC_JOB_ACTIVE_STATUSES as ACTIVE_STATUSES, SyncJob
+from sync_service import SyncService
+from config import settings
+
+class SyncJobManager:
+    def __init__(self, sync_service: SyncService):
+        self.sync_service = sync_service
+        self._submit_locks: Dict[str, asyncio.Lock] = {}
+        self.stale_after = timedelta(minutes=settings.SYNC_JOB_STALE_MINUTES)
+
+    async def submit(self, db: AsyncSession, account_id: str) -> Tuple[SyncJob, bool]:
+        """Enqueue a sync job for the account, or join the one already queued/running.
+
+        Concurrent submits in this process are serialized per account; across
+        processes, the unique index on active jobs rejects the second insert
+        and that submit joins the winner's job instead.
+
+        An active job whose worker stopped sending heartbeats is failed first
+        rather than joined.
+
+        Returns the job and whether it was newly created.
+        """
+        async with self._submit_locks.setdefault(account_id, asyncio.Lock()):
+            await self._fail_stale(db, SyncJob.account_id == account_id)
+            while True:
+                active_job = await db.scalar(
+                    select(SyncJob)
+                    .where(SyncJob.account_id == account_id, SyncJob.status.in_(ACTIVE_STATUSES))
+                    .order_by(SyncJob.created_at.desc())
+                    .limit(1)
+                )
+                if active_job:
+                    return active_job, False
+
+                job = SyncJob(id=uuid.uuid4().hex, account_id=account_id, status="queued")
+                db.add(job)
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    await db.rollback()  # Another process enqueued one first: look it up again
+                    continue
+                return job, True
+
+    async def get(self, db: AsyncSession, job_id: str) -> Optional[SyncJob]:
+        return await db.get(SyncJob, job_id)
+
+    async def run(self, job_id: str, session_factory: Callable[[], AsyncSession]):
+        """Run a queued job in the background with its own session, persisting progress as it goes"""
+        async with session_factory() as db:
+            job = await db.get(SyncJob, job_id)
+            if job is None:
+                return
+            job.status = "running"
+            job.started_at = job.heartbeat_at = datetime.utcnow()
+            await db.commit()
+
+            async def on_progress(progress: Dict):
+                job.pages_fetched = progress["pages_fetched"]
+                job.posts_upserted = progress["posts_synced"]
+                job.posts_refreshed = progress["posts_refreshed"]
+                job.heartbeat_at = datetime.utcnow()
+                await db.commit()
+
+            try:
+                result = await self.sync_service.sync(db, on_progress=on_progress)
+            except Exception as e:
+                await db.rollback()
+                job = await db.get(SyncJob, job_id)
+                job.status = "failed"
+                job.error = str(e)
+            else:
+                await on_progress(result)
+                job.status = "succeeded"
+
+            job.finished_at = datetime.utcnow()
+            await db.commit()
+
+    async def recover_interrupted(self, db: AsyncSession) -> int:
+        """Fail jobs a dead process left queued/running so new syncs aren't blocked.
+
+        Only jobs without a heartbeat for stale_after are failed: other live
+        workers may be running the rest.
+        """
+        return await self._fail_stale(db)
+
+    async def _fail_stale(self, db: AsyncSession, *criteria) -> int:
+        now = datetime.utcnow()
+        stale = (await db.scalars(
+            select(SyncJob).where(
+                SyncJob.status.in_(ACTIVE_STATUSES),
+                func.coalesce(SyncJob.heartbeat_at, SyncJob.created_at) < now - self.stale_after,
+                *criteria
+            )
+        )).all()
+        for job in stale:
+            job.status = "failed"
+            job.error = "Interrupted: no heartbeat from its worker"
+            job.finished_at = now
+        await db.commit()
+        return len(stale)
+
+def serialize_job(job: SyncJob) -> Dict:
+    return {
+        "job_id": job.id,
+        "account_id": job.account_id,
+        "status": job.status,
+        "pages_fetched": job.pages_fetched,
+        "posts_upserted": job.posts_upserted,
+        "posts_refreshed": job.posts_refreshed,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None
+    }
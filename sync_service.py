@@ -0,0 +1,230 @@
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import Post, SyncState
+from database import upsert_posts
+from timeseries import record_snapshots, compact_snapshots
+from rollups import update_rollups
+from sketches import update_sketches
+from heatmap import update_heatmap
+from anomaly import update_velocity
+from similarity import update_similarity_index
+from terms import update_terms
+from themes import get_theme_classifier
+from data_collector import ThreadsAPIClient, normalize_media_type, parse_media_timestamp
+from config import settings
+
+# (max post age, refresh interval) tiers: young posts grow fastest, so their
+# metrics are refreshed more often. Older posts use STALE_REFRESH_INTERVAL.
+REFRESH_SCHEDULE = [
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=7), timedelta(hours=6)),
+    (timedelta(days=30), timedelta(days=1)),
+]
+STALE_REFRESH_INTERVAL = timedelta(days=7)
+
+SNAPSHOT_COMPACTION_INTERVAL = timedelta(days=1)
+
+class SyncService:
+    def __init__(self, client: ThreadsAPIClient):
+        self.client = client
+        self.page_size = settings.SYNC_PAGE_SIZE
+        self.max_pages = settings.SYNC_MAX_PAGES or None
+        self.max_age = timedelta(days=settings.SYNC_MAX_AGE_DAYS) if settings.SYNC_MAX_AGE_DAYS else None
+        self.refresh_limit = settings.SYNC_REFRESH_LIMIT
+        self.theme_classifier = get_theme_classifier()
+
+    async def sync(self, db: AsyncSession, on_progress: Optional[Callable[[Dict], Awaitable[None]]] = None) -> Dict:
+        """Fetch media newer than the account's watermark, then refresh metrics of posts that are due.
+        
+        When max_pages stops the stream before it reaches the watermark, the
+        watermark stays put and the next sync resumes from the saved paging
+        cursor, until the gap is filled. Media posted meanwhile is fetched by
+        the sync after that.
+        
+        `on_progress` is awaited with the running counters after every committed
+        page and refresh batch.
+        """
+        state = await self._get_state(db)
+        sync_started_at = datetime.utcnow()
+        newest_media_at = state.backfill_newest_at if state.backfill_after else state.newest_media_at
+        resume_after = None
+        pages_fetched = 0
+        posts_synced = 0
+
+        # Stream new media page by page, persisting each page as it arrives
+        async for media_page, resume_after in self.client.iter_media_page_cursors(
+            page_size=self.page_size,
+            max_pages=self.max_pages,
+            max_age=self.max_age,
+            since=state.newest_media_at,
+            after=state.backfill_after
+        ):
+            if not media_page:
+                continue
+            posts_synced += await self._sync_page(db, media_page)
+            await db.commit()
+            pages_fetched += 1
+            if on_progress:
+                await on_progress({"pages_fetched": pages_fetched, "posts_synced": posts_synced, "posts_refreshed": 0})
+
+            page_newest = max(parse_media_timestamp(media["timestamp"]) for media in media_page)
+            if newest_media_at is None or page_newest > newest_media_at:
+                newest_media_at = page_newest
+
+        # Only advance the watermark once the stream reached it, so an
+        # interrupted or truncated sync fills the gap instead of skipping it.
+        # Saved before the refresh pass, so a refresh failure can't undo ingestion.
+        if resume_after:
+            state.backfill_after = resume_after
+            state.backfill_newest_at = newest_media_at
+        else:
+            state.newest_media_at = newest_media_at
+            state.backfill_after = None
+            state.backfill_newest_at = None
+        state.last_synced_at = sync_started_at
+        await db.commit()
+
+        async def on_refresh_progress(posts_refreshed: int):
+            if on_progress:
+                await on_progress({"pages_fetched": pages_fetched, "posts_synced": posts_synced, "posts_refreshed": posts_refreshed})
+
+        posts_refreshed = await self._refresh_due_posts(db, sync_started_at, on_refresh_progress)
+
+        if state.last_compacted_at is None or state.last_compacted_at < sync_started_at - SNAPSHOT_COMPACTION_INTERVAL:
+            await db.run_sync(compact_snapshots, sync_started_at)
+            state.last_compacted_at = sync_started_at
+            await db.commit()
+
+        return {
+            "pages_fetched": pages_fetched,
+            "posts_synced": posts_synced,
+            "posts_refreshed": posts_refreshed
+        }
+
+    async def _get_state(self, db: AsyncSession) -> SyncState:
+        """Load (or create) the sync watermark for the configured account"""
+        state = await db.scalar(select(SyncState).where(SyncState.account_id == self.client.user_id))
+        if state is None:
+            state = SyncState(account_id=self.client.user_id)
+            db.add(state)
+        return state
+
+    async def _sync_page(self, db: AsyncSession, media_page: List[Dict]) -> int:
+        """Fetch insights for one page of media and bulk-upsert the posts"""
+        # Fetch insights for all posts concurrently over the pooled client
+        all_insights = await self.client.get_insights_for_media([media["id"] for media in media_page])
+        updated_at = datetime.utcnow()
+
+        rows = [
+            {
+                "thread_id": media["id"],
+                "content": media.get("text", ""),
+                "media_type": normalize_media_type(media.get("media_type")),
+                "created_at": parse_media_timestamp(media["timestamp"]),
+                **self._metric_values(all_insights.get(media["id"], {})),  # Zeros until insights are available
+                **self.theme_classifier.theme_columns(media.get("text", "")),
+                "updated_at": updated_at
+            }
+            for media in media_page
+        ]
+        await db.run_sync(self._upsert, rows, updated_at)
+
+        return len(media_page)
+
+    async def _refresh_due_posts(
+        self, db: AsyncSession, now: datetime, on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> int:
+        """Re-fetch insights for already-synced posts whose refresh interval has elapsed.
+        
+        Posts the API no longer has insights for (e.g. deleted on Threads) keep
+        their last metrics; their updated_at is still stamped so they wait for
+        their next refresh instead of heading the queue on every sync.
+        """
+        due_thread_ids = (await db.scalars(
+            select(Post.thread_id)
+            .where(self._refresh_due_clause(now))
+            .order_by(Post.updated_at)
+            .limit(self.refresh_limit)
+        )).all()
+        if not due_thread_ids:
+            return 0
+
+        for start in range(0, len(due_thread_ids), self.page_size):
+            batch = due_thread_ids[start:start + self.page_size]
+            all_insights = await self.client.get_insights_for_media(batch)
+            updated_at = datetime.utcnow()
+            rows = [
+                {"thread_id": thread_id, **self._metric_values(all_insights[thread_id]), "updated_at": updated_at}
+                for thread_id in batch if thread_id in all_insights
+            ]
+            if rows:
+                await db.run_sync(self._upsert, rows, updated_at)
+            unavailable = [thread_id for thread_id in batch if thread_id not in all_insights]
+            if unavailable:
+                await db.execute(update(Post).where(Post.thread_id.in_(unavailable)).values(updated_at=updated_at))
+            await db.commit()
+            if on_progress:
+                await on_progress(start + len(batch))
+
+        return len(due_thread_ids)
+
+    def _upsert(self, db: Session, rows: List[Dict], now: datetime):
+        """Bulk-upsert a batch of posts and maintain the data derived from it incrementally.
+        
+        Runs on the sync Session inside AsyncSession.run_sync. Every derived
+        store has a hook called here, in the same transaction, as
+        `hook(db, rows, previous, ...)`:
+        
+        - `rows` are the rows given to upsert_posts. A metric refresh carries
+          only thread_id, metrics and updated_at; a missing column is unchanged.
+        - `previous` is what upsert_posts returned: the pre-existing rows (id,
+          created_at, media_type, metrics) keyed by thread_id. A thread_id
+          missing from it is a new post. upsert_posts never overwrites
+          created_at, so a stored post's day comes from `previous`.
+        - `post_ids` (for hooks keyed by post id) is the id of every upserted
+          post keyed by thread_id, also from upsert_posts, so no hook has to
+          look up the ids of new posts.
+        
+        A hook moves each post's contribution from its old values to its new
+        ones and only writes what changed. Replaying stored posts with
+        previous={} therefore rebuilds a store from scratch (see derived.py).
+        """
+        previous, post_ids = upsert_posts(db, rows)
+        record_snapshots(db, rows, previous, post_ids, now)
+        update_rollups(db, rows, previous)
+        update_sketches(db, rows, previous)
+        update_heatmap(db, rows, previous)
+        update_velocity(db, rows, previous, post_ids, now)
+        update_similarity_index(db, rows, previous, post_ids)
+        update_terms(db, rows, previous, post_ids)
+
+    @staticmethod
+    def _refresh_due_clause(now: datetime):
+        """SQL condition selecting posts whose metrics are due for a refresh"""
+        clauses = []
+        younger_than: Optional[timedelta] = None
+        for max_age, interval in REFRESH_SCHEDULE:
+            tier = [Post.created_at > now - max_age, Post.updated_at < now - interval]
+            if younger_than is not None:
+                tier.append(Post.created_at <= now - younger_than)
+            clauses.append(and_(*tier))
+            younger_than = max_age
+        clauses.append(and_(
+            Post.created_at <= now - younger_than,
+            Post.updated_at < now - STALE_REFRESH_INTERVAL
+        ))
+        return or_(*clauses)
+
+    def _metric_values(self, insights: Dict) -> Dict:
+        """Post metric columns from an insights payload"""
+        return {
+            "views": insights.get("views", 0),
+            "likes": insights.get("likes", 0),
+            "replies": insights.get("replies", 0),
+            "reposts": insights.get("reposts", 0),
+            "shares": insights.get("shares", 0),
+            "engagement_rate": self.client.calculate_engagement_rate(insights)
+        }
@@ -0,0 +1,157 @@
+"""Inverted index of words, hashtags and emoji with running engagement stats per term, maintained by sync."""
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from database import iter_post_batches
+from models import Post, TermPosting, TermStat
+
+# Stats row holding the totals over every indexed post (the baseline for lift)
+CORPUS_TERM = ""
+TERM_KINDS = ("word", "hashtag", "emoji")
+MIN_WORD_LENGTH = 3
+
+_EMOJI = "\U0001F300-\U0001F3FA\U0001F400-\U0001FAFF\u2600-\u27BF"  # skips skin-tone modifiers
+TOKEN_PATTERN = re.compile(rf"#\w+|[{_EMOJI}]|[^\W\d_]+(?:'[^\W\d_]+)*")
+
+STOPWORDS = frozenset("""
+    about after again all also and any are because been before being but can could did does doing don't
+    for from had has have having her here hers him his how into its it's just more most not now off once
+    only other our out over own same she should some such than that the their them then there these they
+    this those through too under until very was were what when where which while who whom why will with
+    would you your yours
+""".split())
+
+def term_kind(term: str) -> str:
+    if term.startswith("#"):
+        return "hashtag"
+    if re.fullmatch(f"[{_EMOJI}]", term):
+        return "emoji"
+    return "word"
+
+def tokenize(text: Optional[str]) -> Set[str]:
+    """Distinct lowercased terms of a post: words (minus stopwords), hashtags and emoji"""
+    terms = set()
+    for token in TOKEN_PATTERN.findall((text or "").lower()):
+        if token.startswith("#"):
+            if len(token) > 1:
+                terms.add(token)
+        elif term_kind(token) == "emoji" or (len(token) >= MIN_WORD_LENGTH and token not in STOPWORDS):
+            terms.add(token)
+    return terms
+
+def update_terms(db: Session, rows: List[Dict], previous: Dict[str, Dict], post_ids: Dict[str, int]) -> int:
+    """Apply one upsert batch to the index: postings for new/edited content, stats for engagement changes.
+
+    A post's old terms come from its postings, so nothing is re-tokenized
+    unless the row carries content. Returns the number of term stats written.
+    """
+    changed = []
+    for row in rows:
+        before = previous.get(row["thread_id"])
+        old_engagement = (before["engagement_rate"] or 0.0) if before else None
+        new_engagement = row.get("engagement_rate", old_engagement) or 0.0
+        if before is not None and "content" not in row and new_engagement == old_engagement:
+            continue
+        changed.append((row, before, old_engagement, new_engagement))
+    if not changed:
+        return 0
+
+    old_terms: Dict[int, Set[str]] = defaultdict(set)
+    existing_ids = [before["id"] for _, before, _, _ in changed if before is not None]
+    if existing_ids:
+        for post_id, term in db.execute(
+            select(TermPosting.post_id, TermPosting.term).where(TermPosting.post_id.in_(existing_ids))
+        ):
+            old_terms[post_id].add(term)
+
+    deltas: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])  # posts, sum, sum of squares
+    rewritten, postings = [], []
+    for row, before, old_engagement, new_engagement in changed:
+        post_id = post_ids.get(row["thread_id"])
+        if post_id is None:
+            continue
+        old = old_terms.get(post_id, set())
+        new = tokenize(row["content"]) if "content" in row else old
+        if new != old:
+            if before is not None:
+                rewritten.append(post_id)
+            postings.extend({"term": term, "post_id": post_id} for term in new)
+        if before is not None and new == old and new_engagement == old_engagement:
+            continue
+
+        if before is not None:
+            for term in old | {CORPUS_TERM}:
+                delta = deltas[term]
+                delta[0] -= 1
+                delta[1] -= old_engagement
+                delta[2] -= old_engagement ** 2
+        for term in new | {CORPUS_TERM}:
+            delta = deltas[term]
+            delta[0] += 1
+            delta[1] += new_engagement
+            delta[2] += new_engagement ** 2
+
+    if rewritten:
+        db.execute(delete(TermPosting).where(TermPosting.post_id.in_(rewritten)))
+    if postings:
+        db.execute(insert(TermPosting), postings)
+
+    stored = {stat.term: stat for stat in db.scalars(select(TermStat).where(TermStat.term.in_(deltas)))}
+    for term, (posts, engagement_sum, engagement_sq_sum) in deltas.items():
+        stat = stored.get(term)
+        if stat is None:
+            stat = TermStat(term=term, kind=term_kind(term), posts=0, engagement_sum=0.0, engagement_sq_sum=0.0)
+            db.add(stat)
+        stat.posts += posts
+        stat.engagement_sum += engagement_sum
+        stat.engagement_sq_sum += engagement_sq_sum
+        stat.avg_engagement = stat.engagement_sum / stat.posts if stat.posts > 0 else 0.0
+    return len(deltas)
+
+def rebuild_terms(db: Session, batch_size: int = 1000) -> int:
+    """Re-tokenize every post into fresh postings and stats; returns the number of terms"""
+    db.execute(delete(TermPosting))
+    db.execute(delete(TermStat))
+    for batch in iter_post_batches(db, (Post.thread_id, Post.content, Post.engagement_rate), batch_size):
+        update_terms(db, batch, previous={}, post_ids={row["thread_id"]: row["id"] for row in batch})
+        db.flush()
+    return db.scalar(select(func.count()).select_from(TermStat).where(TermStat.term != CORPUS_TERM))
+
+def _term_stats(stat: TermStat, corpus_mean: float) -> Dict:
+    mean = stat.avg_engagement
+    variance = max(stat.engagement_sq_sum / stat.posts - mean ** 2, 0.0)
+    return {
+        "term": stat.term,
+        "kind": stat.kind,
+        "posts": stat.posts,
+        "avg_engagement": round(mean, 2),
+        "stderr": round(math.sqrt(variance / stat.posts), 2) if stat.posts > 1 else None,
+        "lift": round(mean / corpus_mean, 2) if corpus_mean else None
+    }
+
+def get_term_performance(db: Session, min_support: int = 5, limit: int = 20, kind: Optional[str] = None) -> Dict:
+    """Terms with the highest and lowest average engagement among those used in at least min_support posts.
+
+    Lift is a term's average engagement over the average of every indexed
+    post. Reads only the stats table: both lists walk the avg_engagement
+    index until `limit` terms with enough support are found.
+    """
+    corpus = db.get(TermStat, CORPUS_TERM)
+    corpus_posts = corpus.posts if corpus else 0
+    corpus_mean = corpus.engagement_sum / corpus.posts if corpus and corpus.posts else 0.0
+
+    query = select(TermStat).where(TermStat.term != CORPUS_TERM, TermStat.posts >= max(min_support, 1))
+    if kind:
+        query = query.where(TermStat.kind == kind)
+
+    return {
+        "posts": corpus_posts,
+        "avg_engagement": round(corpus_mean, 2),
+        "min_support": min_support,
+        "kind": kind,
+        "top": [_term_stats(stat, corpus_mean) for stat in db.scalars(query.order_by(TermStat.avg_engagement.desc()).limit(limit))],
+        "bottom": [_term_stats(stat, corpus_mean) for stat in db.scalars(query.order_by(TermStat.avg_engagement.asc()).limit(limit))]
+    }
\ No newline at end of file
@@ -1,13 +1,17 @@
 import pytest
 import asyncio
+import inspect
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 import tempfile
 import os
 
-from app import app
-from database import get_db
+from app import app, content_analyzer
+from database import get_db, get_async_db, get_async_read_db, get_async_session_factory, upsert_posts
+from llm_cache import LLMCache
 from models import Base
 
 # Test database setup
@@ -19,6 +23,9 @@ def test_db():
     
     engine = create_engine(database_url, connect_args={"check_same_thread": False})
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # The API runs on the async session; point it at the same file
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
     
     # Create tables
     Base.metadata.create_all(bind=engine)
@@ -30,15 +37,67 @@ def test_db():
         finally:
             db.close()
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: TestingAsyncSessionLocal
+    # The LLM cache opens its own sessions rather than using a request dependency
+    llm_cache = content_analyzer.cache
+    content_analyzer.cache = LLMCache(TestingAsyncSessionLocal)
     
     yield TestingSessionLocal()
     
+    content_analyzer.cache = llm_cache
+    
     # Cleanup
     os.close(db_fd)
     os.unlink(db_path)
     app.dependency_overrides.clear()
 
+@pytest.fixture
+def sync_db():
+    """Session on a fresh in-memory database, for the stores sync maintains"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+@pytest.fixture
+def upsert_with(sync_db):
+    """upsert_with(hook, rows, *args): upsert rows and run one store's hook as SyncService._upsert does, then commit.
+    
+    The hook gets post_ids when it takes them; `args` come after (e.g. now).
+    Returns what the hook returned.
+    """
+    def upsert(hook, rows, *args):
+        previous, post_ids = upsert_posts(sync_db, rows)
+        if "post_ids" in inspect.signature(hook).parameters:
+            args = (post_ids, *args)
+        result = hook(sync_db, rows, previous, *args)
+        sync_db.commit()
+        return result
+    return upsert
+
+@pytest.fixture
+def assert_rebuild_matches(sync_db):
+    """assert_rebuild_matches(rebuild, snapshot): a store rebuilt from the posts table equals its incremental state.
+    
+    Returns the snapshot, for assertions on the contents.
+    """
+    def check(rebuild, snapshot):
+        incremental = snapshot()
+        rebuild(sync_db)
+        sync_db.commit()
+        assert snapshot() == incremental
+        return incremental
+    return check
+
 @pytest.fixture
 def client(test_db):
     return TestClient(app)
@@ -1,10 +1,12 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from analytics import ContentAnalyzer, MetricsCalculator
-from models import Post
+from models import Base, Post
 
 
 class TestContentAnalyzer:
@@ -93,13 +95,91 @@ class TestContentAnalyzer:
         
         result = analyzer._is_analysis_cached(sample_post)
         assert result is False
+    
+    def _posts(self, count):
+        return [
+            Post(thread_id=f"post_{i}", content=f"Post number {i}", views=100, likes=5, engagement_rate=5.0)
+            for i in range(count)
+        ]
+    
+    def _completion(self, content):
+        response = MagicMock()
+        response.choices[0].message.content = content
+        return response
+    
+    @pytest.mark.asyncio
+    async def test_analyze_posts_batches_into_one_prompt(self, analyzer, mock_openai_response):
+        posts = self._posts(3)
+        reply = '```json\n[{"post": 1, "analysis": "A"}, {"post": 2, "analysis": "B"}, {"post": 3, "analysis": "C"}]\n```'
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.return_value = self._completion(reply)
+            
+            result = await analyzer.analyze_posts(posts)
+        
+        assert result == {"post_0": "A", "post_1": "B", "post_2": "C"}
+        mock_openai.assert_called_once()
+        assert posts[1].analysis_result == "B"
+    
+    @pytest.mark.asyncio
+    async def test_analyze_posts_falls_back_for_unparsed_posts(self, analyzer):
+        posts = self._posts(3)
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai, \
+             patch.object(analyzer, 'analyze_post_content', new_callable=AsyncMock) as mock_single:
+            mock_openai.return_value = self._completion('[{"post": 2, "analysis": "B"}] and some chatter')
+            mock_single.return_value = "Single"
+            
+            result = await analyzer.analyze_posts(posts)
+        
+        assert result == {"post_0": "Single", "post_1": "B", "post_2": "Single"}
+        assert mock_single.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_analyze_posts_skips_cached_posts(self, analyzer):
+        posts = self._posts(2)
+        posts[0].analysis_result = "Cached"
+        posts[0].analysis_date = datetime.utcnow()
+        
+        with patch.object(analyzer, 'analyze_post_content', new_callable=AsyncMock) as mock_single:
+            mock_single.return_value = "Fresh"
+            
+            result = await analyzer.analyze_posts(posts)
+        
+        assert result == {"post_0": "Cached", "post_1": "Fresh"}
+        mock_single.assert_called_once_with(posts[1], True)
+    
+    @pytest.mark.asyncio
+    async def test_analyze_posts_bounds_concurrency(self, analyzer):
+        analyzer.batch_size = 1
+        analyzer.concurrency = 2
+        in_flight, peak = 0, 0
+        
+        async def slow_analysis(post, use_cache=True):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return post.content
+        
+        with patch.object(analyzer, 'analyze_post_content', side_effect=slow_analysis):
+            result = await analyzer.analyze_posts(self._posts(6))
+        
+        assert len(result) == 6
+        assert peak == 2
 
 
 class TestMetricsCalculator:
     
-    @pytest.fixture
-    def mock_db(self):
-        return MagicMock(spec=Session)
+    @pytest_asyncio.fixture
+    async def db_session(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            yield session
+        await engine.dispose()
     
     @pytest.fixture
     def sample_posts(self):
@@ -127,10 +207,12 @@ class TestMetricsCalculator:
             )
         ]
     
-    def test_calculate_summary_stats_with_posts(self, mock_db, sample_posts):
-        mock_db.query().all.return_value = sample_posts
+    @pytest.mark.asyncio
+    async def test_calculate_summary_stats_with_posts(self, db_session, sample_posts):
+        db_session.add_all(sample_posts)
+        await db_session.commit()
         
-        result = MetricsCalculator.calculate_summary_stats(mock_db)
+        result = await MetricsCalculator.calculate_summary_stats(db_session)
         
         assert result["total_posts"] == 3
         assert result["avg_engagement"] == 4.0  # (8.0 + 3.0 + 1.0) / 3
@@ -141,17 +223,17 @@ class TestMetricsCalculator:
         assert "High performing" in result["best_post"]["content"]
         assert "Low performing" in result["worst_post"]["content"]
     
-    def test_calculate_summary_stats_no_posts(self, mock_db):
-        mock_db.query().all.return_value = []
-        
-        result = MetricsCalculator.calculate_summary_stats(mock_db)
+    @pytest.mark.asyncio
+    async def test_calculate_summary_stats_no_posts(self, db_session):
+        result = await MetricsCalculator.calculate_summary_stats(db_session)
         
         assert result["total_posts"] == 0
         assert result["avg_engagement"] == 0
         assert result["best_post"] is None
         assert result["worst_post"] is None
     
-    def test_calculate_summary_stats_single_post(self, mock_db):
+    @pytest.mark.asyncio
+    async def test_calculate_summary_stats_single_post(self, db_session):
         single_post = [Post(
             thread_id="post_1",
             content="Only post",
@@ -159,11 +241,21 @@ class TestMetricsCalculator:
             likes=50,
             engagement_rate=5.0
         )]
-        mock_db.query().all.return_value = single_post
+        db_session.add_all(single_post)
+        await db_session.commit()
         
-        result = MetricsCalculator.calculate_summary_stats(mock_db)
+        result = await MetricsCalculator.calculate_summary_stats(db_session)
         
         assert result["total_posts"] == 1
         assert result["avg_engagement"] == 5.0
         assert result["best_post"]["engagement_rate"] == 5.0
-        assert result["worst_post"]["engagement_rate"] == 5.0
\ No newline at end of file
+        assert result["worst_post"]["engagement_rate"] == 5.0
+    
+    @pytest.mark.asyncio
+    async def test_calculate_summary_stats_truncates_content(self, db_session):
+        db_session.add(Post(thread_id="long", content="x" * 500, views=10, likes=1, engagement_rate=10.0))
+        await db_session.commit()
+        
+        result = await MetricsCalculator.calculate_summary_stats(db_session)
+        
+        assert result["best_post"]["content"] == "x" * 100 + "..."
\ No newline at end of file
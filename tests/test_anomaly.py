@@ -0,0 +1,64 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import func, select
+
+from anomaly import age_bucket, update_velocity, get_alerts
+from models import PostVelocity, VelocityBaseline
+
+
+class TestVelocityAnomalies:
+
+    @pytest.fixture(autouse=True)
+    def min_baseline_samples(self):
+        with patch('config.settings.ANOMALY_MIN_BASELINE_SAMPLES', 10):
+            yield
+
+    def _row(self, thread_id, views, created_at):
+        return {"thread_id": thread_id, "content": "Post", "media_type": "TEXT", "created_at": created_at,
+                "views": views, "likes": 0, "replies": 0, "reposts": 0, "shares": 0,
+                "engagement_rate": 0.0, "updated_at": created_at}
+
+    def test_age_buckets(self):
+        assert age_bucket(0.5) == 0
+        assert age_bucket(2) == 1
+        assert age_bucket(10_000) == 10
+
+    def test_flags_post_growing_far_faster_than_its_peers(self, sync_db, upsert_with):
+        published = datetime(2024, 1, 1, 8)
+        now = published + timedelta(hours=2)
+        peers = [f"peer_{i}" for i in range(20)]
+
+        # Two hours in: every post has ~100 views
+        assert upsert_with(update_velocity, [self._row(p, 100 + i, published) for i, p in enumerate(peers)] +
+                          [self._row("rocket", 100, published)], now) == 0
+
+        # An hour later peers gained ~50 views, the rocket gained 5,000
+        later = now + timedelta(hours=1)
+        rows = [self._row(p, 150 + i, published) for i, p in enumerate(peers)] + [self._row("rocket", 5100, published)]
+        flagged = upsert_with(update_velocity, rows, later)
+
+        alerts = get_alerts(sync_db, since=later - timedelta(hours=1))
+        assert flagged == 1
+        assert [alert["thread_id"] for alert in alerts] == ["rocket"]
+        assert alerts[0]["views_per_hour"] > 1000
+        assert get_alerts(sync_db, since=later + timedelta(minutes=1)) == []
+
+    def test_state_is_one_row_per_post(self, sync_db, upsert_with):
+        published = datetime(2024, 1, 1)
+        for hour in range(1, 6):
+            upsert_with(update_velocity, [self._row("a", 10 * hour, published)], published + timedelta(hours=hour))
+
+        assert sync_db.scalar(select(func.count()).select_from(PostVelocity)) == 1
+        state = sync_db.scalars(select(PostVelocity)).one()
+        assert state.samples == 5
+        assert state.views == 50
+        assert state.ewma_velocity == pytest.approx(10)
+        assert sync_db.scalar(select(func.sum(VelocityBaseline.samples))) == 5
+
+    def test_old_posts_first_seen_do_not_alert(self, upsert_with):
+        now = datetime(2024, 6, 1)
+        rows = [self._row(f"old_{i}", 1000, now - timedelta(days=60)) for i in range(20)]
+        rows.append(self._row("old_hit", 10_000_000, now - timedelta(days=60)))
+
+        assert upsert_with(update_velocity, rows, now) == 0
\ No newline at end of file
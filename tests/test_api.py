@@ -1,9 +1,15 @@
+import asyncio
+import json
 import pytest
 from unittest.mock import patch, AsyncMock
-from fastapi.testclient import TestClient
-from datetime import datetime
+from datetime import datetime, timedelta
+import httpx
 
-from models import Post
+from models import Post, SyncJob, SyncState, MetricSnapshot
+from config import settings
+from app import app, sync_jobs
+from database import get_async_session_factory
+from sync_jobs import SyncJobManager
 
 
 class TestAPIEndpoints:
@@ -86,17 +92,34 @@ class TestAPIEndpoints:
         assert data["total_views"] == 3000
         assert data["total_likes"] == 150
     
-    @patch('data_collector.ThreadsAPIClient.get_user_media')
+    def test_get_analytics_distribution(self, client, test_db):
+        """Test engagement distribution endpoint"""
+        test_db.add_all([
+            Post(thread_id="p1", media_type="TEXT", created_at=datetime(2024, 1, 1, 9), views=100, likes=5, engagement_rate=5.0),
+            Post(thread_id="p2", media_type="IMAGE", created_at=datetime(2024, 1, 1, 9), views=100, likes=1, engagement_rate=1.0)
+        ])
+        test_db.commit()
+        
+        response = client.get("/api/analytics/distribution")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_posts"] == 2
+        assert data["engagement"]["mean"] == 3.0
+        assert set(data["by_media_type"]) == {"TEXT", "IMAGE"}
+        assert data["by_hour"][9]["posts"] == 2
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
     @patch('data_collector.ThreadsAPIClient.get_media_insights')
     def test_sync_data_success(self, mock_insights, mock_media, client, test_db):
         """Test successful data sync from Threads API"""
         # Mock API responses
-        mock_media.return_value = [{
+        mock_media.return_value = {"data": [{
             "id": "new_post_123",
             "text": "New post from API",
             "media_type": "TEXT",
             "timestamp": "2024-01-15T10:30:00Z"
-        }]
+        }]}
         
         mock_insights.return_value = {
             "views": 500,
@@ -108,26 +131,437 @@ class TestAPIEndpoints:
         
         response = client.post("/api/sync")
         
-        assert response.status_code == 200
-        data = response.json()
-        assert data["status"] == "success"
-        assert "Synced 1 posts" in data["message"]
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        
+        # The background job has run by the time TestClient returns
+        job = client.get(f"/api/sync/{job_id}").json()
+        assert job["status"] == "succeeded"
+        assert job["posts_upserted"] == 1
+        assert job["pages_fetched"] == 1
         
         # Verify post was created in database
         posts = client.get("/api/posts").json()
         assert len(posts) == 1
         assert posts[0]["thread_id"] == "new_post_123"
         assert posts[0]["views"] == 500
+        
+        # Themes are scored once, at sync time
+        test_db.expire_all()
+        assert test_db.query(Post.primary_theme).scalar() == "general"
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_data_normalizes_graph_media_types(self, mock_insights, mock_media, client, test_db):
+        """Test Graph API media type names are stored as the app's media types"""
+        mock_media.return_value = {"data": [
+            {"id": "text", "text": "Words", "media_type": "TEXT_POST", "timestamp": "2024-01-15T10:30:00Z"},
+            {"id": "album", "text": "Photos", "media_type": "CAROUSEL_ALBUM", "timestamp": "2024-01-15T11:30:00Z"}
+        ]}
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        posts = {p["thread_id"]: p for p in client.get("/api/posts").json()}
+        assert (posts["text"]["media_type"], posts["album"]["media_type"]) == ("TEXT", "CAROUSEL")
+        days = client.get("/api/analytics/daily", params={"media_type": "TEXT"}).json()["days"]
+        assert [day["total_posts"] for day in days] == [1]
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_data_follows_paging_cursors(self, mock_insights, mock_media, client, test_db):
+        """Test sync streams every page of media history"""
+        mock_media.side_effect = [
+            {
+                "data": [{"id": "post_a", "text": "Newest", "media_type": "TEXT", "timestamp": "2024-01-16T10:30:00Z"}],
+                "paging": {"cursors": {"after": "cursor_1"}, "next": "https://graph.threads.net/next"}
+            },
+            {
+                "data": [{"id": "post_b", "text": "Oldest", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"}],
+                "paging": {"cursors": {"after": "cursor_2"}}
+            }
+        ]
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        job_id = client.post("/api/sync").json()["job_id"]
+        
+        assert client.get(f"/api/sync/{job_id}").json()["pages_fetched"] == 2
+        assert mock_media.call_args_list[1].kwargs["after"] == "cursor_1"
+        
+        posts = client.get("/api/posts").json()
+        assert {p["thread_id"] for p in posts} == {"post_a", "post_b"}
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_data_incremental_after_watermark(self, mock_insights, mock_media, client, test_db):
+        """Test a repeat sync with no new posts only asks for media newer than the watermark"""
+        mock_media.return_value = {"data": [{
+            "id": "post_1",
+            "text": "Already synced",
+            "media_type": "TEXT",
+            "timestamp": "2024-01-15T10:30:00Z"
+        }]}
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        mock_media.reset_mock()
+        mock_insights.reset_mock()
+        mock_media.return_value = {"data": []}
+        
+        response = client.post("/api/sync")
+        
+        assert response.status_code == 202
+        assert mock_media.call_count == 1
+        assert mock_media.call_args.kwargs["since"] == datetime(2024, 1, 15, 10, 30)
+        assert mock_insights.call_count == 0
+    
+    @patch('app.sync_service.max_pages', 1)
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_data_backfills_pages_cut_by_max_pages(self, mock_insights, mock_media, client, test_db):
+        """Test a sync truncated by max_pages holds the watermark and the next one resumes from its cursor"""
+        mock_media.side_effect = [
+            {
+                "data": [{"id": "post_a", "text": "Newest", "media_type": "TEXT", "timestamp": "2024-01-16T10:30:00Z"}],
+                "paging": {"cursors": {"after": "cursor_1"}, "next": "https://graph.threads.net/next"}
+            },
+            {
+                "data": [{"id": "post_b", "text": "Oldest", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"}],
+                "paging": {"cursors": {"after": "cursor_2"}}
+            },
+            {"data": []}
+        ]
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        test_db.expire_all()
+        state = test_db.query(SyncState).one()
+        assert state.newest_media_at is None
+        assert state.backfill_after == "cursor_1"
+        
+        client.post("/api/sync")
+        
+        assert mock_media.call_args_list[1].kwargs["after"] == "cursor_1"
+        assert {p["thread_id"] for p in client.get("/api/posts").json()} == {"post_a", "post_b"}
+        test_db.expire_all()
+        state = test_db.query(SyncState).one()
+        assert state.newest_media_at == datetime(2024, 1, 16, 10, 30)
+        assert state.backfill_after is None
+        
+        client.post("/api/sync")
+        
+        assert mock_media.call_args_list[2].kwargs == {
+            "limit": settings.SYNC_PAGE_SIZE, "after": None, "since": datetime(2024, 1, 16, 10, 30)
+        }
     
-    @patch('data_collector.ThreadsAPIClient.get_user_media')
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_data_refreshes_due_posts(self, mock_insights, mock_media, client, test_db):
+        """Test sync refreshes metrics for known posts whose refresh interval elapsed"""
+        now = datetime.utcnow()
+        test_db.add_all([
+            Post(thread_id="due_post", content="Two days old", created_at=now - timedelta(days=2),
+                 updated_at=now - timedelta(hours=10), views=10),
+            Post(thread_id="fresh_post", content="Just refreshed", created_at=now - timedelta(days=2),
+                 updated_at=now - timedelta(hours=1), views=10)
+        ])
+        test_db.commit()
+        
+        mock_media.return_value = {"data": []}
+        mock_insights.return_value = {"views": 900, "likes": 45}
+        
+        job_id = client.post("/api/sync").json()["job_id"]
+        
+        assert client.get(f"/api/sync/{job_id}").json()["posts_refreshed"] == 1
+        mock_insights.assert_called_once_with("due_post")
+        
+        posts = {p["thread_id"]: p for p in client.get("/api/posts").json()}
+        assert posts["due_post"]["views"] == 900
+        assert posts["fresh_post"]["views"] == 10
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_data_skips_deleted_posts(self, mock_insights, mock_media, client, test_db):
+        """Test a post deleted on Threads doesn't fail the sync and leaves the refresh queue"""
+        now = datetime.utcnow()
+        test_db.add(Post(thread_id="deleted_post", content="Gone", created_at=now - timedelta(days=2),
+                         updated_at=now - timedelta(hours=10), views=10))
+        test_db.commit()
+        
+        mock_media.return_value = {"data": [{
+            "id": "new_post", "text": "New", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"
+        }]}
+        
+        async def fake_insights(media_id):
+            if media_id == "deleted_post":
+                request = httpx.Request("GET", "https://graph.threads.net/deleted_post/insights")
+                raise httpx.HTTPStatusError("Not found", request=request, response=httpx.Response(400, request=request))
+            return {"views": 500}
+        mock_insights.side_effect = fake_insights
+        
+        job_id = client.post("/api/sync").json()["job_id"]
+        
+        assert client.get(f"/api/sync/{job_id}").json()["status"] == "succeeded"
+        posts = {p["thread_id"]: p for p in client.get("/api/posts").json()}
+        assert posts["new_post"]["views"] == 500
+        assert posts["deleted_post"]["views"] == 10
+        
+        test_db.expire_all()
+        assert test_db.query(Post.updated_at).filter(Post.thread_id == "deleted_post").scalar() > now - timedelta(minutes=1)
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_data_keeps_watermark_when_refresh_fails(self, mock_insights, mock_media, client, test_db):
+        """Test a failing refresh pass doesn't undo the ingestion watermark"""
+        now = datetime.utcnow()
+        test_db.add(Post(thread_id="due_post", content="Old", created_at=now - timedelta(days=2),
+                         updated_at=now - timedelta(hours=10), views=10))
+        test_db.commit()
+        
+        mock_media.return_value = {"data": [{
+            "id": "new_post", "text": "New", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"
+        }]}
+        
+        async def fake_insights(media_id):
+            if media_id == "due_post":
+                raise httpx.ConnectError("Connection refused")
+            return {"views": 500}
+        mock_insights.side_effect = fake_insights
+        
+        job_id = client.post("/api/sync").json()["job_id"]
+        
+        assert client.get(f"/api/sync/{job_id}").json()["status"] == "failed"
+        test_db.expire_all()
+        assert test_db.query(SyncState.newest_media_at).scalar() == datetime(2024, 1, 15, 10, 30)
+    
+    def test_post_timeseries(self, client, test_db):
+        """Test metric history endpoint returns snapshots in time order"""
+        post = Post(thread_id="ts_post", content="Tracked", views=30)
+        test_db.add(post)
+        test_db.commit()
+        test_db.add_all([
+            MetricSnapshot(post_id=post.id, ts=datetime(2024, 1, 2), views=30, likes=3, replies=0, reposts=0, shares=0),
+            MetricSnapshot(post_id=post.id, ts=datetime(2024, 1, 1), views=10, likes=1, replies=0, reposts=0, shares=0)
+        ])
+        test_db.commit()
+        
+        response = client.get("/api/posts/ts_post/timeseries")
+        
+        assert response.status_code == 200
+        assert [s["views"] for s in response.json()["snapshots"]] == [10, 30]
+        assert client.get("/api/posts/missing/timeseries").status_code == 404
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_daily_analytics_from_rollups(self, mock_insights, mock_media, client, test_db):
+        """Test sync maintains daily rollups that the daily endpoint reads"""
+        mock_media.return_value = {"data": [
+            {"id": "post_a", "text": "Day one", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"},
+            {"id": "post_b", "text": "Day one too", "media_type": "TEXT", "timestamp": "2024-01-15T20:00:00Z"},
+            {"id": "post_c", "text": "Day two", "media_type": "IMAGE", "timestamp": "2024-01-16T08:00:00Z"}
+        ]}
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        response = client.get("/api/analytics/daily", params={"from": "2024-01-15", "to": "2024-01-15"})
+        
+        assert response.status_code == 200
+        days = response.json()["days"]
+        assert [day["date"] for day in days] == ["2024-01-15"]
+        assert days[0]["total_posts"] == 2
+        assert days[0]["total_views"] == 200
+        assert len(client.get("/api/analytics/daily").json()["days"]) == 2
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_quantiles_from_sketches(self, mock_insights, mock_media, client, test_db):
+        """Test sync maintains the sketches the quantiles endpoint reads"""
+        mock_media.return_value = {"data": [
+            {"id": f"post_{i}", "text": "Post", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"}
+            for i in range(3)
+        ]}
+        mock_insights.side_effect = [{"views": 100}, {"views": 200}, {"views": 300}]
+        
+        client.post("/api/sync")
+        
+        response = client.get("/api/analytics/quantiles", params={"metric": "views", "q": "0.5"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 3
+        assert data["quantiles"]["p50"] == pytest.approx(200, rel=data["relative_accuracy"])
+        assert client.get("/api/analytics/quantiles", params={"metric": "content"}).status_code == 400
+        assert client.get("/api/analytics/quantiles", params={"q": "2"}).status_code == 400
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_heatmap_from_sync(self, mock_insights, mock_media, client, test_db):
+        """Test sync fills the heatmap cube and the endpoint shifts it into the requested timezone"""
+        mock_media.return_value = {"data": [
+            {"id": "post_1", "text": "Monday", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"}
+        ]}
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        response = client.get("/api/analytics/heatmap", params={"tz": "Asia/Tokyo"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_posts"] == 1
+        assert data["best_slots"][0]["weekday"] == 0
+        assert data["best_slots"][0]["hour"] == 19
+        assert client.get("/api/analytics/heatmap", params={"tz": "Mars/Olympus"}).status_code == 400
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_alerts_after_sync(self, mock_insights, mock_media, client, test_db):
+        """Test sync records view velocity and a quiet account has no alerts"""
+        mock_media.return_value = {"data": [
+            {"id": "post_1", "text": "Hello", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"}
+        ]}
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        response = client.get("/api/alerts", params={"hours": 1})
+        
+        assert response.status_code == 200
+        assert response.json()["alerts"] == []
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_similar_posts_from_sync(self, mock_insights, mock_media, client, test_db):
+        """Test sync indexes content and the endpoint returns near-duplicates with their metrics"""
+        text = "Five lessons I learned from shipping a side project every weekend"
+        mock_media.return_value = {"data": [
+            {"id": "post_1", "text": text, "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"},
+            {"id": "post_2", "text": text + "!", "media_type": "TEXT", "timestamp": "2024-01-16T10:30:00Z"}
+        ]}
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        response = client.get("/api/posts/post_1/similar", params={"k": 5})
+        
+        assert response.status_code == 200
+        similar = response.json()["similar"]
+        assert [post["thread_id"] for post in similar] == ["post_2"]
+        assert similar[0]["metrics"]["views"] == 100
+        assert client.get("/api/posts/missing/similar").status_code == 404
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_term_performance_from_sync(self, mock_insights, mock_media, client, test_db):
+        """Test sync indexes terms and the endpoint ranks them by engagement"""
+        mock_media.return_value = {"data": [
+            {"id": "post_1", "text": "Coffee #morning", "media_type": "TEXT", "timestamp": "2024-01-15T10:30:00Z"},
+            {"id": "post_2", "text": "Coffee again", "media_type": "TEXT", "timestamp": "2024-01-16T10:30:00Z"}
+        ]}
+        mock_insights.return_value = {"views": 100, "likes": 5}
+        
+        client.post("/api/sync")
+        
+        response = client.get("/api/analytics/terms", params={"min_support": 2})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["posts"] == 2
+        assert [term["term"] for term in data["top"]] == ["coffee"]
+        assert data["top"][0]["lift"] == 1.0
+        assert client.get("/api/analytics/terms", params={"kind": "verb"}).status_code == 400
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
     def test_sync_data_api_error(self, mock_media, client, test_db):
         """Test sync data with API error"""
         mock_media.side_effect = Exception("API connection failed")
         
         response = client.post("/api/sync")
         
-        assert response.status_code == 500
-        assert "Sync failed" in response.json()["detail"]
+        assert response.status_code == 202
+        job = client.get(f"/api/sync/{response.json()['job_id']}").json()
+        assert job["status"] == "failed"
+        assert "API connection failed" in job["error"]
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    def test_sync_data_joins_running_job(self, mock_media, client, test_db):
+        """Test a duplicate sync request joins the job already running for the account"""
+        test_db.add(SyncJob(id="running_job", account_id=settings.THREADS_USER_ID, status="running"))
+        test_db.commit()
+        
+        response = client.post("/api/sync")
+        
+        assert response.status_code == 202
+        assert response.json()["job_id"] == "running_job"
+        assert response.json()["joined_existing"] is True
+        mock_media.assert_not_called()
+    
+    def test_concurrent_sync_submits_create_one_job(self, client, test_db):
+        """Test simultaneous submits, in this process or another (own manager), share one job"""
+        session_factory = app.dependency_overrides[get_async_session_factory]()
+        other_process = SyncJobManager(sync_jobs.sync_service)
+        
+        async def submit(manager):
+            async with session_factory() as db:
+                job, created = await manager.submit(db, "account_1")
+                return job.id, created
+        
+        async def submit_concurrently():
+            return await asyncio.gather(submit(sync_jobs), submit(sync_jobs), submit(other_process))
+        
+        results = asyncio.run(submit_concurrently())
+        
+        assert len({job_id for job_id, _ in results}) == 1
+        assert [created for _, created in results].count(True) == 1
+        assert test_db.query(SyncJob).count() == 1
+    
+    def test_recovery_fails_only_jobs_without_a_heartbeat(self, client, test_db):
+        """Test startup recovery leaves jobs other live workers are running alone"""
+        now = datetime.utcnow()
+        test_db.add_all([
+            SyncJob(id="live_job", account_id="account_1", status="running",
+                    created_at=now - timedelta(hours=2), heartbeat_at=now - timedelta(minutes=1)),
+            SyncJob(id="dead_job", account_id="account_2", status="running",
+                    created_at=now - timedelta(hours=2), heartbeat_at=now - timedelta(hours=1)),
+            SyncJob(id="never_started", account_id="account_3", status="queued", created_at=now - timedelta(hours=1))
+        ])
+        test_db.commit()
+        session_factory = app.dependency_overrides[get_async_session_factory]()
+        
+        async def recover():
+            async with session_factory() as db:
+                return await sync_jobs.recover_interrupted(db)
+        
+        assert asyncio.run(recover()) == 2
+        test_db.expire_all()
+        assert {job.id: job.status for job in test_db.query(SyncJob)} == {
+            "live_job": "running", "dead_job": "failed", "never_started": "failed"
+        }
+    
+    @patch('data_collector.ThreadsAPIClient.get_user_media_page')
+    @patch('data_collector.ThreadsAPIClient.get_media_insights')
+    def test_sync_replaces_job_without_a_heartbeat(self, mock_insights, mock_media, client, test_db):
+        """Test a submit fails an active job whose worker died instead of joining it"""
+        test_db.add(SyncJob(id="dead_job", account_id=settings.THREADS_USER_ID, status="running",
+                            created_at=datetime.utcnow() - timedelta(hours=1)))
+        test_db.commit()
+        mock_media.return_value = {"data": []}
+        
+        response = client.post("/api/sync")
+        
+        assert response.json()["job_id"] != "dead_job"
+        assert response.json()["joined_existing"] is False
+        assert client.get("/api/sync/dead_job").json()["status"] == "failed"
+        assert client.get(f"/api/sync/{response.json()['job_id']}").json()["heartbeat_at"] is not None
+    
+    def test_get_sync_job_not_found(self, client, test_db):
+        """Test status lookup for an unknown job"""
+        response = client.get("/api/sync/unknown")
+        
+        assert response.status_code == 404
     
     @patch('analytics.ContentAnalyzer.analyze_post_content')
     def test_analyze_posts_success(self, mock_analyze, client, test_db):
@@ -200,6 +634,149 @@ class TestAPIEndpoints:
         assert data["analyzed_count"] == 10
         assert mock_analyze.call_count == 10
 
+    
+    @patch('content_generator.ShareableContentGenerator.generate_ig_story_image')
+    @patch('analytics.ContentAnalyzer.generate_creator_portrait', new_callable=AsyncMock)
+    def test_portrait_served_from_storage_until_posts_change(self, mock_portrait, mock_image, client, test_db):
+        """Test a stored portrait is reused for the same post set and regenerated on change or force"""
+        test_db.add(Post(thread_id="p1", content="Hello", views=100, likes=5, engagement_rate=5.0))
+        test_db.commit()
+        mock_portrait.return_value = {"archetype": "The Knowledge Sharer", "total_posts": 1}
+        mock_image.return_value = "data:image/png;base64,abc"
+        
+        first = client.post("/api/generate-portrait").json()
+        second = client.post("/api/generate-portrait").json()
+        
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["portrait_id"] == first["portrait_id"]
+        assert second["portrait"]["archetype"] == "The Knowledge Sharer"
+        assert second["shareable_content"]["ig_story_image"] == "data:image/png;base64,abc"
+        assert mock_portrait.call_count == 1
+        sample = mock_portrait.call_args[0][0]
+        assert sample["total_posts"] == 1
+        assert "Hello" in sample["posts"][0]["line"]
+        
+        forced = client.post("/api/generate-portrait", params={"force": "true"}).json()
+        assert forced["cached"] is False
+        assert mock_portrait.call_count == 2
+        
+        test_db.add(Post(thread_id="p2", content="New post", views=10, likes=1, engagement_rate=10.0))
+        test_db.commit()
+        assert client.post("/api/generate-portrait").json()["cached"] is False
+        assert mock_portrait.call_count == 3
+        
+        share = client.get(f"/api/share-content/{first['portrait_id']}").json()
+        assert share["ig_story_url"] == "data:image/png;base64,abc"
+    
+    @patch('analytics.ContentAnalyzer.generate_creator_portrait', new_callable=AsyncMock)
+    def test_fallback_portrait_not_stored(self, mock_portrait, client, test_db):
+        """Test the default portrait returned when the LLM fails is regenerated next time"""
+        test_db.add(Post(thread_id="p1", content="Hello", views=100, likes=5, engagement_rate=5.0))
+        test_db.commit()
+        mock_portrait.return_value = {"archetype": "The Emerging Creator", "total_posts": 0}
+        
+        client.post("/api/generate-portrait")
+        response = client.post("/api/generate-portrait")
+        
+        assert response.status_code == 200
+        assert "portrait_id" not in response.json()
+        assert mock_portrait.call_count == 2
+    
+    def test_portrait_without_posts(self, client, test_db):
+        """Test portrait generation asks for a sync first"""
+        response = client.post("/api/generate-portrait")
+        
+        assert response.status_code == 400
+    
+    def _events(self, response):
+        """(event, data) pairs of a server-sent event stream"""
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.split("\n"))
+            events.append((lines["event"], json.loads(lines["data"])))
+        return events
+    
+    @patch('content_generator.ShareableContentGenerator.generate_ig_story_image')
+    @patch('openai.ChatCompletion.acreate', new_callable=AsyncMock)
+    def test_portrait_stream(self, mock_openai, mock_image, client, test_db):
+        """Test portrait fields stream as they complete, then the stored portrait with its image"""
+        test_db.add(Post(thread_id="p1", content="Hello", views=100, likes=5, engagement_rate=5.0))
+        test_db.commit()
+        mock_image.return_value = "data:image/png;base64,abc"
+        
+        async def chunks():
+            for piece in ('{"archetype": "The Sage", "content_', 'dna": {"personal": 100}}'):
+                yield {"choices": [{"delta": {"content": piece}}]}
+        mock_openai.side_effect = lambda **kwargs: chunks()
+        
+        response = client.get("/api/generate-portrait/stream")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = self._events(response)
+        assert [event for event, _ in events] == ["status", "field", "field", "portrait"]
+        assert events[0][1] == {"total_posts": 1, "sampled_posts": 1}
+        assert events[1][1] == {"name": "archetype", "value": "The Sage"}
+        assert events[2][1] == {"name": "content_dna", "value": {"personal": 100}}
+        final = events[3][1]
+        assert final["cached"] is False
+        assert final["portrait"]["archetype"] == "The Sage"
+        assert final["shareable_content"]["ig_story_image"] == "data:image/png;base64,abc"
+        
+        # Stored like a POSTed portrait, and replayed as the same events
+        assert client.post("/api/generate-portrait").json()["portrait_id"] == final["portrait_id"]
+        replayed = self._events(client.get("/api/generate-portrait/stream"))
+        assert ("field", {"name": "archetype", "value": "The Sage"}) in replayed
+        assert replayed[-1][1]["cached"] is True
+        assert mock_openai.call_count == 1
+    
+    def test_portrait_stream_without_posts(self, client, test_db):
+        """Test the portrait stream asks for a sync first"""
+        response = client.get("/api/generate-portrait/stream")
+        
+        assert response.status_code == 400
+    
+    @patch('openai.ChatCompletion.acreate', new_callable=AsyncMock)
+    def test_post_analysis_stream(self, mock_openai, client, test_db):
+        """Test post analysis streams tokens and saves the analysis"""
+        test_db.add(Post(thread_id="p1", content="Hello", views=100, likes=5, engagement_rate=5.0))
+        test_db.commit()
+        
+        async def chunks():
+            for piece in ("Personal", " and warm."):
+                yield {"choices": [{"delta": {"content": piece}}]}
+        mock_openai.side_effect = lambda **kwargs: chunks()
+        
+        response = client.get("/api/posts/p1/analysis/stream")
+        
+        assert self._events(response) == [
+            ("token", {"text": "Personal"}),
+            ("token", {"text": " and warm."}),
+            ("done", {"thread_id": "p1", "analysis": "Personal and warm."})
+        ]
+        test_db.expire_all()
+        assert test_db.query(Post).filter_by(thread_id="p1").one().analysis_result == "Personal and warm."
+        
+        assert client.get("/api/posts/missing/analysis/stream").status_code == 404
+    
+    @patch('openai.ChatCompletion.acreate', new_callable=AsyncMock)
+    def test_post_analysis_stream_error_keeps_previous_analysis(self, mock_openai, client, test_db):
+        """Test a failed re-analysis ends with an error event, not the stale analysis"""
+        test_db.add(Post(thread_id="p1", content="Hello", views=100, likes=5, engagement_rate=5.0,
+                         analysis_result="Old analysis", analysis_date=datetime(2020, 1, 1), analysis_cached=True))
+        test_db.commit()
+        mock_openai.side_effect = Exception("API Error")
+        
+        response = client.get("/api/posts/p1/analysis/stream")
+        
+        assert self._events(response) == [
+            ("token", {"text": "Analysis unavailable: API Error"}),
+            ("error", {"detail": "Analysis unavailable: API Error"})
+        ]
+        test_db.expire_all()
+        assert test_db.query(Post).filter_by(thread_id="p1").one().analysis_result == "Old analysis"
+
 
 class TestAPIErrorHandling:
     
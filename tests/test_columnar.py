@@ -0,0 +1,91 @@
+import pytest
+import numpy as np
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from columnar import PostFrame, engagement_rates, zscores
+from data_collector import ThreadsAPIClient
+from models import Base, Post
+
+
+class TestPostFrame:
+
+    @pytest.fixture
+    def posts(self):
+        return [
+            Post(thread_id="a", media_type="TEXT", created_at=datetime(2024, 1, 1, 9),  # Monday
+                 views=1000, likes=50, replies=0, reposts=0, shares=0, engagement_rate=5.0),
+            Post(thread_id="b", media_type="IMAGE", created_at=datetime(2024, 1, 2, 21),  # Tuesday
+                 views=1000, likes=10, replies=0, reposts=0, shares=0, engagement_rate=1.0),
+            Post(thread_id="c", media_type="IMAGE", created_at=datetime(2024, 1, 2, 21, 30),
+                 views=500, likes=15, replies=0, reposts=0, shares=0, engagement_rate=3.0),
+            Post(thread_id="d", media_type=None, created_at=None,
+                 views=0, likes=0, replies=0, reposts=0, shares=0, engagement_rate=0.0)
+        ]
+
+    def test_engagement_rates_match_client_formula(self):
+        client = ThreadsAPIClient()
+        samples = [(1000, 50, 10, 5, 3), (0, 5, 0, 0, 0), (333, 7, 1, 0, 0)]
+
+        rates = engagement_rates(*np.array(samples).T)
+
+        expected = [
+            client.calculate_engagement_rate(dict(zip(("views", "likes", "replies", "reposts", "shares"), sample)))
+            for sample in samples
+        ]
+        assert rates.tolist() == expected
+
+    def test_distributions_by_media_type_hour_and_weekday(self, posts):
+        frame = PostFrame.from_posts(posts)
+
+        by_media_type = frame.by_media_type()
+        assert by_media_type["IMAGE"] == {"posts": 2, "avg_engagement": 2.0, "total_views": 1500}
+        assert by_media_type["TEXT"]["posts"] == 2  # missing media_type counts as TEXT
+
+        by_hour = frame.by_hour()
+        assert by_hour[21]["posts"] == 2
+        assert by_hour[9]["avg_engagement"] == 5.0
+        assert sum(hour["posts"] for hour in by_hour) == 3  # undated post excluded
+
+        by_weekday = {day["weekday"]: day["posts"] for day in frame.by_weekday()}
+        assert by_weekday["Monday"] == 1
+        assert by_weekday["Tuesday"] == 2
+
+    def test_describe(self, posts):
+        summary = PostFrame.from_posts(posts).describe()
+
+        assert summary["total_posts"] == 4
+        assert summary["totals"]["views"] == 2500
+        assert summary["engagement"]["mean"] == 2.25
+        assert summary["engagement"]["p50"] == 2.0
+        assert PostFrame.from_posts([]).describe() == {"total_posts": 0}
+
+    def test_outliers_by_zscore(self):
+        engagement = [1.0] * 20 + [50.0]
+        frame = PostFrame.from_columns({
+            "thread_id": [f"post_{i}" for i in range(21)],
+            "media_type": ["TEXT"] * 21,
+            "created_at": [None] * 21,
+            "engagement_rate": engagement,
+            **{metric: [100] * 21 for metric in ("views", "likes", "replies", "reposts", "shares")}
+        })
+
+        outliers = frame.outliers(threshold=3)
+
+        assert [outlier["thread_id"] for outlier in outliers] == ["post_20"]
+        assert zscores(np.ones(3)).tolist() == [0.0, 0.0, 0.0]
+
+    def test_load_from_database(self, posts):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        db.add_all(posts)
+        db.commit()
+
+        frame = PostFrame.load(db)
+        db.close()
+
+        assert len(frame) == 4
+        assert sorted(frame.thread_ids.tolist()) == ["a", "b", "c", "d"]
+        assert frame.views.sum() == 2500
\ No newline at end of file
@@ -1,8 +1,10 @@
+import asyncio
 import pytest
-from unittest.mock import AsyncMock, patch
+from datetime import datetime, timedelta
+from unittest.mock import patch
 import httpx
 
-from data_collector import ThreadsAPIClient
+from data_collector import ThreadsAPIClient, normalize_media_type
 
 
 class TestThreadsAPIClient:
@@ -62,6 +64,136 @@ class TestThreadsAPIClient:
             assert result["reposts"] == 5
             assert result["shares"] == 3
     
+    @pytest.mark.asyncio
+    async def test_get_insights_for_media_respects_concurrency_cap(self, client):
+        in_flight = 0
+        peak = 0
+        
+        async def fake_insights(media_id):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"views": int(media_id)}
+        
+        with patch.object(client, 'get_media_insights', side_effect=fake_insights):
+            result = await client.get_insights_for_media([str(i) for i in range(10)], concurrency=3)
+        
+        assert result == {str(i): {"views": i} for i in range(10)}
+        assert peak == 3
+    
+    @pytest.mark.asyncio
+    async def test_get_insights_for_media_skips_rejected_media(self, client):
+        async def fake_insights(media_id):
+            if media_id == "deleted":
+                request = httpx.Request("GET", "https://graph.threads.net/deleted/insights")
+                raise httpx.HTTPStatusError("Not found", request=request, response=httpx.Response(404, request=request))
+            return {"views": 10}
+        
+        with patch.object(client, 'get_media_insights', side_effect=fake_insights):
+            result = await client.get_insights_for_media(["kept", "deleted"])
+        
+        assert result == {"kept": {"views": 10}}
+    
+    @pytest.mark.asyncio
+    async def test_get_insights_for_media_raises_server_errors(self, client):
+        request = httpx.Request("GET", "https://graph.threads.net/1/insights")
+        error = httpx.HTTPStatusError("Unavailable", request=request, response=httpx.Response(503, request=request))
+        
+        with patch.object(client, 'get_media_insights', side_effect=error):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.get_insights_for_media(["1"])
+    
+    @pytest.mark.asyncio
+    async def test_pooled_client_reused_until_closed(self, client):
+        pooled = client._get_client()
+        
+        assert client._get_client() is pooled
+        
+        await client.aclose()
+        
+        assert pooled.is_closed
+        assert client._client is None
+    
+    @pytest.mark.asyncio
+    async def test_iter_media_pages_follows_cursors(self, client):
+        pages = [
+            {"data": [{"id": "1"}, {"id": "2"}], "paging": {"cursors": {"after": "c1"}, "next": "next-url"}},
+            {"data": [{"id": "3"}], "paging": {"cursors": {"after": "c2"}}}
+        ]
+        
+        with patch.object(client, 'get_user_media_page', side_effect=pages) as mock_page:
+            result = [page async for page in client.iter_media_pages(page_size=2)]
+        
+        assert result == [[{"id": "1"}, {"id": "2"}], [{"id": "3"}]]
+        assert mock_page.call_args_list[0].kwargs == {"limit": 2, "after": None, "since": None}
+        assert mock_page.call_args_list[1].kwargs == {"limit": 2, "after": "c1", "since": None}
+    
+    @pytest.mark.asyncio
+    async def test_iter_media_pages_stops_at_max_pages(self, client):
+        page = {"data": [{"id": "1"}], "paging": {"cursors": {"after": "c1"}, "next": "next-url"}}
+        
+        with patch.object(client, 'get_user_media_page', return_value=page) as mock_page:
+            result = [p async for p in client.iter_media_pages(max_pages=3)]
+        
+        assert len(result) == 3
+        assert mock_page.call_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_iter_media_page_cursors_resume_after_max_pages(self, client):
+        pages = [
+            {"data": [{"id": "1"}], "paging": {"cursors": {"after": "c1"}, "next": "next-url"}},
+            {"data": [{"id": "2"}], "paging": {"cursors": {"after": "c2"}}}
+        ]
+        
+        with patch.object(client, 'get_user_media_page', side_effect=pages) as mock_page:
+            truncated = [p async for p in client.iter_media_page_cursors(max_pages=1)]
+            resumed = [p async for p in client.iter_media_page_cursors(max_pages=1, after="c1")]
+        
+        assert truncated == [([{"id": "1"}], "c1")]
+        assert resumed == [([{"id": "2"}], None)]
+        assert mock_page.call_args.kwargs["after"] == "c1"
+    
+    @pytest.mark.asyncio
+    async def test_iter_media_pages_stops_at_max_age(self, client):
+        recent = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S+0000")
+        old = (datetime.utcnow() - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%S+0000")
+        page = {
+            "data": [{"id": "new", "timestamp": recent}, {"id": "old", "timestamp": old}],
+            "paging": {"cursors": {"after": "c1"}, "next": "next-url"}
+        }
+        
+        with patch.object(client, 'get_user_media_page', return_value=page) as mock_page:
+            result = [p async for p in client.iter_media_pages(max_age=timedelta(days=7))]
+        
+        assert result == [[{"id": "new", "timestamp": recent}]]
+        assert mock_page.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_iter_media_pages_stops_at_watermark(self, client):
+        watermark = datetime(2024, 1, 15, 10, 30)
+        page = {
+            "data": [
+                {"id": "new", "timestamp": "2024-01-16T08:00:00+0000"},
+                {"id": "seen", "timestamp": "2024-01-15T10:30:00+0000"}
+            ],
+            "paging": {"cursors": {"after": "c1"}, "next": "next-url"}
+        }
+        
+        with patch.object(client, 'get_user_media_page', return_value=page) as mock_page:
+            result = [p async for p in client.iter_media_pages(since=watermark)]
+        
+        assert [m["id"] for m in result[0]] == ["new"]
+        assert mock_page.call_count == 1
+        assert mock_page.call_args.kwargs["since"] == watermark
+    
+    def test_normalize_media_type(self):
+        assert normalize_media_type("TEXT_POST") == "TEXT"
+        assert normalize_media_type("CAROUSEL_ALBUM") == "CAROUSEL"
+        assert normalize_media_type("IMAGE") == "IMAGE"
+        assert normalize_media_type(None) == "TEXT"
+    
     def test_calculate_engagement_rate_normal(self, client):
         metrics = {
             "views": 1000,
@@ -0,0 +1,159 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from config import settings
+from database import (
+    upsert_posts, create_db_engine, create_async_db_engine, _engine_options,
+    select_post_metrics, select_posts_with_text
+)
+from models import Base, Post
+
+
+class TestUpsertPosts:
+
+    @pytest.fixture(scope="function")
+    def db_session(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        session = Session()
+        yield session
+        session.close()
+
+    def _row(self, thread_id, views, content="Post content"):
+        return {
+            "thread_id": thread_id,
+            "content": content,
+            "media_type": "TEXT",
+            "created_at": datetime(2024, 1, 15, 10, 30),
+            "views": views,
+            "likes": 10,
+            "replies": 0,
+            "reposts": 0,
+            "shares": 0,
+            "engagement_rate": 1.0,
+            "updated_at": datetime.utcnow()
+        }
+
+    def test_upsert_inserts_new_posts(self, db_session):
+        existing, post_ids = upsert_posts(db_session, [self._row("post_1", 100), self._row("post_2", 200)])
+        db_session.commit()
+
+        assert existing == {}
+        assert post_ids == {post.thread_id: post.id for post in db_session.query(Post)}
+        assert db_session.query(Post).count() == 2
+        assert db_session.query(Post).filter(Post.thread_id == "post_2").one().views == 200
+
+    def test_upsert_updates_existing_and_reports_previous_rows(self, db_session):
+        upsert_posts(db_session, [self._row("post_1", 100)])
+        db_session.commit()
+
+        existing, post_ids = upsert_posts(
+            db_session,
+            [self._row("post_1", 150, content="Edited"), self._row("post_2", 50)],
+            batch_size=1
+        )
+        db_session.commit()
+
+        assert set(existing) == {"post_1"}
+        assert existing["post_1"]["views"] == 100
+        assert post_ids == {post.thread_id: post.id for post in db_session.query(Post)}
+
+        post = db_session.query(Post).filter(Post.thread_id == "post_1").one()
+        assert post.views == 150
+        assert post.content == "Edited"
+        assert db_session.query(Post).count() == 2
+
+    def test_upsert_metrics_only_keeps_other_columns(self, db_session):
+        upsert_posts(db_session, [self._row("post_1", 100)])
+        db_session.commit()
+
+        upsert_posts(db_session, [{"thread_id": "post_1", "views": 300, "updated_at": datetime.utcnow()}])
+        db_session.commit()
+
+        post = db_session.query(Post).filter(Post.thread_id == "post_1").one()
+        assert post.views == 300
+        assert post.content == "Post content"
+        assert post.likes == 10
+
+    def test_upsert_empty_rows(self, db_session):
+        assert upsert_posts(db_session, []) == ({}, {})
+
+
+class TestEngineFactory:
+
+    def _pragma(self, engine, name):
+        with engine.connect() as conn:
+            return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+    def test_sqlite_pragmas_applied_on_connect(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/app.db")
+
+        assert self._pragma(engine, "journal_mode") == "wal"
+        assert self._pragma(engine, "synchronous") == 1  # NORMAL
+        assert self._pragma(engine, "busy_timeout") == settings.SQLITE_BUSY_TIMEOUT
+        assert self._pragma(engine, "cache_size") == settings.SQLITE_CACHE_SIZE
+        engine.dispose()
+
+    def test_read_only_engine_rejects_writes(self, tmp_path):
+        url = f"sqlite:///{tmp_path}/app.db"
+        writer = create_db_engine(url)
+        Base.metadata.create_all(writer)
+        reader = create_db_engine(url, read_only=True)
+
+        with reader.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM posts").scalar() == 0
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("INSERT INTO posts (thread_id) VALUES ('x')")
+        writer.dispose()
+        reader.dispose()
+
+    @pytest.mark.asyncio
+    async def test_async_engine_gets_same_pragmas(self, tmp_path):
+        engine = create_async_db_engine(f"sqlite:///{tmp_path}/app.db")
+
+        async with engine.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+            assert (await conn.exec_driver_sql("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT
+        await engine.dispose()
+
+    def test_pool_options_only_for_server_databases(self):
+        assert _engine_options("sqlite:///./data.db") == {}
+        options = _engine_options("postgresql://user:pw@localhost/db")
+        assert options["pool_size"] == settings.DB_POOL_SIZE
+        assert options["pool_pre_ping"] is settings.DB_POOL_PRE_PING
+
+class TestPostQueries:
+
+    @pytest.fixture(scope="function")
+    def db_session(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        session.add(Post(thread_id="post_1", content="Long text", analysis_result="Analysis", views=10))
+        session.commit()
+        session.expunge_all()
+        yield session
+        session.close()
+
+    def test_text_columns_deferred_by_default(self, db_session):
+        post = db_session.scalars(select(Post)).one()
+
+        assert {"content", "analysis_result"} <= inspect(post).unloaded
+        assert post.views == 10
+
+    def test_select_posts_with_text_loads_text(self, db_session):
+        post = db_session.scalars(select_posts_with_text()).one()
+
+        assert not {"content", "analysis_result"} & inspect(post).unloaded
+        assert post.content == "Long text"
+
+    def test_select_post_metrics_projects_no_text(self, db_session):
+        row = db_session.execute(select_post_metrics()).one()
+
+        assert "content" not in row._fields
+        assert "analysis_result" not in row._fields
+        assert row.views == 10
\ No newline at end of file
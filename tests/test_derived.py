@@ -0,0 +1,43 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import select
+
+from database import upsert_posts
+from derived import REBUILDERS, rebuild
+from models import Analytics, HeatmapCell, Post, PostSignature, TermStat
+
+
+class TestRebuild:
+
+    def _row(self, thread_id, content):
+        return {
+            "thread_id": thread_id, "content": content, "media_type": "TEXT", "created_at": datetime(2024, 1, 1, 9),
+            "views": 100, "likes": 5, "replies": 0, "reposts": 0, "shares": 0,
+            "engagement_rate": 5.0, "updated_at": datetime(2024, 2, 1)
+        }
+
+    def test_backfills_posts_stored_without_hooks(self, sync_db):
+        # As if synced before the derived stores existed
+        upsert_posts(sync_db, [self._row("p1", "Morning coffee tips #coffee"), self._row("p2", "Learn python today")])
+
+        counts = rebuild(sync_db)
+        sync_db.commit()
+
+        assert list(counts) == list(REBUILDERS)
+        assert counts["themes"] == 2
+        assert sync_db.scalar(select(Post.primary_theme).where(Post.thread_id == "p2")) is not None
+        assert sync_db.scalar(select(Analytics.total_posts)) == 2
+        assert sync_db.scalar(select(HeatmapCell.posts)) == 2
+        assert sync_db.get(TermStat, "").posts == 2
+        assert sync_db.get(TermStat, "#coffee").posts == 1
+        assert len(sync_db.scalars(select(PostSignature)).all()) == 2
+
+    def test_selected_stores_only(self, sync_db):
+        upsert_posts(sync_db, [self._row("p1", "Morning coffee")])
+
+        assert list(rebuild(sync_db, ["terms", "heatmap"])) == ["heatmap", "terms"]
+        assert sync_db.scalar(select(Analytics.total_posts)) is None
+
+    def test_unknown_store(self, sync_db):
+        with pytest.raises(ValueError):
+            rebuild(sync_db, ["nope"])
\ No newline at end of file
@@ -0,0 +1,140 @@
+import pytest
+import httpx
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from data_collector import ThreadsAPIClient
+from fake_threads_api import (
+    SyntheticAccount, create_fake_graph_api, injected_failure, RecordingTransport, ReplayTransport
+)
+from rate_limiter import RequestScheduler, TokenBucket
+
+
+def fake_client(app, transport=None):
+    scheduler = RequestScheduler(
+        budgets={"media": TokenBucket(1000, 1000), "insights": TokenBucket(1000, 1000)},
+        max_retries=5,
+        backoff_base=0.001,
+        backoff_max=0.01
+    )
+    client = ThreadsAPIClient(scheduler=scheduler, transport=transport or httpx.ASGITransport(app=app))
+    client.base_url = "http://fake-graph"
+    client.user_id = "fake_user"
+    return client
+
+
+class TestFakeGraphAPI:
+
+    @pytest.fixture
+    def account(self):
+        return SyntheticAccount("fake_user", 100_000, newest_at=datetime(2024, 6, 1, tzinfo=timezone.utc))
+
+    @pytest.mark.asyncio
+    async def test_paginates_large_account(self, account):
+        client = fake_client(create_fake_graph_api([account]))
+
+        pages = [page async for page in client.iter_media_pages(page_size=100, max_pages=3)]
+        await client.aclose()
+
+        ids = [media["id"] for page in pages for media in page]
+        assert len(ids) == 300
+        assert ids[0] == "fake_user_0"
+        assert ids[-1] == "fake_user_299"
+        assert len(set(ids)) == 300
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_next_link(self):
+        client = fake_client(create_fake_graph_api([SyntheticAccount("fake_user", 5)]))
+
+        pages = [page async for page in client.iter_media_pages(page_size=2)]
+        await client.aclose()
+
+        assert [len(page) for page in pages] == [2, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_since_returns_only_newer_posts(self, account):
+        client = fake_client(create_fake_graph_api([account]))
+        watermark = datetime(2024, 6, 1) - timedelta(hours=9)
+
+        pages = [page async for page in client.iter_media_pages(page_size=50, since=watermark)]
+        await client.aclose()
+
+        assert [media["id"] for page in pages for media in page] == ["fake_user_0", "fake_user_1", "fake_user_2"]
+
+    @pytest.mark.asyncio
+    async def test_insights_shape(self, account):
+        client = fake_client(create_fake_graph_api([account]))
+
+        insights = await client.get_media_insights("fake_user_42")
+        await client.aclose()
+
+        assert set(insights) == {"views", "likes", "replies", "reposts", "shares"}
+        assert insights["views"] >= insights["likes"]
+
+    @pytest.mark.asyncio
+    async def test_unknown_media_is_graph_error(self, account):
+        client = fake_client(create_fake_graph_api([account]))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_media_insights("fake_user_999999999")
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_injected_429s_and_errors_are_retried(self, account):
+        app = create_fake_graph_api([account], rate_limit_rate=0.3, error_rate=0.1, seed=7)
+        client = fake_client(app)
+
+        insights = await client.get_insights_for_media([f"fake_user_{i}" for i in range(30)])
+        await client.aclose()
+
+        # Each call is retried exactly as often as its injected failures say
+        def failures(key):
+            attempt = 0
+            while injected_failure(7, key, attempt, 0.3, 0.1):
+                attempt += 1
+            return attempt
+
+        assert len(insights) == 30
+        assert len(app.state.attempts) == 30
+        assert all(calls == failures(key) + 1 for key, calls in app.state.attempts.items())
+        assert client.scheduler.retries == sum(failures(key) for key in app.state.attempts) == 18
+        assert app.state.request_count == 30 + client.scheduler.retries
+
+    @pytest.mark.asyncio
+    async def test_quota_reports_usage_header(self, account):
+        app = create_fake_graph_api([account], quota_per_window=10)
+        client = fake_client(app)
+
+        await client.get_media_insights("fake_user_1")
+        await client.get_media_insights("fake_user_2")
+        await client.aclose()
+
+        assert client.scheduler.throttle.usage == 20
+
+    @pytest.mark.asyncio
+    async def test_record_then_replay(self, account, tmp_path):
+        app = create_fake_graph_api([account])
+        recorder = RecordingTransport(str(tmp_path), transport=httpx.ASGITransport(app=app))
+        client = fake_client(app, transport=recorder)
+        client.access_token = "secret-token"
+
+        recorded = await client.get_user_media(limit=5)
+        await client.aclose()
+
+        fixtures = list(tmp_path.glob("*.json"))
+        assert len(fixtures) == 1
+        assert "secret-token" not in fixtures[0].read_text()
+
+        replay_client = fake_client(app, transport=ReplayTransport(str(tmp_path)))
+        replay_client.access_token = "another-token"
+
+        assert await replay_client.get_user_media(limit=5) == recorded
+        with pytest.raises(httpx.HTTPStatusError):
+            await replay_client.get_user_media(limit=6)
+        await replay_client.aclose()
+
+    def test_base_url_from_settings(self):
+        with patch('config.settings.THREADS_API_BASE_URL', "http://127.0.0.1:8001/"):
+            client = ThreadsAPIClient()
+
+        assert client.base_url == "http://127.0.0.1:8001"
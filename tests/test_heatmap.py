@@ -0,0 +1,69 @@
+from datetime import datetime
+from sqlalchemy import select
+
+from heatmap import update_heatmap, rebuild_heatmap, get_heatmap
+from models import HeatmapCell
+
+
+class TestHeatmap:
+
+    def _row(self, thread_id, created_at, engagement_rate, media_type="TEXT"):
+        return {
+            "thread_id": thread_id, "content": "Post", "media_type": media_type, "created_at": created_at,
+            "views": 100, "likes": 1, "replies": 0, "reposts": 0, "shares": 0,
+            "engagement_rate": engagement_rate, "updated_at": datetime(2024, 2, 1)
+        }
+
+    def _cells(self, sync_db):
+        return sorted(
+            (c.weekday, c.hour, c.media_type, c.posts, round(c.engagement_sum, 6), round(c.engagement_sq_sum, 6))
+            for c in sync_db.scalars(select(HeatmapCell)) if c.posts
+        )
+
+    def test_incremental_matches_rebuild(self, sync_db, upsert_with, assert_rebuild_matches):
+        monday_9 = datetime(2024, 1, 1, 9, 15)
+        upsert_with(update_heatmap, [
+            self._row("a", monday_9, 4.0),
+            self._row("b", monday_9, 2.0),
+            self._row("c", datetime(2024, 1, 2, 21), 1.0, media_type="IMAGE")
+        ])
+        upsert_with(update_heatmap, [{"thread_id": "a", "views": 100, "likes": 8, "replies": 0, "reposts": 0,
+                                      "shares": 0, "engagement_rate": 8.0, "updated_at": datetime(2024, 2, 2)}])
+
+        incremental = assert_rebuild_matches(rebuild_heatmap, lambda: self._cells(sync_db))
+        assert (0, 9, "TEXT", 2, 10.0, 68.0) in incremental
+
+    def test_scores_shrink_small_slots_towards_mean(self, sync_db, upsert_with):
+        # One lucky post on Monday 09:00 vs. twenty solid posts on Tuesday 10:00
+        rows = [self._row("lucky", datetime(2024, 1, 1, 9), 12.0)]
+        rows += [self._row(f"solid_{i}", datetime(2024, 1, 2, 10, i), 8.0) for i in range(20)]
+        rows += [self._row(f"other_{i}", datetime(2024, 1, 3, 15, i), 2.0) for i in range(40)]
+        upsert_with(update_heatmap, rows)
+
+        heatmap = get_heatmap(sync_db, prior_posts=5)
+
+        assert len(heatmap["cells"]) == 168
+        assert heatmap["total_posts"] == 61
+        assert heatmap["best_slots"][0]["weekday"] == 1
+        assert heatmap["best_slots"][0]["hour"] == 10
+        lucky = heatmap["cells"][9]
+        assert lucky["avg_engagement"] == 12.0
+        assert lucky["score"] < heatmap["best_slots"][0]["score"]
+
+    def test_timezone_shifts_slots(self, sync_db, upsert_with):
+        upsert_with(update_heatmap, [self._row("a", datetime(2024, 1, 1, 1), 3.0)])  # Monday 01:00 UTC
+
+        heatmap = get_heatmap(sync_db, tz="Etc/GMT+5")  # UTC-5
+
+        assert heatmap["utc_offset_hours"] == -5
+        occupied = [(cell["weekday"], cell["hour"]) for cell in heatmap["cells"] if cell["posts"]]
+        assert occupied == [(6, 20)]  # Sunday 20:00 local
+
+    def test_media_type_filter(self, sync_db, upsert_with):
+        upsert_with(update_heatmap, [
+            self._row("a", datetime(2024, 1, 1, 9), 3.0),
+            self._row("b", datetime(2024, 1, 1, 9), 5.0, media_type="VIDEO")
+        ])
+
+        assert get_heatmap(sync_db, media_type="VIDEO")["total_posts"] == 1
+        assert get_heatmap(sync_db)["cells"][9]["posts"] == 2
\ No newline at end of file
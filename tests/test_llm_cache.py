@@ -0,0 +1,240 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from analytics import ContentAnalyzer
+from llm_cache import LLMCache
+from models import Base, LLMCacheEntry, Post
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+class TestLLMCache:
+    
+    def test_key_ignores_whitespace_but_not_model_template_or_inputs(self):
+        key = LLMCache.make_key("gpt", "t/v1", {"content": "Hello  world\n"})
+        
+        assert key == LLMCache.make_key("gpt", "t/v1", {"content": "Hello world"})
+        assert key != LLMCache.make_key("gpt-4", "t/v1", {"content": "Hello world"})
+        assert key != LLMCache.make_key("gpt", "t/v2", {"content": "Hello world"})
+        assert key != LLMCache.make_key("gpt", "t/v1", {"content": "Hello there"})
+    
+    @pytest.mark.asyncio
+    async def test_round_trip_and_counters(self, session_factory):
+        cache = LLMCache(session_factory)
+        
+        assert await cache.get("k") is None
+        await cache.set("k", "gpt", "t/v1", "cached answer")
+        assert await cache.get("k") == "cached answer"
+        
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    
+    @pytest.mark.asyncio
+    async def test_expired_entries_miss(self, session_factory):
+        cache = LLMCache(session_factory, ttl=timedelta(hours=1))
+        await cache.set("k", "gpt", "t/v1", "stale")
+        async with session_factory() as db:
+            await db.execute(update(LLMCacheEntry).values(created_at=datetime.utcnow() - timedelta(hours=2)))
+            await db.commit()
+        
+        assert await cache.get("k") is None
+    
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, session_factory):
+        cache = LLMCache(session_factory, max_entries=2)
+        await cache.set("a", "gpt", "t/v1", "A")
+        await cache.set("b", "gpt", "t/v1", "B")
+        await cache.get("a")
+        await cache.set("c", "gpt", "t/v1", "C")
+        
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "A"
+        assert await cache.get("c") == "C"
+        assert cache.stats()["evictions"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_disabled_cache_stores_nothing(self, session_factory):
+        cache = LLMCache(session_factory, enabled=False)
+        await cache.set("k", "gpt", "t/v1", "answer")
+        
+        assert await cache.get("k") is None
+        assert cache.stats()["misses"] == 0
+
+
+class TestContentAnalyzerCaching:
+    
+    def _completion(self, content):
+        response = MagicMock()
+        response.choices[0].message.content = content
+        return response
+    
+    def _sample(self):
+        return {
+            "total_posts": 1, "avg_engagement": 5.0, "themes": {"educational": 100},
+            "busiest_weekday": 0, "busiest_hour": 9, "posts": [{"line": '- [text, educational, 5.0% engagement] "A tip"'}]
+        }
+    
+    def _post(self):
+        return Post(thread_id="p1", content="Same   words", views=100, likes=5, engagement_rate=5.0)
+    
+    @pytest.mark.asyncio
+    async def test_identical_analysis_hits_openai_once(self, session_factory):
+        analyzer = ContentAnalyzer(cache=LLMCache(session_factory))
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.return_value = self._completion("Educational and clear.")
+            
+            first = await analyzer.analyze_post_content(self._post())
+            second = await analyzer.analyze_post_content(self._post())
+            await analyzer.analyze_post_content(self._post(), use_cache=False)
+        
+        assert first == second == "Educational and clear."
+        assert mock_openai.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_batched_analyses_are_cached_per_post(self, session_factory):
+        analyzer = ContentAnalyzer(cache=LLMCache(session_factory))
+        
+        def posts():
+            return [Post(thread_id=f"p{i}", content=f"Post {i}", views=100, likes=5, engagement_rate=5.0) for i in range(2)]
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.return_value = self._completion('[{"post": 1, "analysis": "A"}, {"post": 2, "analysis": "B"}]')
+            
+            await analyzer.analyze_posts(posts())
+            result = await analyzer.analyze_posts(posts())
+            single = await analyzer.analyze_post_content(posts()[1])
+        
+        assert result == {"p0": "A", "p1": "B"}
+        assert single == "B"
+        mock_openai.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_portrait_goes_through_cache(self, session_factory):
+        analyzer = ContentAnalyzer(cache=LLMCache(session_factory))
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.return_value = self._completion('{"archetype": "The Knowledge Sharer"}')
+            
+            first = await analyzer.generate_creator_portrait(self._sample())
+            second = await analyzer.generate_creator_portrait(self._sample())
+        
+        assert first["archetype"] == second["archetype"] == "The Knowledge Sharer"
+        mock_openai.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_unparseable_portrait_is_not_cached(self, session_factory):
+        cache = LLMCache(session_factory)
+        analyzer = ContentAnalyzer(cache=cache)
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.return_value = self._completion("Not JSON")
+            
+            portrait = await analyzer.generate_creator_portrait(self._sample())
+            await analyzer.generate_creator_portrait(self._sample())
+        
+        assert portrait["archetype"] == "The Emerging Creator"
+        assert mock_openai.call_count == 2
+        assert cache.stats()["hits"] == 0
+
+def _stream(*pieces):
+    """What openai.ChatCompletion.acreate(stream=True) returns: an async iterator of delta chunks"""
+    async def chunks():
+        for piece in pieces:
+            yield {"choices": [{"delta": {"content": piece}}]}
+    return chunks()
+
+
+class TestContentAnalyzerStreaming:
+    
+    def _sample(self):
+        return {
+            "total_posts": 1, "avg_engagement": 5.0, "themes": {"educational": 100},
+            "busiest_weekday": 0, "busiest_hour": 9, "posts": [{"line": '- [text, educational, 5.0% engagement] "A tip"'}]
+        }
+    
+    @pytest.mark.asyncio
+    async def test_portrait_fields_stream_then_share_the_cache(self, session_factory):
+        analyzer = ContentAnalyzer(cache=LLMCache(session_factory))
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.side_effect = lambda **kwargs: _stream(
+                '{"archetype": "The Know', 'ledge Sharer", "content_dna": {"personal": 40}', ', "creator_level": "Sage"}'
+            )
+            
+            events = [event async for event in analyzer.stream_creator_portrait(self._sample())]
+            replayed = [event async for event in analyzer.stream_creator_portrait(self._sample())]
+            whole = await analyzer.generate_creator_portrait(self._sample())
+        
+        assert events[:3] == [
+            ("field", {"name": "archetype", "value": "The Knowledge Sharer"}),
+            ("field", {"name": "content_dna", "value": {"personal": 40}}),
+            ("field", {"name": "creator_level", "value": "Sage"})
+        ]
+        event, portrait = events[3]
+        assert event == "portrait"
+        assert portrait["archetype"] == "The Knowledge Sharer"
+        assert portrait["total_posts"] == 1
+        assert replayed == events
+        assert whole == portrait
+        mock_openai.assert_called_once()
+        assert mock_openai.call_args.kwargs["stream"] is True
+    
+    @pytest.mark.asyncio
+    async def test_unparseable_portrait_stream_ends_with_default(self, session_factory):
+        cache = LLMCache(session_factory)
+        analyzer = ContentAnalyzer(cache=cache)
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.side_effect = lambda **kwargs: _stream('{"archetype": "The Sage", ', "oops")
+            
+            events = [event async for event in analyzer.stream_creator_portrait(self._sample())]
+        
+        assert events[0] == ("field", {"name": "archetype", "value": "The Sage"})
+        assert events[-1][0] == "portrait"
+        assert events[-1][1]["archetype"] == "The Emerging Creator"
+        async with session_factory() as db:
+            assert await db.scalar(select(func.count()).select_from(LLMCacheEntry)) == 0
+    
+    @pytest.mark.asyncio
+    async def test_post_analysis_streams_and_is_stored(self, session_factory):
+        analyzer = ContentAnalyzer(cache=LLMCache(session_factory))
+        post = Post(thread_id="p1", content="Same words", views=100, likes=5, engagement_rate=5.0)
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.side_effect = lambda **kwargs: _stream("Educational", " and clear.")
+            
+            chunks = [text async for text in analyzer.stream_post_analysis(post)]
+            single = await analyzer.analyze_post_content(
+                Post(thread_id="p1", content="Same words", views=100, likes=5, engagement_rate=5.0)
+            )
+        
+        assert chunks == ["Educational", " and clear."]
+        assert post.analysis_result == "Educational and clear."
+        assert single == "Educational and clear."
+        mock_openai.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_post_analysis_stream_reports_api_errors(self):
+        analyzer = ContentAnalyzer()
+        post = Post(thread_id="p1", content="Words", views=100, likes=5, engagement_rate=5.0)
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.side_effect = Exception("API Error")
+            
+            chunks = [text async for text in analyzer.stream_post_analysis(post)]
+        
+        assert chunks == ["Analysis unavailable: API Error"]
+        assert post.analysis_result is None
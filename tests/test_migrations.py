@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import sessionmaker
+
+from database import upsert_posts
+from heatmap import update_heatmap
+from migrations import upgrade_schema
+from models import Analytics, HeatmapCell, Post, SyncJob, TermStat
+
+# Schema as created by the first release
+BASELINE_SCHEMA = [
+    """CREATE TABLE posts (
+        id INTEGER NOT NULL, thread_id VARCHAR, content TEXT, media_type VARCHAR,
+        created_at DATETIME, updated_at DATETIME, views INTEGER, likes INTEGER, replies INTEGER,
+        reposts INTEGER, shares INTEGER, engagement_rate FLOAT, analysis_result TEXT,
+        analysis_date DATETIME, analysis_cached BOOLEAN, PRIMARY KEY (id)
+    )""",
+    "CREATE UNIQUE INDEX ix_posts_thread_id ON posts (thread_id)",
+    "CREATE INDEX ix_posts_id ON posts (id)",
+    """CREATE TABLE analytics (
+        id INTEGER NOT NULL, date DATETIME, total_posts INTEGER, avg_engagement_rate FLOAT,
+        best_post_id VARCHAR, worst_post_id VARCHAR, total_views INTEGER, total_likes INTEGER,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX ix_analytics_id ON analytics (id)",
+]
+
+
+class TestUpgradeSchema:
+
+    @pytest.fixture(scope="function")
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'data.db'}")
+        with engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text(
+                "INSERT INTO posts (thread_id, content, media_type, created_at, updated_at, views, likes, "
+                "replies, reposts, shares, engagement_rate) VALUES "
+                "('p1', 'Learn python today #code', 'TEXT', '2024-01-01 09:00:00.000000', "
+                "'2024-01-02 00:00:00.000000', 100, 5, 0, 0, 0, 5.0)"
+            ))
+            conn.execute(text("INSERT INTO analytics (date, total_posts, avg_engagement_rate) VALUES ('2024-01-01', 9, 1.0)"))
+        yield engine
+        engine.dispose()
+
+    def test_baseline_database_is_upgraded_and_backfilled(self, engine):
+        result = upgrade_schema(engine)
+
+        assert {"theme_scores", "primary_theme"} <= result["added_columns"]["posts"]
+        assert {"engagement_sum", "media_type", "total_shares"} <= result["added_columns"]["analytics"]
+        assert set(result["backfilled"]) == {"themes", "rollups", "sketches", "heatmap", "similarity", "terms"}
+        assert {"ix_posts_created_at", "ix_posts_updated_at", "ix_posts_engagement_rate"} <= result["added_indexes"]["posts"]
+        assert result["added_indexes"]["analytics"] == {"uq_analytics_date_media_type"}
+        assert "ix_posts_engagement_rate" in {index["name"] for index in inspect(engine).get_indexes("posts")}
+
+        db = sessionmaker(bind=engine)()
+        post = db.scalars(select(Post)).one()
+        assert post.primary_theme is not None
+        assert db.scalar(select(HeatmapCell.posts)) == 1
+        assert db.get(TermStat, "").posts == 1
+        assert db.get(TermStat, "#code").posts == 1
+        # The pre-rollup summary row is replaced by a rollup of the stored post
+        assert [(rollup.media_type, rollup.total_posts) for rollup in db.scalars(select(Analytics))] == [("TEXT", 1)]
+
+        # The backfilled post's next sync moves it between cells instead of leaving a negative count
+        row = {"thread_id": "p1", "engagement_rate": 7.0, "updated_at": datetime(2024, 1, 3)}
+        update_heatmap(db, [row], upsert_posts(db, [row])[0])
+        db.commit()
+        assert [(cell.posts, cell.engagement_sum) for cell in db.scalars(select(HeatmapCell))] == [(1, 7.0)]
+        db.close()
+
+    def test_upgrade_is_idempotent(self, engine):
+        upgrade_schema(engine)
+
+        assert upgrade_schema(engine) == {"added_columns": {}, "added_indexes": {}, "backfilled": {}}
+
+    def test_graph_media_types_are_renamed_and_their_stores_rebuilt(self, engine):
+        upgrade_schema(engine)
+        db = sessionmaker(bind=engine)()
+        row = {"thread_id": "p2", "media_type": "TEXT_POST", "created_at": datetime(2024, 1, 1, 9),
+               "engagement_rate": 3.0, "updated_at": datetime(2024, 1, 2)}
+        update_heatmap(db, [row], upsert_posts(db, [row])[0])
+        db.commit()
+
+        result = upgrade_schema(engine)
+
+        assert set(result["backfilled"]) == {"rollups", "heatmap"}
+        db.expire_all()
+        assert set(db.scalars(select(Post.media_type))) == {"TEXT"}
+        assert set(db.scalars(select(HeatmapCell.media_type))) == {"TEXT"}
+        assert [(rollup.media_type, rollup.total_posts) for rollup in db.scalars(select(Analytics))] == [("TEXT", 2)]
+        db.close()
+
+    def test_duplicate_active_sync_jobs_are_failed_before_unique_index(self, engine):
+        upgrade_schema(engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_sync_jobs_active_account"))
+        db = sessionmaker(bind=engine)()
+        db.add_all([
+            SyncJob(id="older", account_id="a1", status="running", created_at=datetime(2024, 1, 1)),
+            SyncJob(id="newer", account_id="a1", status="queued", created_at=datetime(2024, 1, 2))
+        ])
+        db.commit()
+
+        result = upgrade_schema(engine)
+
+        assert result["added_indexes"] == {"sync_jobs": {"ix_sync_jobs_active_account"}}
+        db.expire_all()
+        assert {job.id: job.status for job in db.scalars(select(SyncJob))} == {"older": "failed", "newer": "queued"}
+        db.close()
+
+    def test_new_database_only_creates_tables(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+
+        assert upgrade_schema(engine) == {"added_columns": {}, "added_indexes": {}, "backfilled": {}}
+        assert "term_stats" in inspect(engine).get_table_names()
+        engine.dispose()
\ No newline at end of file
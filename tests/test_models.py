@@ -3,7 +3,7 @@ from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from models import Base, Post, Analytics
+from models import Base, Post, Analytics, SyncState
 
 
 class TestModels:
@@ -117,4 +117,13 @@ class TestModels:
         
         assert retrieved_post.analysis_result == "This is AI analysis result"
         assert retrieved_post.analysis_date is not None
-        assert retrieved_post.analysis_cached is True
\ No newline at end of file
+        assert retrieved_post.analysis_cached is True
+    
+    def test_sync_state_unique_account(self, db_session):
+        db_session.add(SyncState(account_id="account_1", newest_media_at=datetime(2024, 1, 15)))
+        db_session.commit()
+        
+        db_session.add(SyncState(account_id="account_1"))
+        
+        with pytest.raises(Exception):
+            db_session.commit()
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import time
+import pytest
+import httpx
+
+from data_collector import ThreadsAPIClient
+from rate_limiter import RequestScheduler, TokenBucket, UsageThrottle
+
+
+def fast_scheduler(max_retries=3):
+    return RequestScheduler(
+        budgets={"media": TokenBucket(1000, 1000), "insights": TokenBucket(1000, 1000)},
+        max_retries=max_retries,
+        backoff_base=0.001,
+        backoff_max=0.01
+    )
+
+
+class TestTokenBucket:
+
+    @pytest.mark.asyncio
+    async def test_burst_then_refill_rate(self):
+        bucket = TokenBucket(rate=100, capacity=5)
+
+        started = time.monotonic()
+        for _ in range(10):
+            await bucket.acquire()
+        elapsed = time.monotonic() - started
+
+        # 5 tokens of burst, the other 5 refill at 100/s
+        assert 0.04 <= elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_factor_slows_refill(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        await bucket.acquire()
+
+        started = time.monotonic()
+        await bucket.acquire(factor=0.5)
+
+        assert time.monotonic() - started >= 0.015
+
+
+class TestUsageThrottle:
+
+    def test_app_usage_header_scales_factor(self):
+        throttle = UsageThrottle(soft_limit=75)
+
+        throttle.update({"x-app-usage": json.dumps({"call_count": 50, "total_time": 10, "total_cputime": 5})})
+        assert throttle.factor() == 1.0
+
+        throttle.update({"x-app-usage": json.dumps({"call_count": 90, "total_time": 10, "total_cputime": 5})})
+        assert throttle.factor() == pytest.approx(0.4)
+
+    def test_business_use_case_header_blocks(self):
+        throttle = UsageThrottle()
+        header = {"123": [{"type": "threads", "call_count": 100, "total_time": 20,
+                           "total_cputime": 20, "estimated_time_to_regain_access": 2}]}
+
+        throttle.update({"x-business-use-case-usage": json.dumps(header)})
+
+        assert throttle.usage == 100
+        assert throttle.blocked_until > time.monotonic() + 100
+
+    def test_missing_or_invalid_headers_keep_usage(self):
+        throttle = UsageThrottle()
+        throttle.usage = 80
+
+        throttle.update({"x-app-usage": "not json"})
+        throttle.update({})
+
+        assert throttle.usage == 80
+
+    def test_rate_limited_halves_then_recovers(self):
+        throttle = UsageThrottle(recovery_step=0.25)
+
+        throttle.record_rate_limited()
+        throttle.record_rate_limited()
+        assert throttle.factor() == 0.25
+
+        throttle.record_success()
+        throttle.record_success()
+        throttle.record_success()
+        assert throttle.factor() == 1.0
+
+
+class TestRequestScheduler:
+
+    @pytest.mark.asyncio
+    async def test_client_retries_429_against_fake_server(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response(
+                200,
+                headers={"x-app-usage": json.dumps({"call_count": 10})},
+                json={"data": [{"name": "views", "values": [{"value": 42}]}]}
+            )
+
+        scheduler = fast_scheduler()
+        client = ThreadsAPIClient(scheduler=scheduler, transport=httpx.MockTransport(handler))
+
+        insights = await client.get_media_insights("post_1")
+        await client.aclose()
+
+        assert insights == {"views": 42}
+        assert len(calls) == 2
+        assert scheduler.retries == 1
+        assert scheduler.throttle.usage == 10
+
+    @pytest.mark.asyncio
+    async def test_client_retries_graph_rate_limit_error_code(self):
+        responses = [
+            httpx.Response(400, json={"error": {"code": 4, "message": "Application request limit reached"}}),
+            httpx.Response(200, json={"data": []})
+        ]
+        client = ThreadsAPIClient(scheduler=fast_scheduler(), transport=httpx.MockTransport(lambda r: responses.pop(0)))
+
+        assert await client.get_user_media() == []
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_client_raises_after_retries_exhausted(self):
+        client = ThreadsAPIClient(
+            scheduler=fast_scheduler(max_retries=2),
+            transport=httpx.MockTransport(lambda request: httpx.Response(503))
+        )
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_media_insights("post_1")
+        await client.aclose()
+
+        assert client.scheduler.retries == 2
+
+    @pytest.mark.asyncio
+    async def test_client_error_is_not_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404, json={"error": {"code": 100}})
+
+        client = ThreadsAPIClient(scheduler=fast_scheduler(), transport=httpx.MockTransport(handler))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_media_insights("missing")
+        await client.aclose()
+
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_transport_errors_are_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                raise httpx.ConnectError("connection refused")
+            return httpx.Response(200, json={"data": []})
+
+        client = ThreadsAPIClient(scheduler=fast_scheduler(), transport=httpx.MockTransport(handler))
+
+        assert await client.get_media_insights("post_1") == {}
+        await client.aclose()
+
+        assert len(calls) == 3
@@ -0,0 +1,81 @@
+from datetime import date, datetime
+from sqlalchemy import select
+
+from models import Analytics
+from rollups import update_rollups, rebuild_rollups, get_daily_rollups
+
+
+class TestDailyRollups:
+
+    def _row(self, thread_id, day, views, engagement_rate, media_type="TEXT"):
+        return {
+            "thread_id": thread_id,
+            "content": "Post content",
+            "media_type": media_type,
+            "created_at": datetime(2024, 1, day, 12),
+            "views": views,
+            "likes": views // 10,
+            "replies": 0,
+            "reposts": 0,
+            "shares": 0,
+            "engagement_rate": engagement_rate,
+            "updated_at": datetime(2024, 2, 1)
+        }
+
+    def _snapshot(self, sync_db):
+        return sorted(
+            (r.date, r.media_type, r.total_posts, r.total_views, r.total_likes,
+             round(r.avg_engagement_rate, 6), r.best_post_id, r.worst_post_id)
+            for r in sync_db.scalars(select(Analytics))
+        )
+
+    def test_incremental_matches_rebuild(self, sync_db, upsert_with, assert_rebuild_matches):
+        upsert_with(update_rollups, [
+            self._row("a", 1, 100, 5.0),
+            self._row("b", 1, 200, 2.0),
+            self._row("c", 2, 50, 1.0, media_type="IMAGE")
+        ])
+        # Metric refresh (no created_at/media_type) and a new post on an existing day
+        upsert_with(update_rollups, [{"thread_id": "a", "views": 150, "likes": 15, "replies": 0, "reposts": 0,
+                                      "shares": 0, "engagement_rate": 1.5, "updated_at": datetime(2024, 2, 2)}])
+        upsert_with(update_rollups, [self._row("d", 2, 10, 9.0)])
+
+        incremental = assert_rebuild_matches(rebuild_rollups, lambda: self._snapshot(sync_db))
+        day_one = [row for row in incremental if row[0] == datetime(2024, 1, 1)]
+        assert day_one == [(datetime(2024, 1, 1), "TEXT", 2, 350, 35, 1.75, "b", "a")]
+
+    def test_best_post_rescanned_when_it_drops(self, sync_db, upsert_with):
+        upsert_with(update_rollups, [self._row("a", 1, 100, 9.0), self._row("b", 1, 100, 4.0), self._row("c", 1, 100, 1.0)])
+
+        upsert_with(update_rollups, [self._row("a", 1, 100, 0.5)])
+
+        rollup = sync_db.scalars(select(Analytics)).one()
+        assert (rollup.best_post_id, rollup.best_engagement_rate) == ("b", 4.0)
+        assert (rollup.worst_post_id, rollup.worst_engagement_rate) == ("a", 0.5)
+
+    def test_unchanged_rows_write_nothing(self, upsert_with):
+        rows = [self._row("a", 1, 100, 5.0)]
+        upsert_with(update_rollups, rows)
+
+        assert upsert_with(update_rollups, rows) == 0
+
+    def test_daily_range_combines_media_types(self, sync_db, upsert_with):
+        upsert_with(update_rollups, [
+            self._row("a", 1, 100, 5.0),
+            self._row("b", 2, 100, 3.0),
+            self._row("c", 2, 300, 7.0, media_type="IMAGE"),
+            self._row("d", 3, 100, 1.0)
+        ])
+
+        days = get_daily_rollups(sync_db, start=date(2024, 1, 2), end=date(2024, 1, 2))
+
+        assert len(days) == 1
+        assert days[0]["date"] == "2024-01-02"
+        assert days[0]["total_posts"] == 2
+        assert days[0]["total_views"] == 400
+        assert days[0]["avg_engagement_rate"] == 5.0
+        assert days[0]["best_post"] == {"thread_id": "c", "engagement_rate": 7.0}
+        assert days[0]["worst_post"] == {"thread_id": "b", "engagement_rate": 3.0}
+
+        images = get_daily_rollups(sync_db, media_type="IMAGE")
+        assert [day["total_posts"] for day in images] == [1]
\ No newline at end of file
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import sampling
+from database import upsert_posts
+from heatmap import update_heatmap
+from sampling import _candidate_pool, estimate_tokens, sample_posts
+
+NOW = datetime(2024, 6, 1, 12)
+
+
+class TestEstimateTokens:
+
+    def test_roughly_four_letters_per_token(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("a" * 400) == 100
+        assert estimate_tokens("hello world") == 4
+
+    def test_symbols_and_emoji(self):
+        assert estimate_tokens("wow!") == 2
+        assert estimate_tokens("🚀") == 2
+        assert estimate_tokens("2024") == 2
+
+
+class TestSamplePosts:
+
+    def _rows(self, count, content="Post about things"):
+        media_types = ("TEXT", "IMAGE")
+        themes = ("personal", "educational")
+        return [
+            {"thread_id": f"post_{i}", "content": f"{content} {i}", "media_type": media_types[i % 2],
+             "primary_theme": themes[(i // 2) % 2], "created_at": NOW - timedelta(days=i),
+             "engagement_rate": float(i % 10), "views": 100, "updated_at": NOW}
+            for i in range(count)
+        ]
+
+    def test_empty_account(self, sync_db):
+        sample = sample_posts(sync_db, now=NOW)
+
+        assert sample["total_posts"] == 0
+        assert sample["posts"] == []
+
+    def test_spreads_over_theme_and_media_type(self, sync_db):
+        upsert_posts(sync_db, self._rows(40))
+
+        sample = sample_posts(sync_db, max_posts=4, now=NOW)
+
+        assert sample["total_posts"] == 40
+        assert {(post["media_type"], post["primary_theme"]) for post in sample["posts"]} == {
+            ("TEXT", "personal"), ("IMAGE", "personal"), ("TEXT", "educational"), ("IMAGE", "educational")
+        }
+        assert sample["themes"] == {"personal": 50, "educational": 50}
+
+    def test_stays_within_token_budget(self, sync_db):
+        upsert_posts(sync_db, self._rows(40, content="A fairly long post " * 20))
+
+        sample = sample_posts(sync_db, token_budget=150, max_posts=30, now=NOW)
+
+        assert 0 < len(sample["posts"]) < 30
+        assert sample["tokens"] == sum(estimate_tokens(post["line"]) for post in sample["posts"])
+        assert sample["tokens"] <= 150
+        assert all(len(post["line"]) < 260 for post in sample["posts"])
+
+    def test_pool_is_bounded_for_large_accounts(self, sync_db):
+        upsert_posts(sync_db, self._rows(300))
+
+        with patch.object(sampling, "UNIFORM_POOL_SIZE", 30), patch.object(sampling, "RECENT_POOL_SIZE", 10), \
+             patch.object(sampling, "EXTREMES_POOL_SIZE", 5):
+            pool, uniform_ids = _candidate_pool(sync_db, 300)
+            sample = sample_posts(sync_db, max_posts=10, now=NOW)
+
+        assert len(uniform_ids) == 30
+        assert len(pool) <= 30 + 10 + 2 * 5
+        assert sample["total_posts"] == 300
+        assert len(sample["posts"]) == 10
+
+    def test_account_stats_from_heatmap_cube(self, sync_db, upsert_with):
+        upsert_with(update_heatmap, self._rows(10))
+
+        sample = sample_posts(sync_db, now=NOW)
+
+        assert sample["avg_engagement"] == 4.5
+        assert sample["busiest_hour"] == 12
\ No newline at end of file
@@ -0,0 +1,82 @@
+from datetime import datetime
+from sqlalchemy import func, select
+
+from database import upsert_posts
+from models import LshBucket, Post, PostSignature
+from similarity import (
+    BANDS, NUM_PERM, estimate_similarity, get_similar_posts, minhash, rebuild_similarity_index,
+    shingles, update_similarity_index
+)
+
+BASE_TEXT = "Five lessons I learned from shipping a side project every weekend for a whole year"
+
+
+class TestMinHash:
+
+    def test_shingles_normalize_case_and_whitespace(self):
+        assert shingles("Hello   World") == shingles("hello world")
+        assert shingles("") == set()
+        assert shingles("hi") == {"hi"}
+
+    def test_signature_is_deterministic(self):
+        assert minhash(BASE_TEXT) == minhash(BASE_TEXT)
+        assert len(minhash(BASE_TEXT)) == NUM_PERM
+        assert minhash("   ") is None
+
+    def test_similarity_tracks_overlap(self):
+        variant = BASE_TEXT.replace("whole year", "full year")
+        unrelated = "Morning coffee thoughts about the weather and nothing much else"
+
+        assert estimate_similarity(minhash(BASE_TEXT), minhash(BASE_TEXT)) == 1.0
+        assert estimate_similarity(minhash(BASE_TEXT), minhash(variant)) > 0.7
+        assert estimate_similarity(minhash(BASE_TEXT), minhash(unrelated)) < 0.2
+
+
+class TestSimilarityIndex:
+
+    def _row(self, thread_id, content, views=100):
+        return {"thread_id": thread_id, "content": content, "media_type": "TEXT",
+                "created_at": datetime(2024, 1, 1), "views": views, "likes": 10, "replies": 0,
+                "reposts": 0, "shares": 0, "engagement_rate": 10.0, "updated_at": datetime(2024, 1, 1)}
+
+    def _post_id(self, sync_db, thread_id):
+        return sync_db.scalar(select(Post.id).where(Post.thread_id == thread_id))
+
+    def test_finds_reposted_variant_with_its_engagement(self, sync_db, upsert_with):
+        upsert_with(update_similarity_index, [
+            self._row("original", BASE_TEXT),
+            self._row("variant", BASE_TEXT + " (again)", views=5000),
+            self._row("other", "Morning coffee thoughts about the weather and nothing much else"),
+        ])
+
+        similar = get_similar_posts(sync_db, self._post_id(sync_db, "original"))
+
+        assert [post["thread_id"] for post in similar] == ["variant"]
+        assert similar[0]["near_duplicate"]
+        assert similar[0]["metrics"]["views"] == 5000
+
+    def test_buckets_written_once_per_band(self, sync_db, upsert_with):
+        upsert_with(update_similarity_index, [self._row("a", BASE_TEXT), self._row("b", "")])
+
+        assert sync_db.scalar(select(func.count()).select_from(PostSignature)) == 1
+        assert sync_db.scalar(select(func.count()).select_from(LshBucket)) == BANDS
+
+    def test_edited_content_is_reindexed(self, sync_db, upsert_with):
+        upsert_with(update_similarity_index, [self._row("a", BASE_TEXT), self._row("b", BASE_TEXT + "!")])
+        upsert_with(update_similarity_index, [self._row("b", "Completely different words about cooking pasta at home tonight")])
+
+        assert get_similar_posts(sync_db, self._post_id(sync_db, "a"), min_similarity=0.5) == []
+        assert sync_db.scalar(select(func.count()).select_from(LshBucket)) == 2 * BANDS
+
+    def test_metric_refresh_keeps_index(self, sync_db, upsert_with):
+        upsert_with(update_similarity_index, [self._row("a", BASE_TEXT), self._row("b", BASE_TEXT + "!")])
+        upsert_with(update_similarity_index, [{"thread_id": "b", "views": 900}])
+
+        similar = get_similar_posts(sync_db, self._post_id(sync_db, "a"))
+        assert similar[0]["metrics"]["views"] == 900
+
+    def test_rebuild_indexes_existing_posts(self, sync_db):
+        upsert_posts(sync_db, [self._row("a", BASE_TEXT), self._row("b", BASE_TEXT + "!")])
+
+        assert rebuild_similarity_index(sync_db, batch_size=1) == 2
+        assert [post["thread_id"] for post in get_similar_posts(sync_db, self._post_id(sync_db, "b"))] == ["a"]
\ No newline at end of file
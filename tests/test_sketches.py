@@ -0,0 +1,98 @@
+import pytest
+import numpy as np
+from datetime import date, datetime
+from sqlalchemy import select
+
+from models import MetricSketch
+from sketches import QuantileSketch, RELATIVE_ACCURACY, update_sketches, rebuild_sketches, get_quantiles
+
+
+class TestQuantileSketch:
+
+    def test_quantiles_within_relative_accuracy(self):
+        values = np.random.default_rng(1).lognormal(mean=3, sigma=1.5, size=20_000)
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.9, 0.99):
+            exact = np.quantile(values, q, method="lower")
+            assert abs(sketch.quantile(q) - exact) <= RELATIVE_ACCURACY * exact * 1.001
+
+    def test_remove_undoes_add(self):
+        sketch = QuantileSketch()
+        for value in (0, 1.5, 10, 10, 250):
+            sketch.add(value)
+
+        sketch.remove(10)
+        sketch.remove(0)
+        sketch.remove(99)  # never added
+
+        reference = QuantileSketch()
+        for value in (1.5, 10, 250):
+            reference.add(value)
+        assert sketch.bins == reference.bins
+        assert sketch.zero_count == 0
+
+    def test_merge_and_serialization(self):
+        left, right = QuantileSketch(), QuantileSketch()
+        for value in range(1, 51):
+            left.add(value)
+        for value in range(51, 101):
+            right.add(value)
+
+        left.merge(QuantileSketch.from_json(right.to_json()))
+
+        assert left.count == 100
+        assert left.quantile(0.5) == pytest.approx(50, rel=RELATIVE_ACCURACY)
+        assert QuantileSketch().quantile(0.5) is None
+        with pytest.raises(ValueError):
+            left.merge(QuantileSketch(relative_accuracy=0.05))
+
+    def test_histogram_counts_everything(self):
+        sketch = QuantileSketch()
+        for value in [0, 0] + list(range(1, 1001)):
+            sketch.add(value)
+
+        histogram = sketch.histogram(max_buckets=10)
+
+        assert len(histogram) <= 11
+        assert histogram[0] == {"lower": 0.0, "upper": 0.0, "count": 2}
+        assert sum(bucket["count"] for bucket in histogram) == 1002
+
+
+class TestMetricSketches:
+
+    def _row(self, thread_id, day, views, engagement_rate):
+        return {
+            "thread_id": thread_id, "content": "Post", "media_type": "TEXT",
+            "created_at": datetime(2024, 1, day, 12), "views": views, "likes": 0, "replies": 0,
+            "reposts": 0, "shares": 0, "engagement_rate": engagement_rate, "updated_at": datetime(2024, 2, 1)
+        }
+
+    def _stored(self, sync_db):
+        return {
+            (s.day, s.metric): (s.count, QuantileSketch.from_json(s.data).bins)
+            for s in sync_db.scalars(select(MetricSketch))
+        }
+
+    def test_incremental_matches_rebuild(self, sync_db, upsert_with, assert_rebuild_matches):
+        upsert_with(update_sketches, [self._row(f"p{i}", 1 + i % 3, 100 * i, i / 10) for i in range(30)])
+        upsert_with(update_sketches, [{"thread_id": "p4", "views": 9999, "likes": 0, "replies": 0, "reposts": 0,
+                                       "shares": 0, "engagement_rate": 7.5, "updated_at": datetime(2024, 2, 2)}])
+
+        incremental = assert_rebuild_matches(rebuild_sketches, lambda: self._stored(sync_db))
+        assert sum(count for (_, metric), (count, _) in incremental.items() if metric == "views") == 30
+
+    def test_quantiles_over_date_range(self, sync_db, upsert_with):
+        upsert_with(update_sketches, [self._row(f"a{i}", 1, i, 1.0) for i in range(1, 101)])
+        upsert_with(update_sketches, [self._row(f"b{i}", 2, 1000 + i, 2.0) for i in range(1, 101)])
+
+        day_one = get_quantiles(sync_db, "views", [0.5], start=date(2024, 1, 1), end=date(2024, 1, 1))
+        both = get_quantiles(sync_db, "views", [0.5, 0.99], histogram_buckets=5)
+
+        assert day_one["count"] == 100
+        assert day_one["quantiles"]["p50"] == pytest.approx(50, rel=RELATIVE_ACCURACY)
+        assert both["count"] == 200
+        assert both["quantiles"]["p99"] == pytest.approx(1099, rel=RELATIVE_ACCURACY)
+        assert sum(bucket["count"] for bucket in both["histogram"]) == 200
\ No newline at end of file
@@ -0,0 +1,102 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from analytics import ContentAnalyzer
+from streaming import JsonFieldParser, parse_json_object, sse_event
+
+
+class TestJsonFieldParser:
+    
+    RESPONSE = json.dumps({
+        "archetype": 'The "Quoted" {Creator}',
+        "content_dna": {"personal": 40, "educational": 30, "entertainment": 30},
+        "levels": [1, [2, 3]],
+        "avg": 4.5,
+        "shareable_quote": "✨ A line, with commas ✨"
+    })
+    
+    def _feed(self, text, chunk_size):
+        parser = JsonFieldParser()
+        fields = []
+        for i in range(0, len(text), chunk_size):
+            fields.extend(parser.feed(text[i:i + chunk_size]))
+        return parser, fields
+    
+    def test_fields_are_the_same_however_the_text_is_chunked(self):
+        expected = list(json.loads(self.RESPONSE).items())
+        
+        for chunk_size in (1, 2, 5, 17, len(self.RESPONSE)):
+            parser, fields = self._feed(self.RESPONSE, chunk_size)
+            assert fields == expected
+            assert parser.done
+    
+    def test_field_is_reported_once_its_value_is_complete(self):
+        parser = JsonFieldParser()
+        
+        assert parser.feed('{"archetype": "The Know') == []
+        assert parser.feed('ledge Sharer", "content_dna": {"personal": 40') == [("archetype", "The Knowledge Sharer")]
+        assert parser.feed('}}') == [("content_dna", {"personal": 40})]
+        assert parser.fields == {"archetype": "The Knowledge Sharer", "content_dna": {"personal": 40}}
+    
+    def test_skips_text_around_the_object(self):
+        parser, fields = self._feed('Here you go:\n```json\n{"a": 1, "b": true, "c": null}\n```', 3)
+        
+        assert fields == [("a", 1), ("b", True), ("c", None)]
+        assert parser.feed('{"d": 2}') == []
+    
+    def test_unparseable_value_is_dropped(self):
+        parser, fields = self._feed('{"a": nope, "b": "ok"}', 4)
+        
+        assert fields == [("b", "ok")]
+
+
+class TestParseJsonObject:
+    
+    def test_tolerates_fence_and_preamble(self):
+        assert parse_json_object('```json\n{"a": {"b": 1}}\n```') == {"a": {"b": 1}}
+        assert parse_json_object('Here is your portrait:\n{"a": 1}') == {"a": 1}
+    
+    def test_rejects_reply_without_object(self):
+        with pytest.raises(ValueError):
+            parse_json_object("Sorry, I can't help with that.")
+
+
+class TestStreamCreatorPortrait:
+    
+    SAMPLE = {
+        "total_posts": 1, "avg_engagement": 5.0, "themes": {"educational": 100},
+        "busiest_weekday": 0, "busiest_hour": 9, "posts": [{"line": '- [text, educational, 5.0% engagement] "A tip"'}]
+    }
+    
+    @staticmethod
+    def _stream(*pieces):
+        async def chunks():
+            for piece in pieces:
+                yield {"choices": [{"delta": {"content": piece}}]}
+        return chunks()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("reply", [
+        ('```json\n{"archetype": "The Trend', 'setter", "creator_level": "Sage"}\n```'),
+        ('Here is your reading:\n{"archetype": "The Trend', 'setter", "creator_level": "Sage"}'),
+    ])
+    async def test_final_portrait_matches_streamed_fields(self, reply):
+        analyzer = ContentAnalyzer()
+        
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_openai:
+            mock_openai.side_effect = lambda **kwargs: self._stream(*reply)
+            events = [event async for event in analyzer.stream_creator_portrait(self.SAMPLE)]
+        
+        assert events[0] == ("field", {"name": "archetype", "value": "The Trendsetter"})
+        assert events[-1][0] == "portrait"
+        assert events[-1][1]["archetype"] == "The Trendsetter"
+        assert events[-1][1]["creator_level"] == "Sage"
+
+
+class TestSseEvent:
+    
+    def test_format(self):
+        assert sse_event("field", {"name": "archetype", "value": "✨"}) == (
+            'event: field\ndata: {"name": "archetype", "value": "✨"}\n\n'
+        )
\ No newline at end of file
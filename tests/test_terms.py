@@ -0,0 +1,89 @@
+from datetime import datetime
+from sqlalchemy import func, select
+
+from models import TermPosting, TermStat
+from terms import CORPUS_TERM, get_term_performance, rebuild_terms, term_kind, tokenize, update_terms
+
+
+class TestTokenize:
+
+    def test_words_hashtags_and_emoji(self):
+        assert tokenize("Shipping my #BuildInPublic update 🚀🚀 today") == {
+            "shipping", "#buildinpublic", "update", "🚀", "today"
+        }
+
+    def test_drops_stopwords_short_words_and_numbers(self):
+        assert tokenize("This is the way to go in 2024") == {"way"}
+        assert tokenize(None) == set()
+
+    def test_term_kinds(self):
+        assert term_kind("#tips") == "hashtag"
+        assert term_kind("🔥") == "emoji"
+        assert term_kind("coffee") == "word"
+
+
+class TestTermIndex:
+
+    def _row(self, thread_id, content, engagement_rate):
+        return {"thread_id": thread_id, "content": content, "media_type": "TEXT", "created_at": datetime(2024, 1, 1),
+                "views": 100, "likes": 0, "replies": 0, "reposts": 0, "shares": 0,
+                "engagement_rate": engagement_rate, "updated_at": datetime(2024, 1, 1)}
+
+    def _stat(self, sync_db, term):
+        return sync_db.get(TermStat, term)
+
+    def test_running_stats_per_term(self, sync_db, upsert_with):
+        upsert_with(update_terms, [
+            self._row("a", "Morning coffee #routine", 4.0),
+            self._row("b", "Coffee shop review", 8.0),
+            self._row("c", "Gym #routine", 2.0),
+        ])
+
+        coffee = self._stat(sync_db, "coffee")
+        assert (coffee.posts, coffee.engagement_sum, coffee.engagement_sq_sum) == (2, 12.0, 80.0)
+        assert self._stat(sync_db, "#routine").kind == "hashtag"
+        assert self._stat(sync_db, CORPUS_TERM).posts == 3
+
+    def test_engagement_refresh_moves_stats_without_content(self, sync_db, upsert_with):
+        upsert_with(update_terms, [self._row("a", "Morning coffee", 4.0)])
+        upsert_with(update_terms, [{"thread_id": "a", "engagement_rate": 10.0}])
+
+        coffee = self._stat(sync_db, "coffee")
+        assert (coffee.posts, coffee.engagement_sum) == (1, 10.0)
+        assert self._stat(sync_db, CORPUS_TERM).engagement_sum == 10.0
+
+    def test_edit_moves_postings_and_stats(self, sync_db, upsert_with):
+        upsert_with(update_terms, [self._row("a", "Morning coffee", 4.0)])
+        upsert_with(update_terms, [self._row("a", "Morning tea", 4.0)])
+
+        assert self._stat(sync_db, "coffee").posts == 0
+        assert self._stat(sync_db, "tea").posts == 1
+        assert set(sync_db.scalars(select(TermPosting.term))) == {"morning", "tea"}
+        assert self._stat(sync_db, CORPUS_TERM).posts == 1
+
+    def test_top_and_bottom_terms_with_lift(self, sync_db, upsert_with):
+        upsert_with(update_terms, [
+            self._row("a", "launch day", 9.0),
+            self._row("b", "launch recap", 7.0),
+            self._row("c", "quiet monday", 1.0),
+            self._row("d", "quiet sunday", 3.0),
+        ])
+
+        result = get_term_performance(sync_db, min_support=2, limit=1)
+
+        assert result["avg_engagement"] == 5.0
+        assert result["top"][0]["term"] == "launch"
+        assert result["top"][0]["lift"] == 1.6
+        assert result["bottom"][0]["term"] == "quiet"
+        assert get_term_performance(sync_db, min_support=3)["top"] == []
+        assert get_term_performance(sync_db, min_support=1, kind="hashtag")["top"] == []
+
+    def test_rebuild_matches_incremental(self, sync_db, upsert_with, assert_rebuild_matches):
+        rows = [self._row("a", "Morning coffee #routine", 4.0), self._row("b", "Coffee shop", 8.0)]
+        upsert_with(update_terms, rows)
+
+        assert_rebuild_matches(
+            lambda db: rebuild_terms(db, batch_size=1),
+            lambda: {stat.term: (stat.posts, stat.engagement_sum) for stat in sync_db.scalars(select(TermStat))}
+        )
+        assert sync_db.scalar(select(func.count()).select_from(TermPosting)) == 5
\ No newline at end of file
@@ -0,0 +1,59 @@
+import json
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Post
+from themes import ThemeClassifier, DEFAULT_LEXICON, reclassify_posts, theme_distribution
+
+
+class TestThemeClassifier:
+
+    @pytest.fixture
+    def classifier(self):
+        return ThemeClassifier(DEFAULT_LEXICON)
+
+    def test_scores_every_theme_in_one_pass(self, classifier):
+        scores = classifier.classify("I think this guide will help you learn, LOL")
+
+        assert scores == {"personal": 1, "educational": 2, "entertainment": 1}
+        assert classifier.primary_theme(scores) == "educational"
+
+    def test_matches_whole_words_only(self, classifier):
+        # "show" and "tiptoe" used to match "how" and "tip" as substrings
+        scores = classifier.classify("Let me show you how to tiptoe")
+
+        assert scores["educational"] == 1
+
+    def test_ties_go_to_earlier_theme_and_no_match_is_general(self, classifier):
+        assert classifier.primary_theme(classifier.classify("Life tip")) == "personal"
+        assert classifier.theme_columns("Nothing to see")["primary_theme"] == "general"
+        assert classifier.theme_columns(None)["theme_scores"] == {"personal": 0, "educational": 0, "entertainment": 0}
+
+    def test_lexicon_from_file_with_phrases(self, tmp_path):
+        path = tmp_path / "lexicon.json"
+        path.write_text(json.dumps({"launch": ["product hunt", "launch"], "empty": []}))
+
+        classifier = ThemeClassifier.from_file(str(path))
+
+        assert classifier.classify("We launch on Product Hunt today") == {"launch": 2, "empty": 0}
+
+    def test_theme_distribution(self):
+        assert theme_distribution(["personal", "personal", None, "educational"]) == {
+            "personal": 50, "general": 25, "educational": 25
+        }
+        assert theme_distribution([]) == {}
+
+    def test_reclassify_posts(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        db.add_all([Post(thread_id="a", content="So funny haha"), Post(thread_id="b", content="")])
+        db.commit()
+
+        assert reclassify_posts(db) == 2
+        db.commit()
+
+        stored = dict(db.execute(select(Post.thread_id, Post.primary_theme)).all())
+        db.close()
+        assert stored == {"a": "entertainment", "b": "general"}
\ No newline at end of file
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from models import MetricSnapshot, Post
+from timeseries import record_snapshots, compact_snapshots, get_post_timeseries
+
+
+class TestMetricSnapshots:
+
+    def _metrics(self, thread_id, views):
+        return {"thread_id": thread_id, "views": views, "likes": 1, "replies": 0, "reposts": 0, "shares": 0}
+
+    def test_snapshots_written_only_on_change(self, sync_db, upsert_with):
+        ts = datetime(2024, 1, 1)
+
+        assert upsert_with(record_snapshots, [self._metrics("a", 10), self._metrics("b", 5)], ts) == 2
+        assert upsert_with(record_snapshots, [self._metrics("a", 10), self._metrics("b", 5)], ts + timedelta(hours=1)) == 0
+        assert upsert_with(record_snapshots, [self._metrics("a", 25), self._metrics("b", 5)], ts + timedelta(hours=2)) == 1
+
+        post_id = sync_db.query(Post.id).filter(Post.thread_id == "a").scalar()
+        history = get_post_timeseries(sync_db, post_id)
+        assert [point["views"] for point in history] == [10, 25]
+        assert history[1]["ts"] == (ts + timedelta(hours=2)).isoformat()
+
+    def test_timeseries_range_filter(self, sync_db, upsert_with):
+        ts = datetime(2024, 1, 1)
+        for hour in range(5):
+            upsert_with(record_snapshots, [self._metrics("a", 10 * (hour + 1))], ts + timedelta(hours=hour))
+
+        post_id = sync_db.query(Post.id).scalar()
+        history = get_post_timeseries(sync_db, post_id, start=ts + timedelta(hours=1), end=ts + timedelta(hours=3))
+
+        assert [point["views"] for point in history] == [20, 30, 40]
+
+    def test_compaction_keeps_last_snapshot_per_bucket(self, sync_db, upsert_with):
+        now = datetime(2024, 6, 1, 12)
+        upsert_with(record_snapshots, [self._metrics("a", 1)], now)
+        post_id = sync_db.query(Post.id).scalar()
+
+        def add(ts, views):
+            sync_db.add(MetricSnapshot(post_id=post_id, ts=ts, views=views, likes=0, replies=0, reposts=0, shares=0))
+
+        # Raw tier (< 7 days): untouched
+        add(now - timedelta(days=1, minutes=30), 100)
+        add(now - timedelta(days=1, minutes=10), 110)
+        # Hourly tier (7-90 days): last per hour
+        add(datetime(2024, 5, 1, 9, 5), 50)
+        add(datetime(2024, 5, 1, 9, 45), 55)
+        add(datetime(2024, 5, 1, 10, 15), 60)
+        # Daily tier (> 90 days): last per day
+        add(datetime(2024, 2, 1, 8), 10)
+        add(datetime(2024, 2, 1, 20), 12)
+        add(datetime(2024, 2, 2, 8), 14)
+        sync_db.commit()
+
+        deleted = compact_snapshots(sync_db, now)
+        sync_db.commit()
+
+        assert deleted == 2
+        views = [point["views"] for point in get_post_timeseries(sync_db, post_id)]
+        assert views == [12, 14, 55, 60, 100, 110, 1]
@@ -0,0 +1,85 @@
+"""Keyword theme classifier, run once per post at sync time."""
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from database import iter_post_batches
+from models import Post
+from config import settings
+
+# Theme -> keywords/phrases. Earlier themes win ties when picking the primary theme.
+DEFAULT_LEXICON = {
+    "personal": ["personal", "life", "feel", "think"],
+    "educational": ["tip", "how", "learn", "guide"],
+    "entertainment": ["funny", "lol", "haha", "joke"],
+}
+FALLBACK_THEME = "general"
+
+class ThemeClassifier:
+    """Scores text against every theme in one pass of a single compiled regex"""
+
+    def __init__(self, lexicon: Dict[str, Sequence[str]]):
+        self.themes = list(lexicon)
+        self._group_themes = {}
+        alternatives = []
+        for index, (theme, keywords) in enumerate(lexicon.items()):
+            # Longest first so multi-word phrases win over their prefixes
+            words = sorted({keyword.strip().lower() for keyword in keywords if keyword.strip()}, key=len, reverse=True)
+            if not words:
+                continue
+            group = f"t{index}"
+            self._group_themes[group] = theme
+            alternatives.append(f"(?P<{group}>{'|'.join(re.escape(word) for word in words)})")
+        self._pattern = re.compile(rf"\b(?:{'|'.join(alternatives)})\b", re.IGNORECASE) if alternatives else None
+
+    @classmethod
+    def from_file(cls, path: str) -> "ThemeClassifier":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def classify(self, text: Optional[str]) -> Dict[str, int]:
+        """Keyword hits per theme (every theme present, zero if unmatched)"""
+        scores = dict.fromkeys(self.themes, 0)
+        if text and self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                scores[self._group_themes[match.lastgroup]] += 1
+        return scores
+
+    def primary_theme(self, scores: Dict[str, int]) -> str:
+        """Highest-scoring theme, or FALLBACK_THEME when nothing matched"""
+        best = max(self.themes, key=lambda theme: scores.get(theme, 0), default=None)
+        if best is None or not scores.get(best):
+            return FALLBACK_THEME
+        return best
+
+    def theme_columns(self, text: Optional[str]) -> Dict:
+        """Post column values for a piece of content"""
+        scores = self.classify(text)
+        return {"theme_scores": scores, "primary_theme": self.primary_theme(scores)}
+
+@lru_cache(maxsize=1)
+def get_theme_classifier() -> ThemeClassifier:
+    """Classifier for the configured lexicon (THEME_LEXICON_PATH), compiled once per process"""
+    if settings.THEME_LEXICON_PATH:
+        return ThemeClassifier.from_file(settings.THEME_LEXICON_PATH)
+    return ThemeClassifier(DEFAULT_LEXICON)
+
+def reclassify_posts(db: Session, classifier: Optional[ThemeClassifier] = None, batch_size: int = 1000) -> int:
+    """Re-score every stored post; returns the number of posts updated"""
+    classifier = classifier or get_theme_classifier()
+    updated = 0
+    for batch in iter_post_batches(db, (Post.content,), batch_size):
+        db.execute(update(Post), [{"id": row["id"], **classifier.theme_columns(row["content"])} for row in batch])
+        updated += len(batch)
+    return updated
+
+def theme_distribution(primary_themes: List[Optional[str]]) -> Dict[str, int]:
+    """Percentage of posts per primary theme"""
+    counts: Dict[str, int] = {}
+    for theme in primary_themes:
+        theme = theme or FALLBACK_THEME
+        counts[theme] = counts.get(theme, 0) + 1
+    total = len(primary_themes)
+    return {theme: round(count / total * 100) for theme, count in counts.items()} if total else {}
\ No newline at end of file
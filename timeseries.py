@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import delete, extract, func, insert, select
+from sqlalchemy.orm import Session
+from models import MetricSnapshot
+
+SNAPSHOT_METRICS = ("views", "likes", "replies", "reposts", "shares")
+
+# Retention: raw snapshots for RAW_RETENTION, then the last snapshot per hour
+# until HOURLY_RETENTION, then the last snapshot per day. Counters are
+# cumulative, so keeping the last value of each bucket loses no totals.
+RAW_RETENTION = timedelta(days=7)
+HOURLY_RETENTION = timedelta(days=90)
+
+def record_snapshots(db: Session, rows: List[Dict], previous: Dict[str, Dict], post_ids: Dict[str, int], ts: datetime) -> int:
+    """Append a snapshot for every upserted row whose counters changed.
+
+    New posts always get a first snapshot; unchanged posts get none.
+    """
+    snapshots = []
+    for row in rows:
+        if not all(metric in row for metric in SNAPSHOT_METRICS):
+            continue
+        before = previous.get(row["thread_id"])
+        if before is None or any(before[metric] != row[metric] for metric in SNAPSHOT_METRICS):
+            snapshots.append(_snapshot(post_ids[row["thread_id"]], row, ts))
+
+    if snapshots:
+        db.execute(insert(MetricSnapshot), snapshots)
+    return len(snapshots)
+
+def _snapshot(post_id: int, row: Dict, ts: datetime) -> Dict:
+    return {"post_id": post_id, "ts": ts, **{metric: row[metric] for metric in SNAPSHOT_METRICS}}
+
+def compact_snapshots(db: Session, now: Optional[datetime] = None) -> int:
+    """Downsample old snapshots per the retention policy; returns rows deleted"""
+    now = now or datetime.utcnow()
+    hourly_cutoff = now - RAW_RETENTION
+    daily_cutoff = now - HOURLY_RETENTION
+
+    deleted = _downsample(db, start=daily_cutoff, end=hourly_cutoff, units=("year", "month", "day", "hour"))
+    deleted += _downsample(db, start=None, end=daily_cutoff, units=("year", "month", "day"))
+    return deleted
+
+def _downsample(db: Session, start: Optional[datetime], end: datetime, units) -> int:
+    """Keep only the newest snapshot per post and time bucket within [start, end)"""
+    window = [MetricSnapshot.ts < end]
+    if start is not None:
+        window.append(MetricSnapshot.ts >= start)
+
+    keep = (
+        select(func.max(MetricSnapshot.id))
+        .where(*window)
+        .group_by(MetricSnapshot.post_id, *(extract(unit, MetricSnapshot.ts) for unit in units))
+    )
+    result = db.execute(
+        delete(MetricSnapshot)
+        .where(*window, MetricSnapshot.id.not_in(keep))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+def get_post_timeseries(
+    db: Session,
+    post_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> List[Dict]:
+    """Snapshots of one post in time order (served by the (post_id, ts) index)"""
+    query = select(MetricSnapshot.ts, *(getattr(MetricSnapshot, metric) for metric in SNAPSHOT_METRICS)).where(
+        MetricSnapshot.post_id == post_id
+    )
+    if start is not None:
+        query = query.where(MetricSnapshot.ts >= start)
+    if end is not None:
+        query = query.where(MetricSnapshot.ts <= end)
+
+    return [
+        {"ts": row.ts.isoformat(), **{metric: getattr(row, metric) for metric in SNAPSHOT_METRICS}}
+        for row in db.execute(query.order_by(MetricSnapshot.ts))
+    ]